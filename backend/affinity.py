@@ -0,0 +1,99 @@
+"""
+ZIP Affinity Routing
+
+Routes every job for a store region to the same worker group, so the
+workers that already hold warm state for that area (browser location
+cookies, callback sessions, recently scraped items) keep serving it.
+
+Regions come from the item cache's ZIP clusterer (ZIPs that share cached
+results), falling back to the 3-digit ZIP prefix. Regions are placed on a
+consistent-hash ring of WORKER_GROUPS groups (g0, g1, ...), so adding or
+removing a group only moves about 1/N of the regions to another group.
+
+Each worker serves its own group's queues first and steals from the
+other groups after STEAL_AFTER idle seconds (see scheduler.py), so a
+quiet group never leaves work waiting elsewhere.
+
+Environment variables:
+- WORKER_GROUPS: Number of worker groups (0 or 1 disables routing, default 0)
+- WORKER_GROUP: The group a worker belongs to ("g0", "g1", ...)
+- STEAL_AFTER: Idle seconds before a worker takes other groups' jobs (default 2)
+"""
+
+import os
+import bisect
+import hashlib
+import logging
+from typing import List, Optional
+
+from zip_regions import zip_region
+
+logger = logging.getLogger(__name__)
+
+WORKER_GROUPS = int(os.getenv('WORKER_GROUPS', 0))
+STEAL_AFTER = float(os.getenv('STEAL_AFTER', 2))
+AFFINITY_VNODES = 64  # Ring points per group (evens out region counts)
+AFFINITY_STATS_KEY = 'stats:affinity'
+
+
+def group_names(count: int = WORKER_GROUPS) -> List[str]:
+    """Group names for a group count (empty when routing is disabled)"""
+    return [f"g{i}" for i in range(count)] if count > 1 else []
+
+
+def _hash(key: str) -> int:
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class ConsistentHashRing:
+    """Maps keys to nodes; removing/adding a node only remaps that node's share"""
+
+    def __init__(self, nodes: List[str], vnodes: int = AFFINITY_VNODES):
+        self._points = sorted(
+            (_hash(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(vnodes)
+        )
+        self._hashes = [point for point, _ in self._points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """Node owning a key (first ring point clockwise), or None for an empty ring"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._points)
+        return self._points[index][1]
+
+
+class AffinityRouter:
+    """Chooses the worker group for a ZIP code"""
+
+    def __init__(self, clusterer=None, groups: Optional[List[str]] = None):
+        """
+        Args:
+            clusterer: ZipClusterer used to group ZIPs into store regions
+                       (None: 3-digit ZIP prefix only)
+            groups: Worker group names (default: from WORKER_GROUPS)
+        """
+        self.clusterer = clusterer
+        self.groups = group_names() if groups is None else groups
+        self.ring = ConsistentHashRing(self.groups)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.groups)
+
+    def region_for(self, zip_code: str) -> str:
+        """Routing key: store-region cluster if known, else 3-digit ZIP prefix"""
+        cluster = None
+        if self.clusterer is not None:
+            try:
+                cluster = self.clusterer.cluster_for(zip_code)
+            except Exception as e:
+                logger.debug(f"Could not cluster {zip_code} for routing: {e}")
+        return cluster or zip_region(zip_code)
+
+    def group_for(self, zip_code: str) -> Optional[str]:
+        """Worker group for a ZIP (None when routing is disabled)"""
+        if not self.enabled:
+            return None
+        return self.ring.node_for(self.region_for(zip_code))
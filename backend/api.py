@@ -5,8 +5,9 @@ FastAPI backend for finding cheapest groceries
 Uses Redis job queue for async scraping (no timeouts, handles 1000s of users)
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict
 import time
@@ -15,6 +16,7 @@ import logging
 import redis
 import uuid
 import json
+import hashlib
 import os
 
 # Import our production UC scraper (for direct mode if needed)
@@ -23,7 +25,19 @@ from uc_scraper import search_products as scrape_google_shopping
 # Import AI service for product clarification
 from ai_service import clarify_item
 
-logging.basicConfig(level=logging.INFO)
+# Shared item cache (same Redis keys the workers read/write)
+from item_cache import ItemCache
+from job_store import JobStore, JOB_RESULT_RETENTION
+from scheduler import BACKGROUND, DISPATCH_EDF, INTERACTIVE_LANES, JobScheduler
+from affinity import AffinityRouter
+from worker_registry import WorkerRegistry
+from error_events import ErrorEvents
+from product import FIELDS as PRODUCT_FIELDS, ProductRecord, by_price, to_wire
+from cart_summary import summarize_cart
+from popularity import PopularityTracker
+from log_setup import configure_logging
+
+configure_logging('api')
 logger = logging.getLogger(__name__)
 
 # ============================================================================
@@ -49,6 +63,19 @@ except Exception as e:
     logger.warning("⚠️  API will run in DIRECT mode (no queue, slower, no concurrency)")
     redis_client = None
 
+item_cache = ItemCache(redis_client) if redis_client else None
+job_store = JobStore(redis_client) if redis_client else None
+scheduler = JobScheduler(redis_client) if redis_client else None
+router = AffinityRouter(item_cache.clusterer) if item_cache else None
+popularity = PopularityTracker(redis_client) if redis_client else None
+registry = WorkerRegistry(redis_client) if redis_client else None
+errors = ErrorEvents(redis_client, 'api') if redis_client else None
+
+def record_error(stage: str, error, backend: Optional[str] = None, job_id: Optional[str] = None):
+    """Publish an error event for monitor.py (see error_events.py; no-op without Redis)"""
+    if errors:
+        errors.record(stage, error, backend=backend, job_id=job_id)
+
 app = FastAPI(
     title="Low Cost Groceries API",
     description="Find the cheapest groceries using Google Shopping",
@@ -100,6 +127,19 @@ class Product(BaseModel):
             return (self.savings / self.original_price) * 100
         return None
 
+def api_product(record: ProductRecord) -> Product:
+    """Wrap a scraped ProductRecord in the API model without re-validating each field"""
+    return Product.model_construct(
+        title=record.name,
+        price=record.price,
+        original_price=record.original_price,
+        merchant=record.merchant or 'Unknown',
+        rating=record.rating,
+        review_count=record.review_count,
+        image_url=record.image_url,
+        product_id=record.product_id
+    )
+
 class SearchResponse(BaseModel):
     """Response with products"""
     query: str
@@ -129,6 +169,12 @@ class CartRequest(BaseModel):
             raise ValueError('At least one item is required')
         return v
 
+class PrefetchRequest(BaseModel):
+    """Hint that these items will probably be submitted soon for this ZIP"""
+    items: List[str] = Field(..., min_length=1, max_length=20, description="Items shown or accepted in the cart")
+    zipcode: str = Field(..., min_length=5, max_length=5, pattern=r'^\d{5}$')
+    prioritize_nearby: bool = Field(default=True, description="Preference the cart will likely use")
+
 class CartResponse(BaseModel):
     """Shopping cart with cheapest options"""
     items: Dict[str, Product]  # item_name -> cheapest_product
@@ -186,7 +232,9 @@ async def root():
             "clarify": "/api/clarify",
             "search": "/search",
             "cart": "/api/cart",
+            "prefetch": "/api/prefetch",
             "results": "/api/results/{job_id}",
+            "workers": "/api/workers",
             "docs": "/docs"
         }
     }
@@ -249,6 +297,7 @@ async def clarify_product_endpoint(request: ClarifyRequest):
         
     except Exception as e:
         logger.error(f"❌ AI clarification failed: {e}")
+        record_error('clarify', e, backend='openai')
         
         # Return fallback suggestion
         processing_time = time.time() - start_time
@@ -293,20 +342,11 @@ async def search_products_endpoint(request: SearchRequest, background_tasks: Bac
         # Extract products for this query
         raw_products = scrape_results.get(request.query, [])
         
-        # Convert to Pydantic models
+        # Scraped records are already well-formed; skip per-field validation
         products = [
-            Product(
-                title=p.get('name'),
-                price=p.get('price'),
-                original_price=None,  # Not available in aria-label parsing
-                merchant=p.get('merchant', 'Unknown'),
-                rating=p.get('rating'),
-                review_count=p.get('review_count'),
-                image_url=None,  # Not available in aria-label parsing
-                product_id=None
-            )
+            api_product(p)
             for p in raw_products
-            if p.get('name') and p.get('price')
+            if p.name and p.price
         ]
         
         response = SearchResponse(
@@ -326,22 +366,132 @@ async def search_products_endpoint(request: SearchRequest, background_tasks: Bac
         
     except Exception as e:
         logger.error(f"❌ Scraping failed for '{request.query}': {e}")
+        record_error('search', e, backend='uc')
         raise HTTPException(
             status_code=500,
             detail=f"Failed to scrape products: {str(e)}"
         )
 
+@app.post("/api/prefetch")
+async def prefetch_items(request: PrefetchRequest):
+    """
+    Prefetch hint - warm the item cache before the cart is submitted
+    
+    The frontend calls this when a suggestion is accepted (and the ZIP is
+    known) or when the ZIP is entered for an existing cart. Uncached items
+    are queued as low-priority scrapes on the background lane, which workers
+    only serve when no cart is waiting, so most items are cached by the time
+    POST /api/cart arrives.
+    
+    Best effort: never blocks, never fails the user flow.
+    """
+    if not item_cache:
+        return {'status': 'disabled', 'items': {}}
+    
+    outcome = {}
+    for item in request.items:
+        item = item.strip()
+        if item:
+            outcome[item] = item_cache.prefetch(item, request.zipcode, request.prioritize_nearby)
+    
+    queued = sum(1 for state in outcome.values() if state == 'queued')
+    logger.info(f"🔮 Prefetch hint: {len(outcome)} items in ZIP {request.zipcode} ({queued} queued)")
+    
+    return {'status': 'ok', 'items': outcome}
+
+def mark_seen(job_id: str):
+    """Record that the job's client is still waiting (workers cancel abandoned jobs)"""
+    try:
+        redis_client.set(f'seen:{job_id}', time.time(), ex=3600)
+    except Exception as e:
+        logger.debug(f"Could not refresh last-seen for {job_id[:8]}: {e}")
+
+# Seconds after submission by which a cart's results should be ready:
+# CART_DEADLINE_SECONDS plus CART_DEADLINE_PER_ITEM for each item, so large
+# carts (which also wait longer in the queue) aren't cut short. Workers skip
+# remaining cache misses once it passes and return partial results.
+CART_DEADLINE_SECONDS = int(os.environ.get('CART_DEADLINE_SECONDS', 60))
+CART_DEADLINE_PER_ITEM = float(os.environ.get('CART_DEADLINE_PER_ITEM', 10))
+
+def cart_deadline_seconds(item_count: int) -> float:
+    """Time budget for a cart of item_count items, counted from submission"""
+    return CART_DEADLINE_SECONDS + CART_DEADLINE_PER_ITEM * item_count
+
+# Identical carts (same items, ZIP and preference) within this window share one job
+CART_DEDUP_WINDOW = int(os.environ.get('CART_DEDUP_WINDOW', 120))
+IDEMPOTENCY_KEY_TTL = 3600  # Explicit keys live as long as job status
+
+def cart_idempotency_key(request: CartRequest, explicit_key: Optional[str]) -> tuple:
+    """
+    Redis key and TTL used to detect a duplicate cart submission
+    
+    Uses the client's Idempotency-Key when given, otherwise a digest of
+    the exact items (order-insensitive), ZIP and nearby preference.
+    """
+    if explicit_key:
+        return f"idem:key:{explicit_key}", IDEMPOTENCY_KEY_TTL
+    
+    digest = hashlib.sha1(json.dumps(
+        [sorted(request.items), request.zipcode, request.prioritize_nearby]
+    ).encode('utf-8')).hexdigest()
+    return f"idem:cart:{digest}", CART_DEDUP_WINDOW
+
+# Hand an idempotency key from a stale job to a new one, only if it still
+# names the stale job (another retry may have replaced it first)
+# KEYS: idempotency key   ARGV: stale job_id, new job_id, TTL
+_REPLACE_STALE_CLAIM_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current == false or current == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+replace_stale_claim = redis_client.register_script(_REPLACE_STALE_CLAIM_SCRIPT) if redis_client else None
+
+def find_live_job(job_id: str) -> Optional[str]:
+    """
+    Status of an earlier job if a duplicate can reuse it
+    
+    Queued, processing and completed jobs (within retention) can be reused;
+    failed, cancelled or expired ones cannot (the cart is queued again).
+    """
+    job = job_store.get(job_id)
+    if job is not None and (job.is_active or job.status == 'complete'):
+        return job.status
+    return None
+
+def client_identity(http_request: Request, explicit_id: Optional[str]) -> str:
+    """Who submitted a cart, for per-client fairness (X-Client-Id header, else IP)"""
+    if explicit_id:
+        return explicit_id
+    return http_request.client.host if http_request.client else 'unknown'
+
 @app.post("/api/cart")
-async def submit_cart(request: CartRequest):
+async def submit_cart(
+    request: CartRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(default=None, max_length=128),
+    x_client_id: Optional[str] = Header(default=None, max_length=64)
+):
     """
     Submit a cart for scraping - returns job_id instantly
     
     QUEUE MODE (default with Redis):
-    - Job added to Redis queue
+    - Job added to a priority lane (small or large cart) under its client,
+      or split into per-item tasks ordered by deadline (DISPATCH_MODE=edf),
+      see scheduler.py
+    - With WORKER_GROUPS set, routed to the worker group that owns the
+      ZIP's region (affinity.py)
     - Returns job_id immediately (< 100ms)
     - Client polls GET /results/{job_id} to get results
     - Workers process jobs in background
     
+    DUPLICATES:
+    - Resubmitting with the same Idempotency-Key header, or the same cart
+      (items + ZIP + nearby) within CART_DEDUP_WINDOW seconds, returns the
+      existing job_id and status instead of queueing another job
+    
     DIRECT MODE (if Redis unavailable):
     - Scrapes immediately (blocks for 20-30s)
     - Returns results directly
@@ -351,9 +501,32 @@ async def submit_cart(request: CartRequest):
     
     # QUEUE MODE (with Redis)
     if redis_client:
+        # Generate unique job ID
+        job_id = str(uuid.uuid4())
+        claimed_key = None
         try:
-            # Generate unique job ID
-            job_id = str(uuid.uuid4())
+            # Claim the idempotency key; if taken, reuse the earlier job while it's live
+            idem_key, idem_ttl = cart_idempotency_key(request, idempotency_key)
+            if not redis_client.set(idem_key, job_id, nx=True, ex=idem_ttl):
+                existing_id = redis_client.get(idem_key)
+                existing_status = find_live_job(existing_id) if existing_id else None
+                if existing_status is None and not replace_stale_claim(
+                    keys=[idem_key], args=[existing_id or '', job_id, idem_ttl]
+                ):
+                    # A concurrent retry replaced the stale job first: its job wins
+                    existing_id = redis_client.get(idem_key)
+                    existing_status = (find_live_job(existing_id) or 'queued') if existing_id else None
+                if existing_status is not None:
+                    mark_seen(existing_id)
+                    redis_client.hincrby('stats:idempotency', 'suppressed', 1)
+                    logger.info(f"♻️  Duplicate cart → existing job {existing_id[:8]}... ({existing_status})")
+                    return {
+                        'job_id': existing_id,
+                        'status': existing_status,
+                        'duplicate': True,
+                        'message': f'Duplicate submission. Poll GET /results/{existing_id} for results.'
+                    }
+            claimed_key = idem_key
             
             # Create job data
             job_data = {
@@ -362,40 +535,56 @@ async def submit_cart(request: CartRequest):
                 'zip_code': request.zipcode,  # CRITICAL: User's location
                 'prioritize_nearby': request.prioritize_nearby,  # User's preference
                 'submitted_at': datetime.now().isoformat(),
+                'deadline': time.time() + cart_deadline_seconds(len(request.items)),
                 'max_products_per_item': 50
             }
             
-            # Push to Redis queue
-            redis_client.lpush('scrape_queue', json.dumps(job_data))
+            # Set initial status before queueing, so a fast worker's
+            # "processing" is never overwritten with "queued"
+            job_store.create(
+                job_id, request.zipcode, request.items, job_data['submitted_at'],
+                tasks=len(request.items) if scheduler.mode == DISPATCH_EDF else None
+            )
             
-            # Set initial status
-            redis_client.setex(
-                f'status:{job_id}',
-                3600,  # 1 hour expiry
-                json.dumps({
-                    'status': 'queued',
-                    'submitted_at': job_data['submitted_at'],
-                    'zip_code': request.zipcode,
-                    'items': request.items
-                })
+            # Push to the cart's lane (small carts aren't stuck behind big ones),
+            # or as item tasks ordered by deadline in EDF mode
+            mark_seen(job_id)
+            lane, lane_depth = scheduler.enqueue_cart(
+                job_data,
+                client_identity(http_request, x_client_id),
+                group=router.group_for(request.zipcode)
             )
             
+            # Feed the cache warmer's popularity counters (best effort)
+            try:
+                popularity.record_cart(request.items, request.zipcode)
+            except Exception as e:
+                logger.warning(f"⚠️  Could not record popularity: {e}")
+            
             # Estimate time based on queue size
-            queue_length = redis_client.llen('scrape_queue')
             estimated_time = len(request.items) * 2  # ~2s per item
             
-            logger.info(f"✅ Job {job_id[:8]}... queued (queue length: {queue_length})")
+            logger.info(f"✅ Job {job_id[:8]}... queued in {lane} (lane depth: {lane_depth})")
             
             return {
                 'job_id': job_id,
                 'status': 'queued',
+                'lane': lane,
                 'estimated_time_seconds': estimated_time,
-                'queue_position': queue_length,
+                'queue_position': lane_depth,
                 'message': f'Job queued. Poll GET /results/{job_id} for results.'
             }
         
         except Exception as e:
             logger.error(f"❌ Failed to queue job: {e}")
+            record_error('queue', e)
+            # Don't leave retries pointed at a job that will never run
+            try:
+                if claimed_key:
+                    redis_client.delete(claimed_key)
+                job_store.discard(job_id)
+            except Exception as cleanup_error:
+                logger.warning(f"⚠️  Could not clean up job {job_id[:8]}...: {cleanup_error}")
             logger.warning("⚠️  Falling back to DIRECT mode...")
             # Fall through to direct mode
     
@@ -410,61 +599,100 @@ async def submit_cart(request: CartRequest):
             use_parallel=False  # Sequential is safer for direct mode
         )
         
-        # Convert to response format
-        items_dict = {}
-        total_cost = 0.0
-        store_breakdown = {}
-        
-        for item in request.items:
-            products = scrape_results.get(item, [])
-            
-            if products:
-                # Get cheapest product
-                cheapest_raw = min(products, key=lambda p: p['price'])
-                cheapest = Product(
-                    title=cheapest_raw.get('name'),
-                    price=cheapest_raw.get('price'),
-                    merchant=cheapest_raw.get('merchant', 'Unknown'),
-                    rating=cheapest_raw.get('rating'),
-                    review_count=cheapest_raw.get('review_count')
-                )
-                items_dict[item] = cheapest
-                total_cost += cheapest.price
-                
-                # Track by store
-                merchant = cheapest.merchant
-                store_breakdown[merchant] = store_breakdown.get(merchant, 0) + cheapest.price
+        # Same shape as a completed queued job: summary (ties, savings) from
+        # summarize_cart, full counts, and the product lists cheapest first
+        results = {item: to_wire(by_price(scrape_results.get(item, []))) for item in request.items}
         
-        return {
+        return JSONResponse({
             'status': 'complete',
             'mode': 'direct',
-            'results': {
-                'items': items_dict,
-                'total_cost': round(total_cost, 2),
-                'total_savings': 0.0,
-                'store_breakdown': store_breakdown
-            }
-        }
+            'summary': summarize_cart(results),
+            'product_counts': {item: len(products) for item, products in results.items()},
+            'results': results
+        })
     
     except Exception as e:
         logger.error(f"❌ Direct scraping failed: {e}")
+        record_error('direct_scrape', e, backend='uc')
         raise HTTPException(
             status_code=500,
             detail=f"Failed to scrape products: {str(e)}"
         )
 
 
+RESULT_SORTS = ('price', 'price_desc', 'rating')
+
+def shape_results(
+    results: Dict[str, List[Dict]],
+    top_k: Optional[int],
+    sort: str,
+    fields: Optional[List[str]],
+    ties: bool = True
+) -> Dict[str, List[Dict]]:
+    """
+    Sort, slice and project worker results for one poll response.
+    
+    Workers store every item's products cheapest first, so the default
+    sort is a plain slice.
+    
+    Args:
+        results: item -> products (wire format, cheapest first)
+        top_k: Max products per item (None = all)
+        sort: "price", "price_desc" or "rating"
+        fields: Product keys to keep (None = all)
+        ties: With sort="price", keep products tied with the k-th price
+              (so the best-price group is never cut in half)
+    """
+    shaped = {}
+    for item, products in results.items():
+        if sort == 'price_desc':
+            products = products[::-1]
+        elif sort == 'rating':
+            products = sorted(products, key=lambda p: -(p.get('rating') or 0))
+        
+        if top_k is not None and len(products) > top_k:
+            cut = top_k
+            if ties and sort == 'price':
+                boundary = products[top_k - 1].get('price')
+                while cut < len(products) and products[cut].get('price') == boundary:
+                    cut += 1
+            products = products[:cut]
+        
+        if fields:
+            products = [{f: p.get(f) for f in fields} for p in products]
+        shaped[item] = products
+    return shaped
+
+
 @app.get("/api/results/{job_id}")
-async def get_job_results(job_id: str):
+async def get_job_results(
+    job_id: str,
+    top_k: Optional[int] = Query(default=None, ge=1, le=50, description="Max products per item"),
+    sort: str = Query(default='price', description="price (default), price_desc or rating"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated product fields, e.g. name,price,merchant"),
+    ties: bool = Query(default=True, description="With sort=price, keep products tied with the k-th price"),
+    summary_only: bool = Query(default=False, description="Return the cart summary without product lists")
+):
     """
     Get results for a queued job
     
+    Optional shaping (applied to completed results):
+    - top_k: only the first k products per item (plus price ties)
+    - sort: price (cheapest first, default), price_desc, rating
+    - fields: only these product keys (e.g. "name,price,merchant,location")
+    - summary_only: return just the worker-computed cart summary
+    `product_counts` always reports how many products each item has in total,
+    and `summary` holds the cheapest product per item, totals and store breakdown.
+    
     Responses:
     - {"status": "queued"} - Job waiting in queue
-    - {"status": "processing", "progress": "..."} - Job being scraped
+    - {"status": "processing", "item_status": {...}, "results": {...}} - Job being
+      scraped; results holds the items finished so far
     - {"status": "complete", "results": {...}} - Job done!
     - {"status": "failed", "error": "..."} - Job failed
-    - {"status": "not_found"} - Job ID invalid or expired
+    - {"status": "cancelled", "error": "..."} - Job abandoned (client stopped polling)
+    - {"status": "not_found"} - Job ID invalid or expired (finished jobs are
+      kept for JOB_RESULT_RETENTION seconds, default 15 minutes)
     """
     
     if not redis_client:
@@ -473,56 +701,82 @@ async def get_job_results(job_id: str):
             detail="Results endpoint requires Redis. API is running in DIRECT mode."
         )
     
-    # Check for completed results first
-    result = redis_client.get(f'result:{job_id}')
-    if result:
-        result_data = json.loads(result)
-        
-        if result_data.get('status') == 'complete':
-            # Convert results to proper format
-            results = result_data.get('results', {})
-            
-            # DEBUG: Log first product's price
-            if results:
-                first_item = list(results.keys())[0]
-                if results[first_item]:
-                    first_price = results[first_item][0].get('price')
-                    logger.info(f"📊 API returning results - First product price: ${first_price} ({type(first_price)})")
-            
-            return {
-                'status': 'complete',
-                'results': results,
-                'zip_code': result_data.get('zip_code'),
-                'total_time': result_data.get('total_time'),
-                'worker_id': result_data.get('worker_id'),
-                'completed_at': result_data.get('completed_at')
-            }
-        else:
-            # Failed
-            return {
-                'status': 'failed',
-                'error': result_data.get('error', 'Unknown error'),
-                'worker_id': result_data.get('worker_id')
-            }
+    if sort not in RESULT_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(RESULT_SORTS)}")
     
-    # Check status
-    status = redis_client.get(f'status:{job_id}')
-    if status:
-        status_data = json.loads(status)
+    field_list = None
+    if fields:
+        field_list = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in field_list if f not in PRODUCT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown product fields: {', '.join(unknown)}")
+    
+    # Status, result and per-item products in one round trip; a summary-only
+    # poll of a completed job reads just the cart-level fields
+    job = job_store.get_summary(job_id) if summary_only else None
+    if job is None or job.status != 'complete' or 'product_counts' not in job.result:
+        job = job_store.get(job_id)
+    if job is None:
         return {
-            'status': status_data.get('status'),
-            'zip_code': status_data.get('zip_code'),
-            'items': status_data.get('items'),
-            'submitted_at': status_data.get('submitted_at'),
-            'started_at': status_data.get('started_at'),
-            'worker_id': status_data.get('worker_id')
+            'status': 'not_found',
+            'message': f'Job ID not found or expired (results kept for {JOB_RESULT_RETENTION // 60} minutes)'
         }
     
-    # Not found
-    return {
-        'status': 'not_found',
-        'message': 'Job ID not found or expired (results kept for 1 hour)'
+    # Every poll of a live job tells workers the client is still waiting
+    # (only known jobs: unknown IDs must not create seen: keys)
+    if job.is_active:
+        mark_seen(job_id)
+    
+    if job.status in ('failed', 'cancelled'):
+        # Failed, or cancelled after the client stopped polling
+        return {
+            'status': job.status,
+            'error': job.info.get('error', 'Unknown error'),
+            'worker_id': job.info.get('worker_id')
+        }
+    
+    results = job.ordered_results()
+    
+    if job.status == 'complete':
+        result = job.result
+        response = {
+            'status': 'complete',
+            'summary': result.get('summary'),
+            # Stored by the worker (computed here for results written by older workers)
+            'product_counts': result.get('product_counts') or {item: len(products) for item, products in results.items()},
+            'stale_items': result.get('stale_items', {}),  # item -> cache age (seconds)
+            'partial': result.get('partial', False),
+            'skipped_items': result.get('skipped_items', []),  # Not scraped before the deadline
+            'zip_code': job.info.get('zip_code'),
+            'total_time': result.get('total_time'),
+            'worker_id': job.info.get('worker_id'),
+            'completed_at': job.info.get('finished_at')
+        }
+        if not summary_only:
+            response['results'] = shape_results(results, top_k, sort, field_list, ties)
+        
+        # Worker results are already wire-format JSON; skip FastAPI's
+        # jsonable_encoder pass over every product
+        return JSONResponse(response)
+    
+    response = {
+        'status': job.status,
+        'zip_code': job.info.get('zip_code'),
+        'items': job.items,
+        'submitted_at': job.info.get('submitted_at'),
+        'started_at': job.info.get('started_at'),
+        'worker_id': job.info.get('worker_id')
     }
+    
+    # Items the worker has already finished (rendered progressively)
+    if job.status == 'processing':
+        response['item_status'] = job.item_status
+        response['product_counts'] = {item: len(products) for item, products in results.items()}
+        if not summary_only:
+            response['results'] = shape_results(results, top_k, sort, field_list, ties)
+        return JSONResponse(response)
+    
+    return response
 
 @app.get("/products/{product_id}")
 async def get_product(product_id: str):
@@ -540,7 +794,7 @@ async def health_check():
         try:
             redis_client.ping()
             redis_healthy = True
-            queue_size = redis_client.llen('scrape_queue')
+            queue_size = scheduler.depth(INTERACTIVE_LANES)
         except:
             pass
     
@@ -554,6 +808,49 @@ async def health_check():
         }
     }
 
+@app.get("/api/workers")
+async def workers_endpoint():
+    """
+    Live worker fleet from heartbeats (see worker_registry.py)
+    
+    Each worker reports its backend, state, current job/item, jobs
+    completed, browser age, RSS and last error; "capacity" is the
+    throughput estimate (live workers x measured seconds per item).
+    """
+    if not registry:
+        raise HTTPException(status_code=501, detail="Worker registry requires Redis")
+    
+    workers = registry.live_workers()
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'workers': workers,
+        'capacity': registry.capacity(workers)
+    }
+
+@app.get("/api/cache/regions")
+async def cache_region_stats():
+    """
+    Per-cluster item cache hit statistics (for tuning ZIP_CLUSTER_RADIUS_MILES)
+    
+    "sibling" hits are results served from a neighboring ZIP in the same
+    store region; a high miss rate with few sibling hits suggests the
+    radius is too small, a low store overlap suggests it is too large.
+    """
+    if not item_cache:
+        raise HTTPException(status_code=501, detail="Cache statistics require Redis")
+    
+    clusters = item_cache.clusterer.cluster_stats()
+    for counts in clusters.values():
+        lookups = sum(counts.values())
+        counts['hit_rate'] = round((counts['exact'] + counts['sibling']) / lookups, 3) if lookups else 0.0
+    
+    return {
+        'radius_miles': item_cache.clusterer.radius_miles,
+        'min_overlap': item_cache.clusterer.min_overlap,
+        'sibling_ttl_seconds': item_cache.sibling_ttl,
+        'clusters': clusters
+    }
+
 @app.get("/api/monitor")
 async def monitor_endpoint():
     """
@@ -562,12 +859,36 @@ async def monitor_endpoint():
     """
     redis_status = "disconnected"
     queue_size = 0
+    lanes = {}
+    edf = {}
+    groups = {}
+    affinity = {}
+    duplicates_suppressed = 0
+    cancellation = {}
+    deadlines = {}
+    capacity = {}
+    jobs = {}
+    series = []
+    error_rates = {}
     
     if redis_client:
         try:
             redis_client.ping()
             redis_status = "connected"
-            queue_size = redis_client.llen('scrape_queue')
+            lanes = scheduler.depths()
+            queue_size = sum(depth for lane, depth in lanes.items() if lane != BACKGROUND)  # EDF counts item tasks
+            if scheduler.mode == DISPATCH_EDF:
+                edf = scheduler.edf_stats()
+            if scheduler.groups:
+                groups = scheduler.group_depths()
+                affinity = scheduler.affinity_stats()
+            duplicates_suppressed = int(redis_client.hget('stats:idempotency', 'suppressed') or 0)
+            cancellation = redis_client.hgetall('stats:cancellation')
+            deadlines = redis_client.hgetall('stats:deadlines')
+            capacity = registry.capacity()
+            jobs = job_store.metrics.snapshot()
+            series = job_store.metrics.series(15)
+            error_rates = errors.rates(5)
         except Exception as e:
             redis_status = f"error: {str(e)}"
     
@@ -580,9 +901,33 @@ async def monitor_endpoint():
         "redis": {
             "status": redis_status,
             "queue_size": queue_size,
+            "lanes": lanes,
+            "lane_weights": scheduler.weights if scheduler else {},
+            "dispatch_mode": scheduler.mode if scheduler else None,
+            "edf_tasks_claimed": int(edf.get('claimed', 0)),
+            "edf_tasks_claimed_late": int(edf.get('claimed_late', 0)),
+            "edf_tasks_finished_late": int(edf.get('finished_late', 0)),
+            "edf_items_skipped": int(edf.get('items_skipped', 0)),
+            "edf_mean_claim_lateness_seconds": round(edf['lateness_seconds'] / edf['claimed_late'], 2) if edf.get('claimed_late') else 0.0,
+            "worker_groups": groups,  # group -> jobs waiting ("" = ungrouped)
+            "affinity_local": affinity.get('local', 0),
+            "affinity_stolen": affinity.get('stolen', 0),
+            "duplicates_suppressed": duplicates_suppressed,
+            "abandoned_jobs_cancelled": int(cancellation.get('jobs', 0)),
+            "abandoned_items_skipped": int(cancellation.get('items_skipped', 0)),
+            "partial_jobs_deadline": int(deadlines.get('partial_jobs', 0)),
+            "deadline_items_skipped": int(deadlines.get('items_skipped', 0)),
+            "live_workers": capacity.get('live_workers', 0),
+            "busy_workers": capacity.get('busy_workers', 0),
+            "worker_item_seconds": capacity.get('item_seconds', 0.0),
             "host": redis_host,
             "port": redis_port
         },
+        "jobs": {
+            **jobs,
+            "per_minute": series  # Last 15 minutes, oldest first (counters, no SCAN)
+        },
+        "errors": error_rates,  # Last 5 minutes by stage / backend / error class
         "cache": {
             "size": len(cache),
             "ttl_seconds": CACHE_TTL
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Cache Codec Benchmark
+
+Compares the item cache's compact encoding (cache_codec.py) with the plain
+JSON entries it replaced: bytes per entry and encode/decode time.
+
+By default it uses the real product sets in serpapi_full_cart_test.json
+(one entry per item). No Redis needed. Run it with msgpack and zstandard
+installed: the JSON / zlib fallback is about the same size as plain JSON.
+
+Usage:
+    python3 benchmark_cache_codec.py [results.json] [--rounds N]
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+from typing import Callable, Dict, List
+
+from cache_codec import codec_name, decode_entry, encode_entry
+from product import ProductRecord, from_wire, to_wire
+
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'serpapi_full_cart_test.json')
+
+
+def load_entries(path: str) -> List[List[ProductRecord]]:
+    """One ProductRecord list per item from a {item: [products]} results file"""
+    with open(path) as f:
+        data = json.load(f)
+    entries = [from_wire(products) for products in data.values() if isinstance(products, list) and products]
+    if not entries:
+        raise SystemExit(f"No product lists found in {path}")
+    return entries
+
+
+def _meta() -> Dict:
+    return {'cached_at': time.time(), 'soft_ttl': 3600, 'zip_code': '33773'}
+
+
+def _json_encode(products: List[ProductRecord]) -> bytes:
+    return json.dumps({**_meta(), 'products': to_wire(products)}).encode('utf-8')
+
+
+def _json_zlib_encode(products: List[ProductRecord]) -> bytes:
+    return zlib.compress(_json_encode(products), 6)
+
+
+def _time_per_call(fn: Callable, args: List, rounds: int) -> float:
+    """Mean microseconds per call of fn over every arg, repeated `rounds` times"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for arg in args:
+            fn(arg)
+    return (time.perf_counter() - start) / (rounds * len(args)) * 1e6
+
+
+def main():
+    args = sys.argv[1:]
+    rounds = 200
+    if '--rounds' in args:
+        i = args.index('--rounds')
+        rounds = int(args[i + 1])
+        del args[i:i + 2]
+
+    path = args[0] if args else DEFAULT_SAMPLE
+    entries = load_entries(path)
+    products_per_entry = sum(len(e) for e in entries) / len(entries)
+
+    # Sanity check: the compact encoding must round-trip exactly
+    for products in entries:
+        _, decoded = decode_entry(encode_entry(_meta(), products))
+        assert decoded == products, "cache_codec round trip changed the products"
+
+    encodings = [
+        ('json (previous)', _json_encode, lambda b: json.loads(b)),
+        ('json+zlib', _json_zlib_encode, lambda b: json.loads(zlib.decompress(b))),
+        (codec_name(), lambda p: encode_entry(_meta(), p), decode_entry),
+    ]
+
+    print("=" * 72)
+    print(f"📦 Item cache encoding benchmark: {len(entries)} entries, "
+          f"{products_per_entry:.1f} products/entry, {rounds} rounds")
+    print("=" * 72)
+    print(f"{'encoding':<28}{'bytes/entry':>12}{'ratio':>8}{'encode µs':>12}{'decode µs':>12}")
+
+    baseline = None
+    for name, encode, decode in encodings:
+        encoded = [encode(products) for products in entries]
+        size = sum(len(e) for e in encoded) / len(encoded)
+        baseline = baseline or size
+        encode_us = _time_per_call(encode, entries, rounds)
+        decode_us = _time_per_call(decode, encoded, rounds)
+        print(f"{name:<28}{size:>12.0f}{baseline / size:>7.1f}x{encode_us:>12.1f}{decode_us:>12.1f}")
+
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
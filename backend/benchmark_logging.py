@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Logging Overhead Benchmark
+
+Measures what logging costs the scrape hot path per item: the log calls a
+worker makes while resolving one item (item start, SerpAPI request and
+result count, per-product parsing, item done), replayed against
+
+- the previous setup: DEBUG level, synchronous stdout + stderr handlers
+  (every line written twice) and an INFO line per parsed product
+- log_setup.py at INFO: queue handler, JSON written by a background thread,
+  per-product lines at DEBUG
+- log_setup.py at DEBUG: as above with the per-product lines sampled and
+  rate limited (LOG_DEBUG_PER_SECOND)
+
+"caller µs" is time spent in the worker's own thread; "drain µs" is the
+time to flush what was still queued when the run ended (written by the
+background thread, off the hot path).
+Output goes to /dev/null. Products come from serpapi_full_cart_test.json.
+
+Usage:
+    python3 benchmark_logging.py [results.json] [--items N]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from typing import Dict, List
+
+from log_setup import TEXT_FORMAT, configure_logging, shutdown_logging
+
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'serpapi_full_cart_test.json')
+
+logger = logging.getLogger('serpapi_scraper')
+
+
+def load_results(path: str) -> List[List[Dict]]:
+    """Raw SerpAPI-shaped results (title, price, source, extensions) per item"""
+    with open(path) as f:
+        data = json.load(f)
+    items = []
+    for products in data.values():
+        if not isinstance(products, list) or not products:
+            continue
+        items.append([
+            {
+                'title': p.get('name', ''),
+                'extracted_price': p.get('price', 0),
+                'source': p.get('merchant', ''),
+                'extensions': ['In store, Tampa'] if i % 2 == 0 else ['Free delivery']
+            }
+            for i, p in enumerate(products)
+        ])
+    if not items:
+        raise SystemExit(f"No product lists found in {path}")
+    return items
+
+
+def resolve_item(item: str, results: List[Dict], per_product_info: bool):
+    """The log calls made while scraping one item (previous or current code)"""
+    logger.info(f"[worker-1] Scraping item 1/5: {item}")
+    logger.info(f"🔍 SerpAPI search: '{item} 33773' (prioritize_nearby=True)")
+    logger.info(f"📦 Got {len(results)} total results from SerpAPI")
+    for result in results:
+        extensions = result['extensions']
+        is_in_store = any('in store' in ext.lower() for ext in extensions)
+        if per_product_info:
+            logger.info(f"   🔍 {result['source']}: extensions={extensions}, is_in_store={is_in_store}")
+        if is_in_store:
+            logger.debug(f"   📍 {result['source']}: {extensions[0]}")
+    logger.info(f"✅ Parsed {len(results)} products")
+    logger.info(f"   ✓ {item}: {len(results)} products (scraped, 2.1s)")
+
+
+def _previous_setup(devnull):
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for _ in range(2):  # stdout + stderr
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+
+
+def run(label: str, setup, items: List[List[Dict]], count: int, per_product_info: bool, devnull) -> Dict:
+    setup(devnull)
+    start = time.perf_counter()
+    for i in range(count):
+        resolve_item(f"item {i}", items[i % len(items)], per_product_info)
+    caller = time.perf_counter() - start
+
+    start = time.perf_counter()
+    shutdown_logging()  # Drains the queue (no-op for the previous setup)
+    drain = time.perf_counter() - start
+    return {'label': label, 'caller_us': caller / count * 1e6, 'drain_us': drain / count * 1e6}
+
+
+def main():
+    args = sys.argv[1:]
+    count = 2000
+    if '--items' in args:
+        i = args.index('--items')
+        count = int(args[i + 1])
+        del args[i:i + 2]
+
+    items = load_results(args[0] if args else DEFAULT_SAMPLE)
+    products_per_item = sum(len(r) for r in items) / len(items)
+
+    with open(os.devnull, 'w') as devnull:
+        runs = [
+            run('DEBUG, stdout+stderr (previous)', _previous_setup, items, count, True, devnull),
+            run('log_setup INFO', lambda out: configure_logging('worker', level='INFO', levels={}, stream=out),
+                items, count, False, devnull),
+            run('log_setup DEBUG (sampled)', lambda out: configure_logging('worker', level='DEBUG', levels={}, stream=out),
+                items, count, False, devnull),
+        ]
+
+    logging.getLogger().handlers.clear()
+    print("=" * 72)
+    print(f"📝 Logging overhead per item: {count} items, {products_per_item:.1f} products/item")
+    print("=" * 72)
+    print(f"{'setup':<36}{'caller µs':>12}{'drain µs':>12}{'speedup':>10}")
+    baseline = runs[0]['caller_us']
+    for result in runs:
+        print(f"{result['label']:<36}{result['caller_us']:>12.1f}{result['drain_us']:>12.1f}"
+              f"{baseline / result['caller_us']:>9.1f}x")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Cache Codec
+
+Compact binary encoding for item cache entries stored in Redis.
+
+A cached entry is 20-50 products that repeat the same keys (name,
+price, merchant, rating, review_count, ...) and the same handful of merchant
+strings. Instead of storing verbose JSON, entries are written column by
+column:
+
+    {"v": 1, "kind": "record", "n": rows, "meta": {...},
+     "cols": {"name": [...], "price": [...], ...},
+     "absent": {"location": [row, ...]},      # rows missing that key
+     "tables": {"merchant": ["Walmart", ...]}} # interned string columns
+
+ProductRecords are stored one column per slot and decoded straight back
+into records ("kind": "record"); plain dicts keep their own keys.
+Interned columns (merchant, location) hold indices into their string table.
+The columnar document is serialized with msgpack and compressed with zstd.
+Without those packages it falls back to JSON / zlib, which is only about
+as small as the legacy JSON entries: the size gain comes from msgpack+zstd.
+
+Wire format: MAGIC + serializer byte + compressor byte + payload. Values
+without the magic prefix are read as the legacy JSON entries, so existing
+cache keys keep working until they expire.
+
+Dependencies (install on every API and worker host: a reader without them
+can't decode entries written with them, and treats them as misses):
+    pip3 install msgpack zstandard
+"""
+
+import os
+import json
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from product import FIELDS, ProductRecord
+
+try:
+    import msgpack
+except ImportError:  # JSON serializer is used instead (see module docstring)
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zlib compressor is used instead (see module docstring)
+    zstandard = None
+
+MAGIC = b'\xc5C'
+FORMAT_VERSION = 1
+
+SERIALIZER_JSON = b'j'
+SERIALIZER_MSGPACK = b'm'
+COMPRESSOR_NONE = b'n'
+COMPRESSOR_ZLIB = b'z'
+COMPRESSOR_ZSTD = b's'
+
+INTERNED_COLUMNS = ('merchant', 'location')
+ZSTD_LEVEL = int(os.getenv('ITEM_CACHE_ZSTD_LEVEL', 3))
+ZLIB_LEVEL = 6
+MIN_COMPRESS_BYTES = 128  # Tiny payloads grow when compressed
+
+_zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+# False when this host writes (and can only read) the JSON / zlib fallback
+COMPACT_CODEC = msgpack is not None and zstandard is not None
+
+
+def _intern(cols: Dict[str, List]) -> Dict[str, List[str]]:
+    """Replace string values of INTERNED_COLUMNS with indices into a table (in place)"""
+    tables: Dict[str, List[str]] = {}
+    for key in INTERNED_COLUMNS:
+        column = cols.get(key)
+        if not column or not all(v is None or isinstance(v, str) for v in column):
+            continue
+        index: Dict[str, int] = {}
+        for value in column:
+            if value is not None and value not in index:
+                index[value] = len(index)
+        tables[key] = list(index)
+        cols[key] = [None if v is None else index[v] for v in column]
+    return tables
+
+
+def _to_columns(products: List) -> Tuple[str, Dict, Dict]:
+    """
+    Split products into columns.
+
+    Returns:
+        (kind, cols, absent): kind is "record" when every product is a
+        ProductRecord (one column per slot, nothing absent), else "dict"
+    """
+    if all(isinstance(p, ProductRecord) for p in products):
+        rows = [p.values() for p in products]
+        columns = list(zip(*rows)) if rows else [()] * len(FIELDS)
+        return 'record', {field: list(col) for field, col in zip(FIELDS, columns)}, {}
+
+    keys: List[str] = []
+    for product in products:
+        for key in product:
+            if key not in keys:
+                keys.append(key)
+
+    cols: Dict[str, List] = {}
+    absent: Dict[str, List[int]] = {}
+    for key in keys:
+        cols[key] = [p.get(key) for p in products]
+        missing = [row for row, p in enumerate(products) if key not in p]
+        if missing:
+            absent[key] = missing
+    return 'dict', cols, absent
+
+
+def _from_columns(kind: str, rows: int, cols: Dict, absent: Dict, tables: Dict) -> List:
+    """Rebuild products from columns (inverse of _to_columns)"""
+    for key, table in tables.items():
+        cols[key] = [None if v is None else table[v] for v in cols[key]]
+
+    if kind == 'record':
+        empty = [None] * rows
+        columns = [cols.get(field, empty) for field in FIELDS]
+        return [ProductRecord(*values) for values in zip(*columns)]
+
+    products: List[Dict] = [{} for _ in range(rows)]
+    for key, column in cols.items():
+        missing = set(absent.get(key, ()))
+        for row, value in enumerate(column):
+            if row not in missing:
+                products[row][key] = value
+    return products
+
+
+def encode_entry(meta: Dict, products: List[Dict]) -> bytes:
+    """
+    Encode a cache entry (metadata + full product set) for Redis.
+
+    Args:
+        meta: Small JSON-able metadata (cached_at, soft_ttl, zip_code, ...)
+        products: ProductRecords (or plain product dicts)
+
+    Returns:
+        Compact bytes (see module docstring for the format)
+    """
+    kind, cols, absent = _to_columns(products)
+    tables = _intern(cols)
+    document = {
+        'v': FORMAT_VERSION,
+        'kind': kind,
+        'n': len(products),
+        'meta': meta,
+        'cols': cols,
+        'absent': absent,
+        'tables': tables
+    }
+
+    if msgpack is not None:
+        serializer = SERIALIZER_MSGPACK
+        payload = msgpack.packb(document, use_bin_type=True)
+    else:
+        serializer = SERIALIZER_JSON
+        payload = json.dumps(document, separators=(',', ':')).encode('utf-8')
+
+    compressor = COMPRESSOR_NONE
+    if len(payload) >= MIN_COMPRESS_BYTES:
+        if _zstd_compressor is not None:
+            compressor = COMPRESSOR_ZSTD
+            payload = _zstd_compressor.compress(payload)
+        else:
+            compressor = COMPRESSOR_ZLIB
+            payload = zlib.compress(payload, ZLIB_LEVEL)
+
+    return MAGIC + serializer + compressor + payload
+
+
+def decode_entry(data) -> Tuple[Dict, List[Dict]]:
+    """
+    Decode a value written by encode_entry() (or a legacy JSON entry).
+
+    Args:
+        data: Raw bytes from Redis
+
+    Returns:
+        (meta, products). Products come back as ProductRecords if they were
+        stored as records, else as dicts. For legacy JSON entries meta is
+        every key except "products".
+
+    Raises:
+        ValueError: If the value uses a serializer/compressor that is not
+            installed here, or is corrupt
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    if not data.startswith(MAGIC):
+        legacy = json.loads(data)
+        products = legacy.pop('products', [])
+        return legacy, products
+
+    serializer = data[len(MAGIC):len(MAGIC) + 1]
+    compressor = data[len(MAGIC) + 1:len(MAGIC) + 2]
+    payload = data[len(MAGIC) + 2:]
+
+    if compressor == COMPRESSOR_ZSTD:
+        if _zstd_decompressor is None:
+            raise ValueError("Entry is zstd-compressed but zstandard is not installed")
+        payload = _zstd_decompressor.decompress(payload)
+    elif compressor == COMPRESSOR_ZLIB:
+        payload = zlib.decompress(payload)
+    elif compressor != COMPRESSOR_NONE:
+        raise ValueError(f"Unknown cache compressor {compressor!r}")
+
+    if serializer == SERIALIZER_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Entry is msgpack-encoded but msgpack is not installed")
+        document = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    elif serializer == SERIALIZER_JSON:
+        document = json.loads(payload)
+    else:
+        raise ValueError(f"Unknown cache serializer {serializer!r}")
+
+    if document.get('v') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported cache format version {document.get('v')}")
+
+    products = _from_columns(
+        document.get('kind', 'dict'), document['n'], document['cols'], document['absent'], document['tables']
+    )
+    return document['meta'], products
+
+
+def codec_name() -> str:
+    """Human-readable name of the encoding new entries get ("columnar msgpack+zstd", ...)"""
+    serializer = 'msgpack' if msgpack is not None else 'json'
+    compressor = 'zstd' if _zstd_compressor is not None else 'zlib'
+    return f"columnar {serializer}+{compressor}"
+
+
+def binary_client(redis_client):
+    """
+    Client sharing redis_client's connection settings but returning raw bytes.
+
+    The rest of the backend uses decode_responses=True, which would try to
+    UTF-8 decode compressed values.
+    """
+    pool = getattr(redis_client, 'connection_pool', None)
+    kwargs: Optional[Dict] = getattr(pool, 'connection_kwargs', None)
+    if kwargs is None or not kwargs.get('decode_responses'):
+        return redis_client
+
+    return type(redis_client)(connection_pool=type(pool)(
+        connection_class=pool.connection_class,
+        **{**kwargs, 'decode_responses': False}
+    ))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Cache Warmer
+
+Pre-scrapes the most popular items for the most active ZIP regions during
+off-peak hours, so peak-hour carts hit a warm item cache.
+
+The warmer never scrapes itself: it queues refreshes on the scheduler's
+background lane (the same one used by stale-while-revalidate), and workers
+pick them up only when no cart is waiting.
+
+Environment variables:
+- REDIS_HOST / REDIS_PORT: Redis server (default: localhost:6379)
+- WARMER_WINDOW: Off-peak hours as "start-end" in local time (default: "2-6")
+- WARMER_DAILY_BUDGET: Max scrapes queued per day (default: 500)
+- WARMER_TOP_REGIONS: Regions to warm per run (default: 10)
+- WARMER_TOP_ITEMS: Items to warm per region (default: 20)
+- WARMER_INTERVAL: Seconds between runs in loop mode (default: 900)
+- WARMER_DECAY: Popularity decay applied after each run (default: 0.9)
+
+Usage:
+    python3 cache_warmer.py          # run forever, warming inside the window
+    python3 cache_warmer.py --once   # single run (for cron), ignores the window
+"""
+
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+from typing import Dict
+
+import redis
+from dotenv import load_dotenv
+
+from item_cache import ItemCache
+from popularity import PopularityTracker
+from scheduler import INTERACTIVE_LANES
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def _parse_window(window: str) -> tuple:
+    """Parse "start-end" hours (e.g. "2-6" or "22-4")"""
+    start, end = window.split('-')
+    return int(start) % 24, int(end) % 24
+
+
+class CacheWarmer:
+    """
+    Queues background scrapes for popular (item, region) pairs within a budget
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        daily_budget: int = 500,
+        top_regions: int = 10,
+        top_items: int = 20,
+        window: str = '2-6',
+        decay: float = 0.9
+    ):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            daily_budget: Max scrapes to queue per calendar day (shared by all warmers)
+            top_regions: Number of regions to warm per run
+            top_items: Number of items to warm per region
+            window: Off-peak hours "start-end" (local time)
+            decay: Factor applied to popularity scores after each run
+        """
+        self.redis_client = redis_client
+        self.item_cache = ItemCache(redis_client)
+        self.popularity = PopularityTracker(redis_client)
+        self.daily_budget = daily_budget
+        self.top_regions = top_regions
+        self.top_items = top_items
+        self.window = _parse_window(window)
+        self.decay = decay
+
+    def in_window(self, now: datetime = None) -> bool:
+        """True if the current hour is inside the off-peak window"""
+        hour = (now or datetime.now()).hour
+        start, end = self.window
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end  # Window wraps midnight
+
+    def _budget_key(self) -> str:
+        return f"warmer:budget:{datetime.now().strftime('%Y%m%d')}"
+
+    def _take_budget(self) -> bool:
+        """Consume one unit of today's budget; False once it's exhausted"""
+        key = self._budget_key()
+        used = self.redis_client.incr(key)
+        if used == 1:
+            self.redis_client.expire(key, 2 * 24 * 3600)
+        if used > self.daily_budget:
+            self.redis_client.decr(key)
+            return False
+        return True
+
+    def run_once(self) -> Dict:
+        """
+        Queue refreshes for the hottest items in the most active regions
+
+        Returns:
+            Dict with counts of queued/fresh/pending items
+        """
+        stats = {'queued': 0, 'fresh': 0, 'pending': 0, 'regions': 0, 'budget_exhausted': False}
+
+        # Don't compete with live traffic even inside the window
+        if self.item_cache.scheduler.depth(INTERACTIVE_LANES) > 0:
+            logger.info("⏸️  Carts are waiting in the queue, skipping this run")
+            return stats
+
+        for region, region_score in self.popularity.top_regions(self.top_regions):
+            zip_code = self.popularity.top_zip(region)
+            if not zip_code:
+                continue
+            stats['regions'] += 1
+
+            for item, item_score in self.popularity.top_items(region, self.top_items):
+                entry = self.item_cache.get(item, zip_code)
+                if entry is not None and not entry.is_stale():
+                    stats['fresh'] += 1
+                    continue
+
+                if not self._take_budget():
+                    stats['budget_exhausted'] = True
+                    logger.info(f"💰 Daily warm budget ({self.daily_budget}) exhausted")
+                    break
+
+                if self.item_cache.request_refresh(item, zip_code):
+                    stats['queued'] += 1
+                else:
+                    stats['pending'] += 1
+
+            if stats['budget_exhausted']:
+                break
+
+        self.popularity.decay(self.decay)
+
+        logger.info(
+            f"🔥 Warm run: {stats['queued']} queued, {stats['fresh']} already fresh, "
+            f"{stats['pending']} pending across {stats['regions']} regions"
+        )
+        return stats
+
+    def run(self, interval: int = 900):
+        """Run forever, warming only inside the off-peak window"""
+        logger.info(f"🔥 Cache warmer started (window {self.window[0]}:00-{self.window[1]}:00, "
+                    f"budget {self.daily_budget}/day)")
+        while True:
+            try:
+                if self.in_window():
+                    self.run_once()
+                else:
+                    logger.debug("Outside off-peak window, sleeping")
+            except KeyboardInterrupt:
+                raise
+            except redis.ConnectionError as e:
+                logger.error(f"❌ Redis connection error: {e}")
+            except Exception as e:
+                logger.error(f"❌ Warm run failed: {e}", exc_info=True)
+            time.sleep(interval)
+
+
+def main():
+    """Entry point for the cache warmer"""
+    redis_client = redis.Redis(
+        host=os.environ.get('REDIS_HOST', 'localhost'),
+        port=int(os.environ.get('REDIS_PORT', 6379)),
+        decode_responses=True
+    )
+
+    warmer = CacheWarmer(
+        redis_client,
+        daily_budget=int(os.environ.get('WARMER_DAILY_BUDGET', 500)),
+        top_regions=int(os.environ.get('WARMER_TOP_REGIONS', 10)),
+        top_items=int(os.environ.get('WARMER_TOP_ITEMS', 20)),
+        window=os.environ.get('WARMER_WINDOW', '2-6'),
+        decay=float(os.environ.get('WARMER_DECAY', 0.9))
+    )
+
+    if '--once' in sys.argv:
+        warmer.run_once()
+    else:
+        try:
+            warmer.run(interval=int(os.environ.get('WARMER_INTERVAL', 900)))
+        except KeyboardInterrupt:
+            logger.info("🛑 Cache warmer stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cart Summary
+
+Computes the cart-level view of a job's results once, in the worker, so the
+API and the browser don't recompute it on every poll or render:
+- cheapest product per item (plus merchants tied at that price)
+- total cost and savings of buying every item at its cheapest price
+- per-merchant subtotals (store breakdown)
+"""
+
+from typing import Dict, List
+
+
+def summarize_cart(results: Dict[str, List[Dict]]) -> Dict:
+    """
+    Summarize per-item results (wire-format products, cheapest first).
+
+    Ties are assigned to the first merchant in the list for the store
+    breakdown; the other merchants at that price are listed in
+    `tied_merchants` so clients can offer them.
+
+    Args:
+        results: item -> products, sorted by price ascending
+
+    Returns:
+        {
+            "items": {item: {cheapest product..., "tied_merchants": [...]}},
+            "total_cost": float,
+            "total_savings": float,
+            "store_breakdown": {merchant: subtotal},
+            "items_found": int,
+            "items_missing": [item, ...]
+        }
+    """
+    items = {}
+    missing = []
+    store_breakdown: Dict[str, float] = {}
+    total_cost = 0.0
+    total_savings = 0.0
+
+    for item, products in results.items():
+        priced = [p for p in products if p.get('price')]
+        if not priced:
+            missing.append(item)
+            continue
+
+        cheapest = priced[0]
+        best_price = cheapest['price']
+        tied = []
+        for product in priced[1:]:
+            if product['price'] != best_price:
+                break
+            merchant = product.get('merchant')
+            if merchant and merchant != cheapest.get('merchant') and merchant not in tied:
+                tied.append(merchant)
+
+        items[item] = {**cheapest, 'tied_merchants': tied}
+        total_cost += best_price
+
+        original_price = cheapest.get('original_price')
+        if original_price and original_price > best_price:
+            total_savings += original_price - best_price
+
+        merchant = cheapest.get('merchant') or 'Unknown'
+        store_breakdown[merchant] = round(store_breakdown.get(merchant, 0.0) + best_price, 2)
+
+    return {
+        'items': items,
+        'total_cost': round(total_cost, 2),
+        'total_savings': round(total_savings, 2),
+        'store_breakdown': store_breakdown,
+        'items_found': len(items),
+        'items_missing': missing
+    }
@@ -0,0 +1,123 @@
+"""
+Error Events
+
+Structured error events from the API and workers, for monitor.py to read
+directly instead of grepping log tails.
+
+    events:errors                 stream of recent errors, capped at
+                                  ERROR_STREAM_MAXLEN entries: source, stage,
+                                  backend, error_class, message, job_id, item
+    stats:errors                  lifetime counts per category
+    stats:errors:minute:{minute}  counts per category per Unix minute,
+                                  kept ERROR_SERIES_MINUTES
+
+Categories are "stage:{stage}", "backend:{backend}" and
+"class:{error_class}", plus "total". Recording is best effort and never
+raises, so a Redis outage can't turn one error into two.
+"""
+
+import time
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ERROR_STREAM = 'events:errors'
+ERROR_STATS_KEY = 'stats:errors'
+ERROR_SERIES_PREFIX = 'stats:errors:minute'
+ERROR_STREAM_MAXLEN = 1000
+ERROR_SERIES_MINUTES = 60
+
+
+def _series_key(minute: int) -> str:
+    return f"{ERROR_SERIES_PREFIX}:{minute}"
+
+
+class ErrorEvents:
+    """Capped error stream plus per-category counters in Redis"""
+
+    def __init__(self, redis_client, source: str, backend: Optional[str] = None):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            source: Who records the errors ("api", "worker-1", ...)
+            backend: Default scraper backend for recorded errors ("serpapi", "uc")
+        """
+        self.redis_client = redis_client
+        self.source = source
+        self.backend = backend
+
+    def record(
+        self,
+        stage: str,
+        error,
+        backend: Optional[str] = None,
+        job_id: Optional[str] = None,
+        item: Optional[str] = None
+    ):
+        """
+        Record one error
+
+        Args:
+            stage: Where it happened ("scrape", "job", "browser_start", "queue", ...)
+            error: Exception (its class is recorded) or message string
+            backend: Scraper backend involved (default: the recorder's)
+        """
+        error_class = type(error).__name__ if isinstance(error, BaseException) else 'Error'
+        backend = backend or self.backend or 'none'
+        categories = ('total', f'stage:{stage}', f'backend:{backend}', f'class:{error_class}')
+        series_key = _series_key(int(time.time() // 60))
+
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.xadd(ERROR_STREAM, {
+                'source': self.source,
+                'stage': stage,
+                'backend': backend,
+                'error_class': error_class,
+                'message': str(error)[:200],
+                'job_id': job_id or '',
+                'item': item or ''
+            }, maxlen=ERROR_STREAM_MAXLEN, approximate=True)
+            for category in categories:
+                pipe.hincrby(ERROR_STATS_KEY, category, 1)
+                pipe.hincrby(series_key, category, 1)
+            pipe.expire(series_key, ERROR_SERIES_MINUTES * 60 + 60)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Could not record error event: {e}")
+
+    def rates(self, minutes: int = 5) -> Dict:
+        """
+        Error counts per category over the last `minutes` minutes (current one included)
+
+        Returns:
+            {"minutes", "total", "per_minute", "by_stage", "by_backend", "by_class"}
+        """
+        minutes = max(1, min(minutes, ERROR_SERIES_MINUTES))
+        current = int(time.time() // 60)
+        pipe = self.redis_client.pipeline()
+        for minute in range(current - minutes + 1, current + 1):
+            pipe.hgetall(_series_key(minute))
+
+        totals: Dict[str, int] = {}
+        for counts in pipe.execute():
+            for category, count in counts.items():
+                totals[category] = totals.get(category, 0) + int(count)
+
+        rates = {'minutes': minutes, 'total': totals.pop('total', 0)}
+        rates['per_minute'] = round(rates['total'] / minutes, 2)
+        for prefix, name in (('stage', 'by_stage'), ('backend', 'by_backend'), ('class', 'by_class')):
+            rates[name] = {
+                category.split(':', 1)[1]: count
+                for category, count in sorted(totals.items(), key=lambda kv: -kv[1])
+                if category.startswith(f'{prefix}:')
+            }
+        return rates
+
+    def recent(self, count: int = 10) -> List[Dict]:
+        """The most recent error events, newest first"""
+        return [
+            dict(fields, id=event_id, timestamp=int(event_id.split('-')[0]) / 1000)
+            for event_id, fields in self.redis_client.xrevrange(ERROR_STREAM, count=count)
+        ]
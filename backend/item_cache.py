@@ -0,0 +1,300 @@
+"""
+Item Cache
+
+Redis-backed cache of scraped products per (item, ZIP).
+
+Scrapers return the FULL parsed result set for a query, with every product
+flagged `is_in_store` (plus `location` text when the source provides it).
+The cache stores that set once, and both user-facing views are derived at
+read time:
+- prioritize_nearby=True:  in-store / nearby products only
+- prioritize_nearby=False: every product (best online prices included)
+
+So toggling the "Prioritize nearby stores" preference never triggers a
+second scrape of the same query/ZIP.
+
+Stale-while-revalidate:
+- age < soft TTL:          served as-is
+- soft TTL <= age < hard:  served immediately (marked stale) and a background
+                           refresh is queued on the scheduler's background lane
+- age >= hard TTL:         expired by Redis, caller must scrape
+
+Adaptive TTLs:
+The soft TTL is chosen per entry from observed price volatility (see
+price_volatility.py): stable staples stay fresh for up to a day, volatile
+items are refreshed sooner. ITEM_CACHE_SOFT_TTL is used until an item has
+enough price history.
+
+Storage:
+Entries are stored in the compact columnar encoding from cache_codec.py
+(msgpack + zstd, required on every API and worker host). Legacy JSON
+entries are still readable.
+
+ZIP-region sharing:
+On an exact-ZIP miss, a result scraped for a sibling ZIP in the same store
+region (see zip_regions.py) is served if it is younger than
+ITEM_CACHE_SIBLING_TTL.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+from cache_codec import COMPACT_CODEC, binary_client, codec_name, decode_entry, encode_entry
+from product import ProductRecord, from_wire
+from scheduler import BACKGROUND, JobScheduler
+from affinity import AffinityRouter
+from zip_regions import ZipClusterer
+from price_volatility import PriceVolatilityTracker
+
+logger = logging.getLogger(__name__)
+
+ITEM_CACHE_SOFT_TTL = int(os.getenv('ITEM_CACHE_SOFT_TTL', 3600))  # 1 hour: serve directly
+ITEM_CACHE_HARD_TTL = int(os.getenv('ITEM_CACHE_HARD_TTL', 6 * 3600))  # 6 hours: serve stale + refresh
+ITEM_CACHE_SIBLING_TTL = int(os.getenv('ITEM_CACHE_SIBLING_TTL', ITEM_CACHE_SOFT_TTL))  # Max age shared across a region
+ITEM_CACHE_PREFIX = 'item_cache'
+ITEM_CLUSTER_PREFIX = 'item_cluster'  # {cluster}:{query} -> ZIP with the latest result
+
+# Background refreshes go to the scheduler's background lane (served when no cart waits)
+REFRESH_LOCK_PREFIX = 'item_refresh'
+REFRESH_LOCK_TTL = 300  # Don't queue the same refresh twice within 5 minutes
+
+
+def normalize_query(query: str) -> str:
+    """Normalize an item query for cache keys ("  Whole  Milk " → "whole milk")"""
+    return re.sub(r'\s+', ' ', (query or '').lower().strip())
+
+
+@dataclass
+class CacheEntry:
+    """A cached full result set and when (and for which ZIP) it was scraped"""
+    products: List[ProductRecord]
+    cached_at: float
+    zip_code: Optional[str] = None
+    soft_ttl: int = ITEM_CACHE_SOFT_TTL
+
+    @property
+    def age(self) -> float:
+        """Seconds since the result set was scraped"""
+        return max(0.0, time.time() - self.cached_at)
+
+    def is_stale(self) -> bool:
+        """True once the entry is past its soft TTL (still servable, needs refresh)"""
+        return self.age >= self.soft_ttl
+
+
+class ItemCache:
+    """
+    Full-result-set cache for individual cart items.
+
+    Keys: item_cache:{zip_code}:{normalized query}
+    Values: encoded {"cached_at", "soft_ttl", "zip_code"} + full product set
+            (unfiltered, see cache_codec), expiring in Redis at the hard TTL
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        soft_ttl: int = ITEM_CACHE_SOFT_TTL,
+        hard_ttl: int = ITEM_CACHE_HARD_TTL,
+        sibling_ttl: int = ITEM_CACHE_SIBLING_TTL,
+        clusterer: Optional[ZipClusterer] = None,
+        volatility: Optional[PriceVolatilityTracker] = None
+    ):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            soft_ttl: Seconds an entry is served without refreshing
+            hard_ttl: Seconds an entry may be served at all (Redis expiry)
+            sibling_ttl: Max age of a sibling-ZIP entry served on an exact miss
+            clusterer: ZIP region clusterer (default: from environment)
+            volatility: Price volatility tracker (default: from environment)
+        """
+        self.redis_client = redis_client
+        self.binary_client = binary_client(redis_client)
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = max(hard_ttl, soft_ttl)
+        self.sibling_ttl = sibling_ttl
+        self.clusterer = clusterer or ZipClusterer(redis_client)
+        self.volatility = volatility or PriceVolatilityTracker(redis_client)
+        self.scheduler = JobScheduler(redis_client)
+        self.router = AffinityRouter(self.clusterer)
+
+        if not COMPACT_CODEC:
+            logger.warning(
+                f"⚠️  Item cache encoding is {codec_name()}: install msgpack and zstandard "
+                f"on every API and worker host, or entries written elsewhere can't be read here"
+            )
+
+    def _key(self, query: str, zip_code: str) -> str:
+        return f"{ITEM_CACHE_PREFIX}:{zip_code}:{normalize_query(query)}"
+
+    def _cluster_key(self, cluster: str, query: str) -> str:
+        return f"{ITEM_CLUSTER_PREFIX}:{cluster}:{normalize_query(query)}"
+
+    def _read(self, query: str, zip_code: str) -> Optional[CacheEntry]:
+        cached = self.binary_client.get(self._key(query, zip_code))
+        if cached is None:
+            return None
+
+        meta, products = decode_entry(cached)
+        return CacheEntry(
+            products=from_wire(products),
+            cached_at=meta['cached_at'],
+            zip_code=meta.get('zip_code', zip_code),
+            soft_ttl=meta.get('soft_ttl', self.soft_ttl)
+        )
+
+    def _read_sibling(self, query: str, zip_code: str, cluster: str) -> Optional[CacheEntry]:
+        """Fresh-enough entry scraped for another ZIP in the same region"""
+        sibling_zip = self.redis_client.get(self._cluster_key(cluster, query))
+        if not sibling_zip or sibling_zip == zip_code:
+            return None
+        if not self.clusterer.compatible(zip_code, sibling_zip):
+            return None
+
+        entry = self._read(query, sibling_zip)
+        if entry is None or entry.age >= self.sibling_ttl:
+            return None
+        return entry
+
+    def get(
+        self,
+        query: str,
+        zip_code: str,
+        allow_sibling: bool = True,
+        record_stats: bool = False
+    ) -> Optional[CacheEntry]:
+        """
+        Get the full cached result set for an item.
+
+        Args:
+            query: Item query
+            zip_code: User's ZIP code
+            allow_sibling: On an exact miss, try a sibling ZIP in the same region
+            record_stats: Count the lookup in per-cluster hit statistics
+
+        Returns:
+            CacheEntry (check is_stale(); entry.zip_code shows where it came from),
+            or None on a cache miss
+        """
+        cluster = self.clusterer.cluster_for(zip_code) if allow_sibling else None
+        kind = 'miss'
+        try:
+            entry = self._read(query, zip_code)
+            if entry is not None:
+                kind = 'exact'
+            elif cluster is not None:
+                entry = self._read_sibling(query, zip_code, cluster)
+                if entry is not None:
+                    kind = 'sibling'
+                    logger.info(f"🏘️  Serving '{query}' for {zip_code} from sibling ZIP {entry.zip_code}")
+        except Exception as e:
+            logger.warning(f"⚠️  Item cache read failed: {e}")
+            return None
+
+        if record_stats:
+            self.clusterer.record_hit(cluster or self.clusterer.cluster_for(zip_code), kind)
+
+        return entry
+
+    def set(self, query: str, zip_code: str, products: List[ProductRecord]) -> CacheEntry:
+        """
+        Store the full result set for an item.
+
+        Empty result sets are not cached, so a failed scrape is retried
+        on the next request instead of being served for hours. The entry's
+        soft TTL comes from the item's observed price volatility.
+
+        Returns:
+            The entry that was (or would have been) stored
+        """
+        products = from_wire(products)
+        entry = CacheEntry(products=products, cached_at=time.time(), zip_code=zip_code, soft_ttl=self.soft_ttl)
+        if not products:
+            return entry
+
+        try:
+            volatility = self.volatility.observe(normalize_query(query), zip_code, products)
+            entry.soft_ttl = self.volatility.ttl_for(volatility, self.soft_ttl)
+            if volatility is not None:
+                logger.info(f"📈 '{query}' volatility {volatility:.4f}/h → TTL {entry.soft_ttl // 60} min")
+        except Exception as e:
+            logger.debug(f"Could not update price volatility: {e}")
+
+        try:
+            self.binary_client.setex(
+                self._key(query, zip_code),
+                max(self.hard_ttl, entry.soft_ttl),
+                encode_entry({
+                    'cached_at': entry.cached_at,
+                    'soft_ttl': entry.soft_ttl,
+                    'zip_code': zip_code
+                }, products)
+            )
+
+            # Point the region at this ZIP's fresh result, and remember its stores
+            cluster = self.clusterer.cluster_for(zip_code)
+            if cluster is not None:
+                self.redis_client.setex(self._cluster_key(cluster, query), self.sibling_ttl, zip_code)
+                self.clusterer.record_stores(zip_code, products)
+        except Exception as e:
+            logger.warning(f"⚠️  Item cache write failed: {e}")
+
+        return entry
+
+    def request_refresh(self, query: str, zip_code: str, prioritize_nearby: bool = True) -> bool:
+        """
+        Queue a low-priority background refresh for a stale item.
+
+        A short-lived lock key ensures each (item, ZIP) is queued at most
+        once while a refresh is pending.
+
+        Returns:
+            True if a refresh was queued, False if one is already pending
+        """
+        lock_key = f"{REFRESH_LOCK_PREFIX}:{zip_code}:{normalize_query(query)}"
+        try:
+            if not self.redis_client.set(lock_key, 1, nx=True, ex=REFRESH_LOCK_TTL):
+                return False
+
+            # One background FIFO per ZIP, so a region's burst can't starve the
+            # others; routed to the region's worker group when groups are on
+            self.scheduler.enqueue(BACKGROUND, zip_code, json.dumps({
+                'type': 'refresh',
+                'item': query,
+                'zip_code': zip_code,
+                'prioritize_nearby': prioritize_nearby,
+                'requested_at': time.time()
+            }), group=self.router.group_for(zip_code))
+            logger.info(f"🔄 Queued background refresh: '{query}' in {zip_code}")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️  Could not queue refresh for '{query}': {e}")
+            return False
+
+    def prefetch(self, query: str, zip_code: str, prioritize_nearby: bool = True) -> str:
+        """
+        Warm the cache for an item the user is likely to submit soon.
+
+        Fresh entries are left alone; missing or stale ones get a
+        low-priority scrape on the background lane.
+
+        Returns:
+            "cached", "queued" or "pending" (already queued)
+        """
+        entry = self.get(query, zip_code)
+        if entry is not None and not entry.is_stale():
+            return 'cached'
+        return 'queued' if self.request_refresh(query, zip_code, prioritize_nearby) else 'pending'
+
+    def release_refresh(self, query: str, zip_code: str):
+        """Release the refresh lock once a background refresh has finished"""
+        try:
+            self.redis_client.delete(f"{REFRESH_LOCK_PREFIX}:{zip_code}:{normalize_query(query)}")
+        except Exception as e:
+            logger.debug(f"Could not release refresh lock: {e}")
@@ -0,0 +1,207 @@
+"""
+Job Metrics
+
+Constant-cost job statistics for /api/monitor and live_monitor.py, kept
+up to date by JobStore as jobs change status (no SCAN over job keys).
+
+    stats:jobs                  queued, processing   jobs currently in that status
+                                total:{status}       jobs that ever entered it
+    stats:jobs:minute:{minute}  {status}, items      per-minute counts (Unix minute),
+                                                     kept SERIES_MINUTES
+
+A status change and its counters are applied in one Lua script, so the
+gauges move exactly once per transition even when several workers finish
+items of the same job. Jobs that expire while still queued/processing
+(a crashed worker) are not decremented; the gauges are clamped at 0 and
+such jobs show up as a gap between started and finished totals.
+"""
+
+import time
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'stats:jobs'
+SERIES_PREFIX = 'stats:jobs:minute'
+SERIES_MINUTES = 60  # Minutes of per-minute history kept
+THROUGHPUT_MINUTES = 5  # Window for the completed-jobs-per-minute rate
+
+# Status -> name used in snapshots and series
+_COUNTER_NAMES = {
+    'queued': 'submitted',
+    'processing': 'started',
+    'complete': 'completed',
+    'failed': 'failed',
+    'cancelled': 'cancelled'
+}
+
+# Set a job's status (plus other fields) and count the transition.
+# KEYS: job hash, stats hash, current minute's series hash
+# ARGV: new status, job TTL, series TTL, field, value, field, value, ...
+_TRANSITION_SCRIPT = """
+local old = redis.call('HGET', KEYS[1], 'status')
+local new = ARGV[1]
+redis.call('HSET', KEYS[1], 'status', new, unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+if old == new then
+    return old
+end
+if old == 'queued' or old == 'processing' then
+    if redis.call('HINCRBY', KEYS[2], old, -1) < 0 then
+        redis.call('HSET', KEYS[2], old, 0)
+    end
+end
+if new == 'queued' or new == 'processing' then
+    redis.call('HINCRBY', KEYS[2], new, 1)
+end
+redis.call('HINCRBY', KEYS[2], 'total:' .. new, 1)
+redis.call('HINCRBY', KEYS[3], new, 1)
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+return old
+"""
+
+# Move a queued/processing job to processing when a worker claims it, and
+# count the change; any other status (cancelled, finished, expired) is left
+# untouched, so a cancellation can't be overwritten by a late claim.
+# KEYS: job hash, stats hash, current minute's series hash
+# ARGV: job TTL, series TTL, worker_id, started_at, started_ts
+_CLAIM_SCRIPT = """
+local old = redis.call('HGET', KEYS[1], 'status')
+if old ~= 'queued' and old ~= 'processing' then
+    return old
+end
+redis.call('HSET', KEYS[1], 'status', 'processing', 'worker_id', ARGV[3])
+redis.call('HSETNX', KEYS[1], 'started_at', ARGV[4])
+redis.call('HSETNX', KEYS[1], 'started_ts', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+if old == 'queued' then
+    if redis.call('HINCRBY', KEYS[2], 'queued', -1) < 0 then
+        redis.call('HSET', KEYS[2], 'queued', 0)
+    end
+    redis.call('HINCRBY', KEYS[2], 'processing', 1)
+    redis.call('HINCRBY', KEYS[2], 'total:processing', 1)
+    redis.call('HINCRBY', KEYS[3], 'processing', 1)
+    redis.call('EXPIRE', KEYS[3], ARGV[2])
+end
+return old
+"""
+
+# Delete a job that was never queued (submission failed part way) and take
+# it back off the queued/processing gauge.
+# KEYS: job hash, stats hash
+_DISCARD_SCRIPT = """
+local old = redis.call('HGET', KEYS[1], 'status')
+redis.call('DEL', KEYS[1])
+if old == 'queued' or old == 'processing' then
+    if redis.call('HINCRBY', KEYS[2], old, -1) < 0 then
+        redis.call('HSET', KEYS[2], old, 0)
+    end
+end
+return old
+"""
+
+
+def minute_key(timestamp: float = None) -> str:
+    """Series hash for the minute containing timestamp (default: now)"""
+    minute = int((time.time() if timestamp is None else timestamp) // 60)
+    return f"{SERIES_PREFIX}:{minute}"
+
+
+class JobMetrics:
+    """Job status counters and a per-minute time series in Redis"""
+
+    def __init__(self, redis_client, series_minutes: int = SERIES_MINUTES):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            series_minutes: Minutes of per-minute history kept
+        """
+        self.redis_client = redis_client
+        self.series_minutes = series_minutes
+        self._transition = redis_client.register_script(_TRANSITION_SCRIPT)
+        self._claim = redis_client.register_script(_CLAIM_SCRIPT)
+        self._discard = redis_client.register_script(_DISCARD_SCRIPT)
+
+    def transition(self, job_key: str, status: str, mapping: Dict, ttl: int):
+        """
+        Write a job hash with a new status and count the change
+
+        Returns:
+            The job's previous status (None if it had none)
+        """
+        args = [status, ttl, self.series_minutes * 60 + 60]
+        for key, value in mapping.items():
+            if key != 'status':
+                args.extend((key, value))
+        return self._transition(keys=[job_key, STATS_KEY, minute_key()], args=args)
+
+    def claim(self, job_key: str, worker_id: str, started_at: str, started_ts: float, ttl: int):
+        """
+        Move a queued/processing job to processing (first claim sets the start time)
+
+        Returns:
+            The job's previous status (None if it had none); the job is only
+            changed if that was "queued" or "processing"
+        """
+        return self._claim(
+            keys=[job_key, STATS_KEY, minute_key()],
+            args=[ttl, self.series_minutes * 60 + 60, worker_id, started_at, started_ts]
+        )
+
+    def discard(self, job_key: str):
+        """Delete a job hash and take it off the gauges (lifetime totals are kept)"""
+        return self._discard(keys=[job_key, STATS_KEY])
+
+    def count_item(self, pipe):
+        """Add one finished item to the current minute (on the caller's pipeline)"""
+        key = minute_key()
+        pipe.hincrby(key, 'items', 1)
+        pipe.expire(key, self.series_minutes * 60 + 60)
+
+    def series(self, minutes: int = None) -> List[Dict]:
+        """
+        Per-minute counts, oldest first, ending with the current (partial) minute
+
+        Returns:
+            [{"minute": Unix time of the minute, "submitted", "started",
+              "completed", "failed", "cancelled", "items"}, ...]
+        """
+        minutes = min(minutes or self.series_minutes, self.series_minutes)
+        current = int(time.time() // 60)
+        starts = [(current - offset) * 60 for offset in range(minutes - 1, -1, -1)]
+
+        pipe = self.redis_client.pipeline()
+        for start in starts:
+            pipe.hgetall(minute_key(start))
+
+        points = []
+        for start, counts in zip(starts, pipe.execute()):
+            point = {'minute': start}
+            for status, name in _COUNTER_NAMES.items():
+                point[name] = int(counts.get(status, 0))
+            point['items'] = int(counts.get('items', 0))
+            points.append(point)
+        return points
+
+    def snapshot(self) -> Dict:
+        """
+        Current gauges, lifetime totals and recent throughput
+
+        Returns:
+            {"queued", "processing", "submitted", "started", "completed",
+             "failed", "cancelled", "jobs_per_minute", "items_per_minute"}
+        """
+        counts = self.redis_client.hgetall(STATS_KEY)
+        snapshot = {
+            'queued': max(0, int(counts.get('queued', 0))),
+            'processing': max(0, int(counts.get('processing', 0)))
+        }
+        for status, name in _COUNTER_NAMES.items():
+            snapshot[name] = int(counts.get(f'total:{status}', 0))
+
+        # Rates over the last full minutes (the current one is still filling)
+        recent = self.series(THROUGHPUT_MINUTES + 1)[:-1]
+        snapshot['jobs_per_minute'] = round(sum(p['completed'] for p in recent) / len(recent), 2) if recent else 0.0
+        snapshot['items_per_minute'] = round(sum(p['items'] for p in recent) / len(recent), 2) if recent else 0.0
+        return snapshot
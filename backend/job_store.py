@@ -0,0 +1,238 @@
+"""
+Job Store
+
+One Redis hash per cart job holding its status, final result and per-item
+results, shared by the API (writes "queued", serves polls) and the workers
+(write progress and the outcome).
+
+Key: job:{job_id}
+
+    status              "queued", "processing", "complete", "failed" or "cancelled"
+    zip_code, items     Cart as submitted (items as a JSON list)
+    submitted_at, started_at, finished_at, worker_id
+    error               Failure / cancellation reason
+    result              JSON: summary, product_counts, stale_items, partial,
+                        skipped_items, total_time
+    item_status:{item}  "pending", "done", "skipped" or "failed"
+    item:{item}         JSON product list (wire format, cheapest first)
+    item_age:{item}     Cache age (seconds) of items served past their soft TTL
+    tasks_remaining     EDF dispatch only: item tasks not finished yet
+
+Products are stored once per item as the worker finishes it; the final
+result only adds the cart-level fields, so a completed job is never
+written twice. A poll is a single HGETALL.
+
+With EDF dispatch (see scheduler.py) several workers fill in one job's
+items; the one that brings tasks_remaining to 0 writes the final result.
+
+Every status change also updates the job counters and per-minute series
+in job_metrics.py, atomically with the write.
+
+Retention:
+- while queued/processing: JOB_ACTIVE_TTL (a stuck job still expires)
+- once finished (any outcome): JOB_RESULT_RETENTION, long enough that a
+  slow poller gets its results instead of resubmitting the cart
+"""
+
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from job_metrics import JobMetrics
+
+logger = logging.getLogger(__name__)
+
+JOB_PREFIX = 'job'
+JOB_ACTIVE_TTL = int(os.getenv('JOB_ACTIVE_TTL', 3600))  # 1 hour: queued/processing
+JOB_RESULT_RETENTION = int(os.getenv('JOB_RESULT_RETENTION', 900))  # 15 minutes after finishing
+
+ACTIVE_STATUSES = ('queued', 'processing')
+FINAL_STATUSES = ('complete', 'failed', 'cancelled')
+
+
+@dataclass
+class JobRecord:
+    """Everything stored for a job, decoded from one HGETALL"""
+    status: str
+    info: Dict[str, str] = field(default_factory=dict)
+    items: List[str] = field(default_factory=list)
+    result: Dict = field(default_factory=dict)
+    results: Dict[str, List[Dict]] = field(default_factory=dict)
+    item_status: Dict[str, str] = field(default_factory=dict)
+    item_age: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def is_active(self) -> bool:
+        """True while the job is queued or being scraped"""
+        return self.status in ACTIVE_STATUSES
+
+    def ordered_results(self) -> Dict[str, List[Dict]]:
+        """Per-item results in cart order (items not published yet are omitted)"""
+        ordered = {item: self.results[item] for item in self.items if item in self.results}
+        for item, products in self.results.items():
+            ordered.setdefault(item, products)
+        return ordered
+
+
+class JobStore:
+    """
+    Per-job hash (status + result + per-item results) in Redis.
+
+    Writes are best effort at the call site; reads return None for unknown
+    or expired jobs.
+    """
+
+    def __init__(self, redis_client, retention: int = JOB_RESULT_RETENTION, active_ttl: int = JOB_ACTIVE_TTL):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            retention: Seconds a finished job (results or error) is kept
+            active_ttl: Seconds a queued/processing job is kept
+        """
+        self.redis_client = redis_client
+        self.retention = retention
+        self.active_ttl = max(active_ttl, retention)
+        self.metrics = JobMetrics(redis_client)
+
+    def _key(self, job_id: str) -> str:
+        return f"{JOB_PREFIX}:{job_id}"
+
+    def create(self, job_id: str, zip_code: str, items: List[str], submitted_at: str, tasks: Optional[int] = None):
+        """
+        Record a newly queued job (call before pushing it to the queue)
+
+        Args:
+            tasks: Number of item tasks for EDF dispatch (items start pending);
+                   None when one worker runs the whole cart
+        """
+        mapping = {
+            'status': 'queued',
+            'zip_code': zip_code,
+            'items': json.dumps(items),
+            'submitted_at': submitted_at
+        }
+        if tasks is not None:
+            mapping['tasks_remaining'] = tasks
+            mapping.update({f'item_status:{item}': 'pending' for item in items})
+        self.metrics.transition(self._key(job_id), 'queued', mapping, self.active_ttl)
+
+    def discard(self, job_id: str):
+        """Remove a job whose submission failed before it was queued"""
+        self.metrics.discard(self._key(job_id))
+
+    def start(self, job_id: str, worker_id: str, zip_code: str, items: List[str]):
+        """Mark a job as processing, with every item pending"""
+        mapping = {
+            'status': 'processing',
+            'worker_id': worker_id,
+            'started_at': datetime.now().isoformat(),
+            'zip_code': zip_code,
+            'items': json.dumps(items)
+        }
+        mapping.update({f'item_status:{item}': 'pending' for item in items})
+        self.metrics.transition(self._key(job_id), 'processing', mapping, self.active_ttl)
+
+    def publish_item(
+        self,
+        job_id: str,
+        item: str,
+        state: str,
+        products: Optional[List[Dict]] = None,
+        stale_age: Optional[int] = None
+    ):
+        """Store one item's outcome as soon as it is known (read by polls in progress)"""
+        mapping = {f'item_status:{item}': state}
+        if products is not None:
+            mapping[f'item:{item}'] = json.dumps(products)
+        if stale_age is not None:
+            mapping[f'item_age:{item}'] = stale_age
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self._key(job_id), mapping=mapping)
+        pipe.expire(self._key(job_id), self.active_ttl)
+        if state != 'pending':
+            self.metrics.count_item(pipe)
+        pipe.execute()
+
+    def claim_task(self, job_id: str, worker_id: str) -> Optional[str]:
+        """
+        Mark an EDF job as processing when one of its item tasks is claimed.
+
+        Returns:
+            The job's status before the claim (None if unknown/expired);
+            only "queued"/"processing" jobs are updated, in one script
+            with the status check (a cancelled job stays cancelled)
+        """
+        return self.metrics.claim(
+            self._key(job_id), worker_id, datetime.now().isoformat(), time.time(), self.active_ttl
+        )
+
+    def task_done(self, job_id: str) -> int:
+        """Count one finished EDF item task; returns how many are left (0 = finalize)"""
+        return int(self.redis_client.hincrby(self._key(job_id), 'tasks_remaining', -1))
+
+    def finish(self, job_id: str, status: str, worker_id: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        """
+        Record a job's outcome and start its retention period.
+
+        Args:
+            status: "complete", "failed" or "cancelled"
+            result: Cart-level fields for a completed job (products are
+                    already stored per item)
+            error: Reason for a failed / cancelled job
+        """
+        mapping = {
+            'status': status,
+            'worker_id': worker_id,
+            'finished_at': datetime.now().isoformat()
+        }
+        if result is not None:
+            mapping['result'] = json.dumps(result)
+        if error is not None:
+            mapping['error'] = error
+        self.metrics.transition(self._key(job_id), status, mapping, self.retention)
+
+    def get_summary(self, job_id: str) -> Optional[JobRecord]:
+        """
+        Read a job without its per-item product lists (one HMGET)
+
+        Enough for summary-only polls of completed jobs: status, the
+        cart-level result and the job info fields.
+        """
+        fields = ('status', 'result', 'zip_code', 'worker_id', 'finished_at', 'error')
+        values = self.redis_client.hmget(self._key(job_id), fields)
+        data = {key: value for key, value in zip(fields, values) if value is not None}
+        if 'status' not in data:
+            return None
+
+        record = JobRecord(status=data.pop('status'))
+        if 'result' in data:
+            record.result = json.loads(data.pop('result'))
+        record.info = data
+        return record
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        """Read everything stored for a job in one round trip (None if unknown/expired)"""
+        data = self.redis_client.hgetall(self._key(job_id))
+        if not data or 'status' not in data:
+            return None
+
+        record = JobRecord(status=data['status'])
+        for key, value in data.items():
+            kind, _, item = key.partition(':')
+            if kind == 'item_status' and item:
+                record.item_status[item] = value
+            elif kind == 'item' and item:
+                record.results[item] = json.loads(value)
+            elif kind == 'item_age' and item:
+                record.item_age[item] = int(float(value))
+            elif key == 'items':
+                record.items = json.loads(value)
+            elif key == 'result':
+                record.result = json.loads(value)
+            else:
+                record.info[key] = value
+        return record
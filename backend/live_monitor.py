@@ -12,6 +12,9 @@ import subprocess
 from datetime import datetime
 from collections import deque
 
+from scheduler import INTERACTIVE_LANES, JobScheduler
+from job_metrics import JobMetrics
+
 # Configuration
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
@@ -31,7 +34,12 @@ def clear_screen():
         print('\n' * 50)
 
 def get_api_stats():
-    """Get API request stats from Redis"""
+    """
+    Get API request stats from Redis
+    
+    Reads only the job counters and per-minute series kept by the API and
+    workers (job_metrics.py), so the cost doesn't grow with job volume.
+    """
     try:
         r = redis.Redis(
             host=REDIS_HOST,
@@ -40,56 +48,21 @@ def get_api_stats():
             socket_connect_timeout=2
         )
         
-        # Get queue size
-        queue_size = r.llen('scrape_queue')
-        
-        # Count jobs by status
-        processing = 0
-        completed = 0
-        failed = 0
-        
-        # First, get all jobs with results (these are NOT processing)
-        result_job_ids = set()
-        for key in r.scan_iter(match='result:*', count=100):
-            job_id = key.replace('result:', '')
-            result_job_ids.add(job_id)
-            
-            result_data = r.get(key)
-            if result_data:
-                try:
-                    import json
-                    data = json.loads(result_data)
-                    if data.get('status') == 'complete':
-                        completed += 1
-                    elif data.get('status') == 'failed':
-                        failed += 1
-                except:
-                    pass
+        # Get queue size (carts waiting in every interactive lane)
+        queue_size = JobScheduler(r).depth(INTERACTIVE_LANES)
         
-        # Now scan status keys, but SKIP any that have a result (they're done)
-        for key in r.scan_iter(match='status:*', count=100):
-            job_id = key.replace('status:', '')
-            
-            # Skip if this job has a result (it's already done)
-            if job_id in result_job_ids:
-                continue
-            
-            status_data = r.get(key)
-            if status_data:
-                try:
-                    import json
-                    data = json.loads(status_data)
-                    status = data.get('status', '')
-                    if status == 'processing':
-                        processing += 1
-                except:
-                    pass
+        # Job counters (processing is a gauge, completed/failed are totals)
+        metrics = JobMetrics(r)
+        jobs = metrics.snapshot()
         
         return {
             'queue_size': queue_size,
-            'processing': processing,
-            'completed': completed,
-            'failed': failed,
+            'processing': jobs['processing'],
+            'completed': jobs['completed'],
+            'failed': jobs['failed'],
+            'jobs_per_minute': jobs['jobs_per_minute'],
+            'items_per_minute': jobs['items_per_minute'],
+            'completed_per_minute': [point['completed'] for point in metrics.series(30)],
             'connected': True
         }
     except Exception as e:
@@ -98,6 +71,9 @@ def get_api_stats():
             'processing': 0,
             'completed': 0,
             'failed': 0,
+            'jobs_per_minute': 0.0,
+            'items_per_minute': 0.0,
+            'completed_per_minute': [],
             'connected': False,
             'error': str(e)
         }
@@ -203,8 +179,9 @@ def display_dashboard(stats, system, services):
     print(f"  Redis Status      : {redis_status}")
     print(f"  Jobs in Queue     : {stats['queue_size']}")
     print(f"  Currently Processing : {stats['processing']}")
-    print(f"  Completed (cached)   : {stats['completed']}")
-    print(f"  Failed (cached)      : {stats['failed']}")
+    print(f"  Completed (total)    : {stats['completed']}")
+    print(f"  Failed (total)       : {stats['failed']}")
+    print(f"  Throughput (5 min)   : {stats['jobs_per_minute']:.1f} jobs/min, {stats['items_per_minute']:.1f} items/min")
     print()
     
     # Request Rate (if we track it)
@@ -231,6 +208,16 @@ def display_dashboard(stats, system, services):
         print(f"  {bar} {stats['queue_size']} jobs")
         print()
     
+    # Completed jobs per minute (last 30 minutes, oldest first)
+    if any(stats['completed_per_minute']):
+        peak = max(stats['completed_per_minute'])
+        levels = ' ▁▂▃▄▅▆▇█'
+        spark = ''.join(levels[round(count / peak * (len(levels) - 1))] for count in stats['completed_per_minute'])
+        print("📈 COMPLETED JOBS / MINUTE (30 min):")
+        print("-" * 80)
+        print(f"  {spark} peak {peak}/min")
+        print()
+    
     # Instructions
     print("=" * 80)
     print("  Press Ctrl+C to exit".center(80))
@@ -0,0 +1,183 @@
+"""
+Log Setup
+
+Logging for the API and workers that keeps I/O off the request/scrape path:
+
+- Records go through a QueueHandler; one background thread (QueueListener)
+  formats and writes them, so a log call costs a queue put, not a write
+- Output is one JSON object per line (ts, level, logger, msg, service, any
+  `extra` fields, exc); LOG_FORMAT=text keeps the old human-readable lines
+- Levels per module: LOG_LEVEL for everything, LOG_LEVELS to override single
+  loggers, e.g. "serpapi_scraper=DEBUG,urllib3=WARNING"
+- DEBUG records are sampled (LOG_DEBUG_SAMPLE, fraction kept) and rate
+  limited per logger (LOG_DEBUG_PER_SECOND); the next debug record that
+  gets through carries how many were dropped before it
+
+Call configure_logging() once, before the first log message:
+
+    from log_setup import configure_logging
+    configure_logging('worker')
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_DEBUG_SAMPLE = float(os.getenv('LOG_DEBUG_SAMPLE', 1.0))
+LOG_DEBUG_PER_SECOND = float(os.getenv('LOG_DEBUG_PER_SECOND', 20))
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+
+# LogRecord attributes that aren't `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "module=LEVEL,module=LEVEL" into {module: LEVEL}"""
+    levels = {}
+    for part in spec.split(','):
+        if '=' in part:
+            name, level = part.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'service': self.service
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Samples and rate-limits DEBUG records per logger (other levels pass untouched)"""
+
+    def __init__(self, sample: float = LOG_DEBUG_SAMPLE, per_second: float = LOG_DEBUG_PER_SECOND):
+        super().__init__()
+        self.sample = sample
+        self.per_second = per_second
+        self._buckets: Dict[str, list] = {}  # logger -> [tokens, last refill, dropped]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+
+        bucket = self._buckets.get(record.name)
+        if bucket is None:
+            bucket = self._buckets[record.name] = [self.per_second, record.created, 0]
+
+        tokens = min(self.per_second, bucket[0] + (record.created - bucket[1]) * self.per_second)
+        bucket[1] = record.created
+        if tokens < 1 or (self.sample < 1 and random.random() >= self.sample):
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            record.debug_dropped = bucket[2]
+            bucket[2] = 0
+        return True
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for a same-process listener
+
+    The stock prepare() formats the whole record (and traceback) in the
+    caller's thread so it can be pickled; here only the message is frozen
+    and formatting is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(
+    service: str,
+    level: str = LOG_LEVEL,
+    levels: Optional[Dict[str, str]] = None,
+    fmt: str = LOG_FORMAT,
+    stream=None,
+    debug_sample: float = LOG_DEBUG_SAMPLE,
+    debug_per_second: float = LOG_DEBUG_PER_SECOND
+) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a background writer (replaces any earlier setup)
+
+    Args:
+        service: Name added to every JSON record ("api", "worker", ...)
+        level: Root level
+        levels: Per-logger levels (default: from LOG_LEVELS)
+        fmt: "json" or "text"
+        stream: Where the listener writes (default: stdout)
+        debug_sample / debug_per_second: DEBUG sampling and per-logger rate limit
+
+    Returns:
+        The started QueueListener (stopped automatically at exit)
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter(service) if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    handler = _InProcessQueueHandler(log_queue)
+    handler.addFilter(DebugSampler(debug_sample, debug_per_second))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    for name, module_level in (parse_levels(LOG_LEVELS) if levels is None else levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
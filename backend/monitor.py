@@ -12,12 +12,17 @@ import time
 from datetime import datetime
 from typing import Dict, List
 
+from scheduler import INTERACTIVE_LANES, JobScheduler
+from error_events import ErrorEvents
+
 # Configuration
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 API_URL = 'http://localhost:8000'
 ALERT_EMAIL = None  # Set to your email for alerts
 SLACK_WEBHOOK = None  # Set to Slack webhook URL for alerts
+ERROR_WINDOW_MINUTES = 5  # Window for recent error rates
+ERROR_RATE_ALERT = 5  # Errors per minute (any category) that count as an issue
 
 class SystemMonitor:
     def __init__(self):
@@ -35,8 +40,8 @@ class SystemMonitor:
             )
             self.redis_client.ping()
             
-            # Get queue size
-            queue_size = self.redis_client.llen('scrape_queue')
+            # Get queue size (carts waiting in every interactive lane)
+            queue_size = JobScheduler(self.redis_client).depth(INTERACTIVE_LANES)
             
             return {
                 'status': 'healthy',
@@ -151,40 +156,36 @@ class SystemMonitor:
             }
     
     def check_recent_errors(self) -> Dict:
-        """Check recent error logs"""
-        error_count = 0
-        recent_errors = []
+        """
+        Check recent error rates per stage, backend and error class
+        
+        Reads the error events the API and workers publish to Redis
+        (see error_events.py), so it covers every process and log rotation.
+        """
+        if self.redis_client is None:
+            return {'error': 'Redis unavailable'}
         
-        log_files = [
-            '/var/log/grocery-api.log',
-            '/var/log/grocery-worker.log',
-            '/var/log/grocery-worker-error.log'
-        ]
+        try:
+            events = ErrorEvents(self.redis_client, 'monitor')
+            rates = events.rates(ERROR_WINDOW_MINUTES)
+            recent_errors = events.recent(10)
+        except Exception as e:
+            return {'error': str(e)}
         
-        for log_file in log_files:
-            try:
-                # Get last 50 lines
-                result = subprocess.run(
-                    ['tail', '-n', '50', log_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                
-                lines = result.stdout.strip().split('\n')
-                for line in lines:
-                    if 'ERROR' in line or 'CRITICAL' in line or '❌' in line:
-                        error_count += 1
-                        recent_errors.append({
-                            'file': log_file,
-                            'message': line[:200]  # Truncate long lines
-                        })
-            except Exception:
-                pass
+        if rates['per_minute'] >= ERROR_RATE_ALERT:
+            top_stage = next(iter(rates['by_stage']), 'unknown')
+            self.issues.append(
+                f"⚠️  High error rate: {rates['per_minute']}/min over {ERROR_WINDOW_MINUTES} min (mostly {top_stage})"
+            )
         
         return {
-            'error_count': error_count,
-            'recent_errors': recent_errors[-10:]  # Last 10 errors
+            'error_count': rates['total'],
+            'errors_per_minute': rates['per_minute'],
+            'window_minutes': rates['minutes'],
+            'by_stage': rates['by_stage'],
+            'by_backend': rates['by_backend'],
+            'by_class': rates['by_class'],
+            'recent_errors': recent_errors
         }
     
     def run_full_check(self) -> Dict:
@@ -234,7 +235,12 @@ class SystemMonitor:
         
         print(f"\n📊 RECENT ERRORS:")
         error_data = report['errors']
-        print(f"  🚨 Error count (last 50 lines): {error_data['error_count']}")
+        if 'error' in error_data:
+            print(f"  ❓ Unavailable: {error_data['error']}")
+        else:
+            print(f"  🚨 Errors (last {error_data['window_minutes']} min): {error_data['error_count']} ({error_data['errors_per_minute']}/min)")
+            for stage, count in error_data['by_stage'].items():
+                print(f"     {stage}: {count}")
         
         if self.issues:
             print(f"\n{'='*60}")
@@ -0,0 +1,102 @@
+"""
+Popularity Tracker
+
+Records which (item, ZIP region) pairs users actually submit, so the cache
+warmer knows what to pre-scrape before peak hours.
+
+Redis layout (sorted sets, score = decayed submission count):
+- popularity:regions          region -> carts submitted
+- popularity:items:{region}   normalized item -> times requested
+- popularity:zips:{region}    ZIP -> carts submitted (picks the ZIP to warm)
+
+A region is the 3-digit ZIP prefix. Scores are multiplied by a decay factor
+after each warmer run so yesterday's trends fade instead of dominating.
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+from item_cache import normalize_query
+from zip_regions import zip_region
+
+logger = logging.getLogger(__name__)
+
+POPULARITY_PREFIX = 'popularity'
+MAX_TRACKED_ITEMS = 500  # Per region; keeps the sorted sets small
+
+
+class PopularityTracker:
+    """Sorted-set popularity counters fed by /api/cart submissions"""
+
+    def __init__(self, redis_client):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+        """
+        self.redis_client = redis_client
+
+    def _regions_key(self) -> str:
+        return f"{POPULARITY_PREFIX}:regions"
+
+    def _items_key(self, region: str) -> str:
+        return f"{POPULARITY_PREFIX}:items:{region}"
+
+    def _zips_key(self, region: str) -> str:
+        return f"{POPULARITY_PREFIX}:zips:{region}"
+
+    def record_cart(self, items: List[str], zip_code: str):
+        """
+        Count one cart submission (one pipeline round trip).
+
+        Args:
+            items: Cart items as submitted
+            zip_code: User's ZIP code
+        """
+        region = zip_region(zip_code)
+        if not region:
+            return
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zincrby(self._regions_key(), 1, region)
+        pipe.zincrby(self._zips_key(region), 1, zip_code)
+        for item in set(normalize_query(i) for i in items):
+            if item:
+                pipe.zincrby(self._items_key(region), 1, item)
+        pipe.execute()
+
+    def top_regions(self, limit: int = 10) -> List[Tuple[str, float]]:
+        """Most active regions as (region, score), highest first"""
+        return self.redis_client.zrevrange(self._regions_key(), 0, limit - 1, withscores=True)
+
+    def top_items(self, region: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Most requested items in a region as (item, score), highest first"""
+        return self.redis_client.zrevrange(self._items_key(region), 0, limit - 1, withscores=True)
+
+    def top_zip(self, region: str) -> Optional[str]:
+        """ZIP in the region with the most submissions (where warming pays off most)"""
+        top = self.redis_client.zrevrange(self._zips_key(region), 0, 0)
+        return top[0] if top else None
+
+    def decay(self, factor: float = 0.5):
+        """
+        Multiply every score by `factor` and trim the long tail.
+
+        Called by the warmer after each run so popularity follows recent
+        demand.
+        """
+        regions = [region for region, _ in self.redis_client.zrevrange(self._regions_key(), 0, -1, withscores=True)]
+        keys = [self._regions_key()]
+        for region in regions:
+            keys.append(self._items_key(region))
+            keys.append(self._zips_key(region))
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zunionstore(key, {key: factor})
+            # Drop entries that decayed below one submission
+            pipe.zremrangebyscore(key, '-inf', '(0.5')
+        for region in regions:
+            pipe.zremrangebyrank(self._items_key(region), 0, -(MAX_TRACKED_ITEMS + 1))
+        pipe.execute()
+
+        logger.info(f"📉 Decayed popularity scores by {factor} across {len(regions)} regions")
@@ -0,0 +1,149 @@
+"""
+Price Volatility Tracker
+
+Records successive price observations per (normalized item, merchant,
+ZIP) and turns them into a per-item cache TTL: stable staples stay
+cached for a long time, items whose prices move often are re-scraped sooner.
+
+For each merchant we keep the last cheapest price and an exponentially
+weighted drift rate (relative price change per hour). An item's volatility
+is the mean drift across merchants with at least two observations, and its
+TTL is the time until that drift is expected to reach
+PRICE_DRIFT_TOLERANCE, bounded by ITEM_CACHE_MIN_TTL / ITEM_CACHE_MAX_TTL.
+
+Observations are kept per ZIP, not per region: neighbouring ZIPs are served
+by different stores, and a price gap between two stores is not a price
+change over time. Re-scrapes less than MIN_OBSERVATION_GAP apart are not
+used as drift samples (a few cents over a minute would read as a huge
+hourly rate); the earlier observation is kept as the baseline instead.
+
+Redis layout:
+- price_obs:{zip}:{normalized item}  hash merchant -> "price|drift|observed_at|count"
+"""
+
+import os
+import time
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ITEM_CACHE_MIN_TTL = int(os.getenv('ITEM_CACHE_MIN_TTL', 15 * 60))  # 15 minutes
+ITEM_CACHE_MAX_TTL = int(os.getenv('ITEM_CACHE_MAX_TTL', 24 * 3600))  # 24 hours
+PRICE_DRIFT_TOLERANCE = float(os.getenv('PRICE_DRIFT_TOLERANCE', 0.02))  # 2% expected drift
+PRICE_OBS_TTL = 30 * 24 * 3600  # Forget observations after 30 days without a scrape
+DRIFT_SMOOTHING = 0.3  # EWMA weight of the newest observation
+MIN_OBSERVATION_GAP = 10 * 60  # Seconds between observations used as a drift sample
+
+
+def _cheapest_by_merchant(products: List[Dict]) -> Dict[str, float]:
+    """Cheapest observed price per merchant"""
+    cheapest: Dict[str, float] = {}
+    for product in products:
+        merchant = product.get('merchant')
+        price = product.get('price')
+        if not merchant or not price or price <= 0:
+            continue
+        if merchant not in cheapest or price < cheapest[merchant]:
+            cheapest[merchant] = float(price)
+    return cheapest
+
+
+class PriceVolatilityTracker:
+    """Per-item price drift tracking that drives adaptive cache TTLs"""
+
+    def __init__(
+        self,
+        redis_client,
+        min_ttl: int = ITEM_CACHE_MIN_TTL,
+        max_ttl: int = ITEM_CACHE_MAX_TTL,
+        tolerance: float = PRICE_DRIFT_TOLERANCE
+    ):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            min_ttl: Shortest TTL handed out (most volatile items)
+            max_ttl: Longest TTL handed out (prices never seen changing)
+            tolerance: Relative price drift we accept before re-scraping
+        """
+        self.redis_client = redis_client
+        self.min_ttl = min_ttl
+        self.max_ttl = max(max_ttl, min_ttl)
+        self.tolerance = tolerance
+
+    def _key(self, query_key: str, zip_code: str) -> str:
+        return f"price_obs:{zip_code}:{query_key}"
+
+    def observe(self, query_key: str, zip_code: str, products: List[Dict]) -> Optional[float]:
+        """
+        Record a scrape's prices and return the item's updated volatility.
+
+        Args:
+            query_key: Normalized item query
+            zip_code: ZIP the products were scraped for
+            products: Full product set from the scrape
+
+        Returns:
+            Relative drift per hour, or None until some merchant has been seen twice
+        """
+        cheapest = _cheapest_by_merchant(products)
+        if not cheapest:
+            return None
+
+        key = self._key(query_key, zip_code)
+        now = time.time()
+        previous = self.redis_client.hgetall(key)
+
+        updates = {}
+        drifts = []
+        for merchant, price in cheapest.items():
+            drift, count = 0.0, 1
+            if merchant in previous:
+                try:
+                    last_price, last_drift, last_at, last_count = previous[merchant].split('|')
+                    last_price, last_drift = float(last_price), float(last_drift)
+                    last_at, last_count = float(last_at), int(last_count)
+                    if now - last_at < MIN_OBSERVATION_GAP:
+                        # Too soon to be a drift sample: keep the earlier baseline
+                        if last_count > 1:
+                            drifts.append(last_drift)
+                        continue
+                    hours = (now - last_at) / 3600
+                    rate = abs(price - last_price) / last_price / hours
+                    drift = rate if last_count == 1 else (
+                        DRIFT_SMOOTHING * rate + (1 - DRIFT_SMOOTHING) * last_drift
+                    )
+                    count = last_count + 1
+                    drifts.append(drift)
+                except (ValueError, ZeroDivisionError):
+                    pass
+            updates[merchant] = f"{price}|{drift}|{now}|{count}"
+
+        if updates:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hset(key, mapping=updates)
+            pipe.expire(key, PRICE_OBS_TTL)
+            pipe.execute()
+
+        if not drifts:
+            return None
+        return sum(drifts) / len(drifts)
+
+    def ttl_for(self, volatility: Optional[float], default_ttl: int) -> int:
+        """
+        Map a volatility score to a TTL in seconds.
+
+        Args:
+            volatility: Relative drift per hour (None = not enough history)
+            default_ttl: TTL to use without history
+
+        Returns:
+            Seconds, within [min_ttl, max_ttl]
+        """
+        if volatility is None:
+            return default_ttl
+        if volatility <= 0:
+            return self.max_ttl
+
+        ttl = self.tolerance / volatility * 3600
+        return int(min(self.max_ttl, max(self.min_ttl, ttl)))
@@ -0,0 +1,63 @@
+"""
+Process Memory Stats
+
+Resident memory of a process including all its descendants (a worker's
+Chrome, chromedriver and Xvfb children), read from /proc. Linux only;
+returns 0 where /proc is unavailable.
+"""
+
+import os
+from typing import Dict, List
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+MB = 1024 * 1024
+
+
+def process_tree() -> Dict[int, List[int]]:
+    """parent pid -> child pids, for every process in /proc"""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue  # Exited while scanning
+        # Field 4 is the parent pid; the command name (field 2) may contain spaces
+        ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def tree_rss(pid: int, children: Dict[int, List[int]] = None) -> int:
+    """Resident bytes of a process and all its descendants"""
+    if children is None:
+        children = process_tree()
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f'/proc/{current}/statm') as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except OSError:
+            pass
+        stack.extend(children.get(current, ()))
+    return total
+
+
+def default_memory_budget() -> int:
+    """80% of physical memory, in bytes"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(int(line.split()[1]) * 1024 * 0.8)
+    except OSError:
+        pass
+    return 2 * 1024 * MB
@@ -0,0 +1,148 @@
+"""
+Product Record
+
+The one product type produced by every scraper (uc_scraper, serpapi_scraper,
+scraper) and passed through the worker, the item cache and the API.
+
+ProductRecord uses __slots__, so a product is a fixed set of attribute
+slots instead of a per-instance dict. It is converted to the wire format
+(plain dict, "name" key) only at JSON boundaries, without re-validating each
+field through Pydantic.
+
+Older code and test scripts that treat products as dicts keep working:
+record['price'] and record.get('location') read the same slots.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+# Always present on the wire; the rest are only emitted when set
+CORE_FIELDS = ('name', 'price', 'merchant', 'rating', 'review_count', 'is_in_store', 'location')
+OPTIONAL_FIELDS = ('original_price', 'image_url', 'product_id')
+FIELDS = CORE_FIELDS + OPTIONAL_FIELDS
+
+
+class ProductRecord:
+    """A single scraped product (compact, slot-based)"""
+
+    __slots__ = FIELDS
+
+    def __init__(
+        self,
+        name: Optional[str],
+        price: Optional[float],
+        merchant: Optional[str],
+        rating: Optional[float] = None,
+        review_count: Optional[int] = None,
+        is_in_store: bool = False,
+        location: Optional[str] = None,
+        original_price: Optional[float] = None,
+        image_url: Optional[str] = None,
+        product_id: Optional[str] = None
+    ):
+        self.name = name
+        self.price = price
+        self.merchant = merchant
+        self.rating = rating
+        self.review_count = review_count
+        self.is_in_store = is_in_store
+        self.location = location
+        self.original_price = original_price
+        self.image_url = image_url
+        self.product_id = product_id
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ProductRecord':
+        """Build a record from a product dict ("name" or legacy "title" key)"""
+        return cls(
+            name=data.get('name', data.get('title')),
+            price=data.get('price'),
+            merchant=data.get('merchant'),
+            rating=data.get('rating'),
+            review_count=data.get('review_count'),
+            is_in_store=bool(data.get('is_in_store', False)),
+            location=data.get('location'),
+            original_price=data.get('original_price'),
+            image_url=data.get('image_url'),
+            product_id=data.get('product_id')
+        )
+
+    def to_dict(self) -> Dict:
+        """Wire format: core fields always, optional fields only when set"""
+        data = {
+            'name': self.name,
+            'price': self.price,
+            'merchant': self.merchant,
+            'rating': self.rating,
+            'review_count': self.review_count,
+            'is_in_store': self.is_in_store,
+            'location': self.location
+        }
+        for field in OPTIONAL_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+    def values(self) -> tuple:
+        """Slot values in FIELDS order (for columnar encoding)"""
+        return tuple(getattr(self, field) for field in FIELDS)
+
+    # Dict-style read access for code written against plain product dicts
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'title':
+            key = 'name'
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ProductRecord):
+            return NotImplemented
+        return self.values() == other.values()
+
+    def __repr__(self) -> str:
+        return f"ProductRecord({self.name!r}, ${self.price}, {self.merchant!r})"
+
+
+def by_price(products: Iterable) -> List:
+    """Products sorted cheapest first (records or dicts; missing prices last)"""
+    return sorted(products, key=lambda p: (p.get('price') is None, p.get('price') or 0))
+
+
+def select_view(products: List, prioritize_nearby: bool) -> List:
+    """
+    Derive the user-facing view from a full product set.
+
+    Args:
+        products: Full result set (ProductRecords or dicts with an `is_in_store` flag)
+        prioritize_nearby: If True, keep in-store/nearby products only
+
+    Returns:
+        List of products for the requested view. When nearby is requested
+        but no product is in store, the full set is returned for every
+        backend (uc_scraper's fallback when the "In stores nearby" section
+        was missing; serpapi_scraper used to return nothing), so a user
+        still sees online prices instead of an empty item.
+    """
+    if not prioritize_nearby:
+        return products
+
+    nearby = [p for p in products if p.get('is_in_store')]
+    return nearby if nearby else products
+
+
+def to_wire(products: Iterable) -> List[Dict]:
+    """Convert records (or already-plain dicts) to JSON-ready dicts"""
+    return [p.to_dict() if isinstance(p, ProductRecord) else p for p in products]
+
+
+def from_wire(products: Iterable) -> List[ProductRecord]:
+    """Convert product dicts (or records) to ProductRecords"""
+    return [p if isinstance(p, ProductRecord) else ProductRecord.from_dict(p) for p in products]
@@ -0,0 +1,438 @@
+"""
+Job Scheduler
+
+Priority lanes with weighted fair dequeue, replacing the single FIFO
+scrape_queue (carts) and refresh_queue (background refreshes).
+
+Lanes:
+- interactive_small:  carts with at most SMALL_CART_MAX_ITEMS items
+- interactive_large:  bigger carts
+- background:         stale-while-revalidate refreshes, prefetch hints and
+                      the cache warmer
+
+Within a lane every client (X-Client-Id header or IP for carts, ZIP for
+background refreshes) has its own FIFO, and clients are served round-robin,
+so one user submitting many carts doesn't push everyone else back.
+
+Across lanes, workers use smooth weighted round-robin over LANE_WEIGHTS
+(default 6:3:0), counting only lanes that have jobs waiting (an idle lane
+doesn't bank credit for a later burst). A lane with weight 0 is only served when every weighted
+lane is empty, which keeps background work from ever delaying a cart.
+
+Redis keys (per lane):
+    queue:{lane}:clients          round-robin list of clients with waiting jobs
+    queue:{lane}:active           set of those clients (dedupes the list)
+    queue:{lane}:client:{client}  the client's FIFO of job payloads
+    queue:{lane}:depth            jobs waiting in the lane (O(1) queue length)
+    queue:ready                   wake-up tokens for idle workers
+
+Enqueue and dequeue are Lua scripts, so a client is never dropped from
+(or added twice to) the round-robin list when both happen at once.
+
+EDF dispatch (DISPATCH_MODE=edf):
+Carts are split into one task per item in a sorted set scored by the cart's
+deadline, queue:edf. Workers claim the most urgent task with ZPOPMIN (atomic:
+every task goes to exactly one worker), so several workers share one cart
+and capacity goes to the carts whose users have waited longest relative to
+their deadline. Item tasks always win over lanes; the lanes still carry
+background refreshes (and carts queued before the mode was switched).
+
+Worker groups (WORKER_GROUPS > 1, see affinity.py):
+Every key above gets a group prefix (queue:{group}:{lane}:..., queue:{group}:edf,
+queue:{group}:ready) and jobs are routed to their ZIP region's group. A
+worker serves its own group and, after STEAL_AFTER idle seconds, steals
+from the other groups (and the ungrouped keys).
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from affinity import AFFINITY_STATS_KEY, STEAL_AFTER, group_names
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE_SMALL = 'interactive_small'
+INTERACTIVE_LARGE = 'interactive_large'
+BACKGROUND = 'background'
+LANES = (INTERACTIVE_SMALL, INTERACTIVE_LARGE, BACKGROUND)  # Priority order when credits tie
+INTERACTIVE_LANES = (INTERACTIVE_SMALL, INTERACTIVE_LARGE)
+
+SMALL_CART_MAX_ITEMS = int(os.getenv('SMALL_CART_MAX_ITEMS', 5))
+DEFAULT_LANE_WEIGHTS = 'interactive_small=6,interactive_large=3,background=0'
+
+DISPATCH_LANES = 'lanes'
+DISPATCH_EDF = 'edf'
+DISPATCH_MODE = os.getenv('DISPATCH_MODE', DISPATCH_LANES).lower()
+
+QUEUE_PREFIX = 'queue'
+EDF = 'edf'  # Pseudo-lane for item tasks claimed in deadline order
+EDF_STATS_KEY = 'stats:edf'
+READY_MAX_TOKENS = 100  # Enough to wake every idle worker; trimmed beyond that
+
+# Queues used before lanes existed (-> equivalent lane); still drained so no
+# job is lost on upgrade
+LEGACY_QUEUES = {'scrape_queue': INTERACTIVE_LARGE, 'refresh_queue': BACKGROUND}
+
+_ENQUEUE_SCRIPT = """
+-- KEYS: clients, active, depth, client queue, ready
+-- ARGV: client, payload, max ready tokens
+redis.call('RPUSH', KEYS[4], ARGV[2])
+if redis.call('SADD', KEYS[2], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+local depth = redis.call('INCR', KEYS[3])
+redis.call('LPUSH', KEYS[5], '1')
+redis.call('LTRIM', KEYS[5], 0, tonumber(ARGV[3]) - 1)
+return depth
+"""
+
+_DEQUEUE_SCRIPT = """
+-- KEYS: clients, active, depth
+-- ARGV: client queue prefix
+local client = redis.call('LPOP', KEYS[1])
+while client do
+    local queue = ARGV[1] .. client
+    local payload = redis.call('LPOP', queue)
+    if payload then
+        if redis.call('LLEN', queue) > 0 then
+            redis.call('RPUSH', KEYS[1], client)
+        else
+            redis.call('SREM', KEYS[2], client)
+        end
+        redis.call('DECR', KEYS[3])
+        return payload
+    end
+    redis.call('SREM', KEYS[2], client)
+    client = redis.call('LPOP', KEYS[1])
+end
+return false
+"""
+
+
+def parse_weights(spec: str) -> Dict[str, int]:
+    """Parse "lane=weight,..." (unknown lanes ignored, missing lanes weight 0)"""
+    weights = {lane: 0 for lane in LANES}
+    for part in (spec or '').split(','):
+        lane, _, weight = part.partition('=')
+        if lane.strip() in weights and weight.strip():
+            weights[lane.strip()] = max(0, int(weight))
+    return weights
+
+
+def lane_for_cart(item_count: int) -> str:
+    """Interactive lane for a cart of this size"""
+    return INTERACTIVE_SMALL if item_count <= SMALL_CART_MAX_ITEMS else INTERACTIVE_LARGE
+
+
+def _prefix(group: Optional[str]) -> str:
+    return f"{QUEUE_PREFIX}:{group}" if group else QUEUE_PREFIX
+
+
+class JobScheduler:
+    """
+    Multi-lane job queue with per-client fairness.
+
+    The API and item cache enqueue; each worker owns a JobScheduler whose
+    weighted round-robin credits decide which lane it serves next.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        weights: Optional[Dict[str, int]] = None,
+        mode: str = DISPATCH_MODE,
+        group: Optional[str] = None,
+        groups: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            weights: lane -> weight (default: LANE_WEIGHTS environment variable)
+            mode: "lanes" (whole carts per worker) or "edf" (item tasks by deadline)
+            group: This worker's group (None: ungrouped keys)
+            groups: Every worker group (default: from WORKER_GROUPS)
+        """
+        self.redis_client = redis_client
+        self.mode = mode
+        self.weights = weights or parse_weights(os.getenv('LANE_WEIGHTS', DEFAULT_LANE_WEIGHTS))
+        self.group = group
+        self.groups = group_names() if groups is None else groups
+        self._credits = {lane: 0 for lane in LANES}
+        self._steal_turn = 0
+        self._enqueue = redis_client.register_script(_ENQUEUE_SCRIPT)
+        self._dequeue = redis_client.register_script(_DEQUEUE_SCRIPT)
+
+    def _key(self, lane: str, suffix: str, group: Optional[str] = None) -> str:
+        return f"{_prefix(group)}:{lane}:{suffix}"
+
+    def _edf_key(self, group: Optional[str] = None) -> str:
+        return f"{_prefix(group)}:{EDF}"
+
+    def _ready_key(self, group: Optional[str] = None) -> str:
+        return f"{_prefix(group)}:ready"
+
+    def _all_groups(self) -> List[Optional[str]]:
+        """Ungrouped keys plus every configured group"""
+        return [None, *self.groups]
+
+    def enqueue(self, lane: str, client_id: str, payload: str, group: Optional[str] = None) -> int:
+        """
+        Add a job payload to the client's FIFO in a lane.
+
+        Args:
+            group: Worker group the job is routed to (None: ungrouped)
+
+        Returns:
+            Number of jobs now waiting in the lane (for that group)
+        """
+        return int(self._enqueue(
+            keys=[
+                self._key(lane, 'clients', group),
+                self._key(lane, 'active', group),
+                self._key(lane, 'depth', group),
+                self._key(lane, f'client:{client_id}', group),
+                self._ready_key(group)
+            ],
+            args=[client_id, payload, READY_MAX_TOKENS]
+        ))
+
+    def enqueue_cart(self, job_data: Dict, client_id: str, group: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Queue a cart the way the dispatch mode wants it.
+
+        Returns:
+            (lane, depth): "edf" and the number of waiting item tasks, or the
+            cart's lane and its depth
+        """
+        if self.mode == DISPATCH_EDF:
+            return EDF, self.enqueue_tasks(job_data, group)
+        lane = lane_for_cart(len(job_data['items']))
+        return lane, self.enqueue(lane, client_id, json.dumps(job_data), group)
+
+    def enqueue_tasks(self, job_data: Dict, group: Optional[str] = None) -> int:
+        """
+        Add one task per cart item to the EDF set, scored by the cart's deadline.
+
+        Items keep their cart order among tasks with the same deadline.
+
+        Returns:
+            Number of item tasks now waiting (for that group)
+        """
+        deadline = job_data.get('deadline') or time.time()
+        task = {key: value for key, value in job_data.items() if key != 'items'}
+        tasks = {
+            json.dumps({**task, 'item': item, 'index': index}): deadline + index * 1e-6
+            for index, item in enumerate(job_data['items'])
+        }
+        pipe = self.redis_client.pipeline()
+        pipe.zadd(self._edf_key(group), tasks)
+        pipe.zcard(self._edf_key(group))
+        pipe.lpush(self._ready_key(group), *['1'] * min(len(tasks), READY_MAX_TOKENS))
+        pipe.ltrim(self._ready_key(group), 0, READY_MAX_TOKENS - 1)
+        return int(pipe.execute()[1])
+
+    def claim_task(self, group: Optional[str] = None) -> Optional[Dict]:
+        """
+        Atomically take the item task with the earliest deadline.
+
+        Counts claims, and claims made after the task's deadline had already
+        passed (misses), in stats:edf.
+
+        Returns:
+            Task dict (job fields + "item", "index"), or None if none is waiting
+        """
+        popped = self.redis_client.zpopmin(self._edf_key(group))
+        if not popped:
+            return None
+
+        payload, deadline = popped[0]
+        lateness = time.time() - deadline
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.hincrby(EDF_STATS_KEY, 'claimed', 1)
+            if lateness > 0:
+                pipe.hincrby(EDF_STATS_KEY, 'claimed_late', 1)
+                pipe.hincrbyfloat(EDF_STATS_KEY, 'lateness_seconds', round(lateness, 3))
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Could not record EDF claim: {e}")
+        return json.loads(payload)
+
+    def _pop(self, lane: str, group: Optional[str] = None) -> Optional[str]:
+        """Next payload from a lane (round-robin over its clients), or None"""
+        return self._dequeue(
+            keys=[self._key(lane, 'clients', group), self._key(lane, 'active', group), self._key(lane, 'depth', group)],
+            args=[self._key(lane, 'client:', group)]
+        ) or None
+
+    def _waiting_lanes(self, lanes, group: Optional[str] = None) -> List[str]:
+        """Weighted lanes that have jobs waiting (one MGET of their depth counters)"""
+        weighted = [lane for lane in lanes if self.weights.get(lane)]
+        if not weighted:
+            return []
+        values = self.redis_client.mget([self._key(lane, 'depth', group) for lane in weighted])
+        return [lane for lane, value in zip(weighted, values) if int(value or 0) > 0]
+
+    def _lane_order(self, lanes, waiting: List[str]) -> List[str]:
+        """
+        Waiting weighted lanes by current credit (highest first), then the
+        other weighted lanes (their depth counter may lag), then zero-weight lanes
+        """
+        weighted = [lane for lane in lanes if self.weights.get(lane)]
+        busy = sorted(
+            (lane for lane in weighted if lane in waiting),
+            key=lambda lane: (-self._credits[lane], LANES.index(lane))
+        )
+        return busy + [lane for lane in weighted if lane not in waiting] + [lane for lane in lanes if not self.weights.get(lane)]
+
+    def _charge(self, lane: str, waiting: List[str]):
+        """
+        Smooth weighted round-robin over the lanes with work: each earns its
+        weight, the served one pays their total. Idle lanes start again from
+        zero, so credit earned while empty can't be spent in a burst later.
+        """
+        if not self.weights.get(lane):
+            return
+        active = set(waiting) | {lane}
+        for name, weight in self.weights.items():
+            if not weight:
+                continue
+            if name in active:
+                self._credits[name] += weight
+            else:
+                self._credits[name] = 0
+        self._credits[lane] -= sum(self.weights[name] for name in active)
+
+    def dequeue(self, lanes=LANES, group: Optional[str] = None, include_edf: bool = True) -> Optional[Tuple[str, str]]:
+        """
+        Take the next job according to the lane weights (non-blocking).
+
+        In EDF mode an item task, if any is waiting, is returned first as
+        ("edf", task dict).
+
+        Args:
+            group: Group whose queues to read (default: this worker's
+                   group; "" for the ungrouped keys)
+            include_edf: False to read lane payloads only (never an item task)
+
+        Returns:
+            (lane, payload), or None if every lane is empty
+        """
+        group = self.group if group is None else group
+        if self.mode == DISPATCH_EDF and include_edf:
+            task = self.claim_task(group)
+            if task is not None:
+                return EDF, task
+        waiting = self._waiting_lanes(lanes, group)
+        for lane in self._lane_order(lanes, waiting):
+            payload = self._pop(lane, group)
+            if payload is not None:
+                self._charge(lane, waiting)
+                return lane, payload
+        return None
+
+    def steal(self, lanes=LANES) -> Optional[Tuple[str, str]]:
+        """
+        Take a job from another group's queues (or the ungrouped ones).
+
+        Victims are tried round-robin starting after the last one robbed,
+        so stealing spreads across groups. Counted in stats:affinity.
+
+        Returns:
+            (lane, payload), or None if every other group is empty too
+        """
+        victims = [group for group in self._all_groups() if group != self.group]
+        for offset in range(len(victims)):
+            victim = victims[(self._steal_turn + offset) % len(victims)]
+            job = self.dequeue(lanes, group=victim or '')
+            if job is not None:
+                self._steal_turn += offset + 1
+                self._record_affinity('stolen')
+                return job
+        return None
+
+    def _record_affinity(self, kind: str):
+        """Count a job served by its own group ("local") or another ("stolen")"""
+        if not self.groups:
+            return
+        try:
+            self.redis_client.hincrby(AFFINITY_STATS_KEY, kind, 1)
+        except Exception as e:
+            logger.debug(f"Could not record affinity stats: {e}")
+
+    def wait(self, timeout: int = 5) -> Optional[Tuple[str, str]]:
+        """
+        Block until a job may be available, then dequeue it.
+
+        With worker groups configured, a worker waits at most STEAL_AFTER
+        seconds for its own group before stealing (a worker without a
+        group serves the ungrouped keys and steals from every group). Also drains LEGACY_QUEUES (jobs queued
+        before an upgrade), returned with their equivalent lane.
+
+        Returns:
+            (lane, payload), or None on timeout
+        """
+        job = self.dequeue()
+        if job is not None:
+            self._record_affinity('local')
+            return job
+
+        if self.groups:
+            timeout = max(1, min(timeout, int(STEAL_AFTER)))
+        ready_keys = [self._ready_key(self.group)] if self.group else []
+        woken = self.redis_client.brpop([*ready_keys, self._ready_key(), *LEGACY_QUEUES], timeout=timeout)
+
+        if woken is not None and woken[0] in LEGACY_QUEUES:
+            return LEGACY_QUEUES[woken[0]], woken[1]
+        if woken is not None:
+            job = self.dequeue()
+            if job is not None:
+                self._record_affinity('local')
+                return job
+        return self.steal() if self.groups else None
+
+    def depth(self, lanes=LANES) -> int:
+        """Jobs waiting in the given lanes across all groups (EDF counts item tasks)"""
+        return sum(self.depths(lanes).values())
+
+    def depths(self, lanes=LANES) -> Dict[str, int]:
+        """lane -> jobs waiting in every group (plus "edf" -> item tasks when interactive lanes are asked for in EDF mode)"""
+        groups = self._all_groups()
+        values = self.redis_client.mget([self._key(lane, 'depth', group) for lane in lanes for group in groups])
+        depths = {lane: 0 for lane in lanes}
+        for index, value in enumerate(values):
+            depths[lanes[index // len(groups)]] += max(0, int(value or 0))
+        if self.mode == DISPATCH_EDF and any(lane in INTERACTIVE_LANES for lane in lanes):
+            pipe = self.redis_client.pipeline()
+            for group in groups:
+                pipe.zcard(self._edf_key(group))
+            depths[EDF] = sum(pipe.execute())
+        return depths
+
+    def group_depths(self) -> Dict[str, int]:
+        """group -> jobs waiting in it (all lanes; "" for ungrouped keys)"""
+        groups = self._all_groups()
+        values = self.redis_client.mget([self._key(lane, 'depth', group) for group in groups for lane in LANES])
+        totals = {group or '': 0 for group in groups}
+        for index, value in enumerate(values):
+            totals[groups[index // len(LANES)] or ''] += max(0, int(value or 0))
+        if self.mode == DISPATCH_EDF:
+            pipe = self.redis_client.pipeline()
+            for group in groups:
+                pipe.zcard(self._edf_key(group))
+            for group, count in zip(groups, pipe.execute()):
+                totals[group or ''] += count
+        return totals
+
+    def edf_stats(self) -> Dict[str, float]:
+        """EDF counters: claimed, claimed_late, lateness_seconds, finished_late, items_skipped"""
+        stats = self.redis_client.hgetall(EDF_STATS_KEY)
+        return {key: float(value) for key, value in stats.items()}
+
+    def affinity_stats(self) -> Dict[str, int]:
+        """Jobs served by their own group ("local") vs stolen by another ("stolen")"""
+        stats = self.redis_client.hgetall(AFFINITY_STATS_KEY)
+        return {key: int(value) for key, value in stats.items()}
@@ -15,10 +15,11 @@ from bs4 import BeautifulSoup
 import re
 import json
 import logging
-from typing import List, Dict, Optional
+from typing import List, Optional
 from proxy_manager import ProxyPool, Proxy
 from session_manager import get_session_manager
 from callback_session import CallbackSession
+from product import ProductRecord
 import time
 import random
 
@@ -26,32 +27,6 @@ import random
 logger = logging.getLogger(__name__)
 
 
-class Product:
-    """Product data structure"""
-    
-    def __init__(self, data: Dict):
-        self.title = data.get('title')
-        self.price = data.get('price')
-        self.original_price = data.get('original_price')
-        self.merchant = data.get('merchant')
-        self.rating = data.get('rating')
-        self.review_count = data.get('review_count')
-        self.image_url = data.get('image_url')
-        self.product_id = data.get('product_id')
-    
-    def to_dict(self) -> Dict:
-        return {
-            'title': self.title,
-            'price': self.price,
-            'original_price': self.original_price,
-            'merchant': self.merchant,
-            'rating': self.rating,
-            'review_count': self.review_count,
-            'image_url': self.image_url,
-            'product_id': self.product_id
-        }
-
-
 class GoogleShoppingScraper:
     """
     Production-ready Google Shopping scraper with:
@@ -148,7 +123,7 @@ class GoogleShoppingScraper:
         
         return None
     
-    def _parse_product(self, container) -> Optional[Dict]:
+    def _parse_product(self, container) -> Optional[ProductRecord]:
         """Parse a single product from HTML"""
         try:
             soup = BeautifulSoup(str(container), 'html.parser')
@@ -217,22 +192,22 @@ class GoogleShoppingScraper:
             if parent:
                 product_id = parent.get('data-iid')
             
-            return {
-                'title': title,
-                'price': price,
-                'original_price': original_price,
-                'merchant': merchant,
-                'rating': rating,
-                'review_count': reviews,
-                'image_url': image_url,
-                'product_id': product_id
-            }
+            return ProductRecord(
+                name=title,
+                price=price,
+                merchant=merchant,
+                rating=rating,
+                review_count=reviews,
+                original_price=original_price,
+                image_url=image_url,
+                product_id=product_id
+            )
         
         except Exception as e:
             print(f"⚠️  Error parsing product: {e}")
             return None
     
-    def _parse_with_regex(self, html: str) -> List[Dict]:
+    def _parse_with_regex(self, html: str) -> List[ProductRecord]:
         """
         Parse products using REGEX (Google Maps agent's approach)
         Data is embedded as escaped JSON in the HTML
@@ -281,20 +256,15 @@ class GoogleShoppingScraper:
         max_len = max(len(titles), len(prices))
         for i in range(max_len):
             if i < len(titles) or i < len(prices):
-                products.append({
-                    'title': titles[i] if i < len(titles) else None,
-                    'price': prices[i] if i < len(prices) else None,
-                    'original_price': None,
-                    'merchant': merchants[i] if i < len(merchants) else None,
-                    'rating': None,
-                    'review_count': None,
-                    'image_url': None,
-                    'product_id': None
-                })
+                products.append(ProductRecord(
+                    name=titles[i] if i < len(titles) else None,
+                    price=prices[i] if i < len(prices) else None,
+                    merchant=merchants[i] if i < len(merchants) else None
+                ))
         
         return products
     
-    def search(self, query: str, zipcode: str = None, limit: int = 20) -> List[Dict]:
+    def search(self, query: str, zipcode: str = None, limit: int = 20) -> List[ProductRecord]:
         """
         Search Google Shopping for products using session pool.
         
@@ -310,7 +280,7 @@ class GoogleShoppingScraper:
             limit: Max number of results to return
             
         Returns:
-            List of product dictionaries
+            List of ProductRecords
         """
         logger.info(f"🔍 Searching for: {query} (region={self.region})")
         
@@ -369,7 +339,7 @@ class GoogleShoppingScraper:
         products = []
         for container in containers[:limit]:
             product_data = self._parse_product(container)
-            if product_data and product_data.get('title') and product_data.get('price'):
+            if product_data and product_data.name and product_data.price:
                 products.append(product_data)
         
         logger.info(f"✅ Parsed {len(products)} valid products")
@@ -379,7 +349,7 @@ class GoogleShoppingScraper:
         
         return products
     
-    def search_with_callback_url(self, callback_url: str) -> List[Dict]:
+    def search_with_callback_url(self, callback_url: str) -> List[ProductRecord]:
         """
         Fast search using pre-captured callback URL
         (For testing or when you have a known callback URL)
@@ -403,7 +373,7 @@ class GoogleShoppingScraper:
         products = []
         for container in containers:
             product_data = self._parse_product(container)
-            if product_data and product_data.get('title') and product_data.get('price'):
+            if product_data and product_data.name and product_data.price:
                 products.append(product_data)
         
         print(f"✅ Parsed {len(products)} products")
@@ -426,7 +396,7 @@ def example_usage():
     products = scraper.search("milk", zipcode="90210", limit=5)
     
     for i, p in enumerate(products, 1):
-        print(f"{i}. {p['title']} - ${p['price']} @ {p['merchant']}")
+        print(f"{i}. {p.name} - ${p.price} @ {p.merchant}")
     
     # Option 2: With ISP proxies (recommended for production)
     print("\n" + "=" * 80)
@@ -444,7 +414,7 @@ def example_usage():
     products = scraper.search("eggs", zipcode="10001", limit=5)
     
     for i, p in enumerate(products, 1):
-        print(f"{i}. {p['title']} - ${p['price']} @ {p['merchant']}")
+        print(f"{i}. {p.name} - ${p.price} @ {p.merchant}")
     
     # Show proxy stats
     print("\n" + "=" * 80)
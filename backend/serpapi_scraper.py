@@ -15,51 +15,26 @@ Key Features:
 import os
 import logging
 import time
-import csv
 from typing import List, Dict, Optional
 from serpapi import GoogleSearch
 from dotenv import load_dotenv
+from zip_snapshot import ZipPrefixLookup
+from product import ProductRecord, select_view
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# Load ZIP code database for ZIP and city fallback
-def _load_zip_database():
-    """
-    Load ZIP database and create prefix lookup for fallback.
-    
-    Returns:
-        Dictionary mapping ZIP prefix (3 digits) to (first_zipcode, city, state)
-        Example: "102" → ("10201", "New York", "New York")
-    """
-    zip_lookup = {}
-    csv_path = os.path.join(os.path.dirname(__file__), 'zip_database.csv')
-    
-    try:
-        with open(csv_path, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                zipcode = row.get('zipcode', '').strip()
-                city = row.get('city', '').strip()
-                state = row.get('state', '').strip()
-                
-                if zipcode and city and state and len(zipcode) == 5:
-                    prefix = zipcode[:3]  # First 3 digits
-                    # Only store first occurrence of each prefix
-                    # First ZIP in each prefix is typically a major city
-                    if prefix not in zip_lookup:
-                        zip_lookup[prefix] = (zipcode, city, state)
-        
-        logger.info(f"✅ Loaded ZIP database: {len(zip_lookup)} prefixes")
-    except Exception as e:
-        logger.warning(f"⚠️  Could not load ZIP database: {e}")
-    
-    return zip_lookup
+# ZIP prefix lookup for ZIP and city fallback.
+# Backed by the mmap'd snapshot from zip_snapshot.py (CSV parsed lazily if missing),
+# so importing this module no longer parses zip_database.csv.
+# Example: ZIP_PREFIX_LOOKUP["102"] → ("10201", "New York", "New York")
+ZIP_PREFIX_LOOKUP = ZipPrefixLookup()
 
-# Global ZIP lookup (loaded once at module init)
-ZIP_PREFIX_LOOKUP = _load_zip_database()
+# A retry or fallback is only started if at least this much of the caller's
+# time budget would remain for the request itself (typical SerpAPI call: 2-4s)
+MIN_REQUEST_BUDGET = 3.0
 
 class SerpAPIGoogleShoppingScraper:
     """
@@ -77,7 +52,16 @@ class SerpAPIGoogleShoppingScraper:
         
         logger.info("✅ SerpAPI scraper initialized")
     
-    def _search_by_city(self, query: str, zipcode: str, city: str, state: str, prioritize_nearby: bool) -> List[Dict]:
+    def _search_by_city(
+        self,
+        query: str,
+        zipcode: str,
+        city: str,
+        state: str,
+        prioritize_nearby: bool,
+        full_results: bool = False,
+        _deadline: Optional[float] = None
+    ) -> List[ProductRecord]:
         """
         Search SerpAPI using city name for location, but keeping original ZIP in query.
         This is used as a fallback when ZIP is unsupported.
@@ -88,9 +72,11 @@ class SerpAPIGoogleShoppingScraper:
             city: City name (used in location parameter)
             state: State name (used in location parameter)
             prioritize_nearby: Whether to prioritize nearby results
+            full_results: If True, return every product (flagged by is_in_store)
+            _deadline: Absolute time.time() deadline inherited from search()
             
         Returns:
-            List of product dictionaries
+            List of ProductRecords
         """
         try:
             # Keep original query format with ZIP, only change location parameter
@@ -110,6 +96,8 @@ class SerpAPIGoogleShoppingScraper:
             
             # Execute search
             search = GoogleSearch(params)
+            if _deadline is not None:
+                search.timeout = max(1.0, _deadline - time.time())
             results = search.get_dict()
             
             # Check for errors
@@ -126,8 +114,10 @@ class SerpAPIGoogleShoppingScraper:
             
             logger.info(f"📦 Got {len(shopping_results)} results from city search")
             
-            # Parse and filter products (reuse existing method)
-            products = self._parse_products(shopping_results, prioritize_nearby)
+            # Parse products (reuse existing method), then derive the requested view
+            products = self._parse_products(shopping_results)
+            if not full_results:
+                products = select_view(products, prioritize_nearby)
             
             logger.info(f"✅ City search returned {len(products)} products")
             
@@ -171,8 +161,11 @@ class SerpAPIGoogleShoppingScraper:
         query: str, 
         zipcode: str, 
         prioritize_nearby: bool = True,
-        _retry_count: int = 0
-    ) -> List[Dict]:
+        full_results: bool = False,
+        timeout: Optional[float] = None,
+        _retry_count: int = 0,
+        _deadline: Optional[float] = None
+    ) -> List[ProductRecord]:
         """
         Search Google Shopping for products.
         
@@ -180,18 +173,34 @@ class SerpAPIGoogleShoppingScraper:
             query: Product search query (e.g., "whole milk gallon")
             zipcode: ZIP code for location-based search
             prioritize_nearby: If True, filter to in-store only. If False, include all sources.
+            full_results: If True, skip the view filter and return every product
+                (online-only included) so callers can cache one set for both views.
+                prioritize_nearby still drives the retry policy.
+            timeout: Total time budget in seconds (None = unbounded). Retries
+                and fallback levels are skipped once they no longer fit, and the
+                best results so far are returned instead.
             _retry_count: Internal retry counter (do not set manually)
+            _deadline: Internal absolute deadline derived from timeout
         
         Returns:
-            List of product dictionaries with keys:
+            List of ProductRecords (see product.py):
                 - name: Product name
                 - price: Price as float
                 - merchant: Store name
                 - rating: Product rating (optional)
                 - review_count: Number of reviews (optional)
+                - is_in_store: True if sold in store / nearby
+                - location: In-store location text (e.g. "In store, Tampa") or None
         """
         import time
         
+        if _deadline is None and timeout is not None:
+            _deadline = time.time() + timeout
+        
+        def fits(wait: float = 0) -> bool:
+            """True if waiting `wait` seconds still leaves time for another request"""
+            return _deadline is None or _deadline - time.time() >= wait + MIN_REQUEST_BUDGET
+        
         try:
             # Format query for nearby results (SerpAPI format)
             # Critical: Must use "query near, ZIP nearby" format to get in-store results
@@ -213,8 +222,10 @@ class SerpAPIGoogleShoppingScraper:
                 "no_cache": "true"  # Force fresh results to avoid stale cache
             }
             
-            # Execute search
+            # Execute search (HTTP timeout capped by the remaining budget)
             search = GoogleSearch(params)
+            if _deadline is not None:
+                search.timeout = max(1.0, _deadline - time.time())
             results = search.get_dict()
             
             # Check for errors
@@ -234,9 +245,12 @@ class SerpAPIGoogleShoppingScraper:
                             fallback_zip, city, state = ZIP_PREFIX_LOOKUP[zip_prefix]
                             
                             # Level 1: Try first ZIP with same prefix
-                            if fallback_zip and fallback_zip != zipcode:
+                            if fallback_zip and fallback_zip != zipcode and fits():
                                 logger.info(f"🔄 Fallback Level 1: ZIP {zipcode} → ZIP {fallback_zip}")
-                                zip_results = self.search(query, fallback_zip, prioritize_nearby, _retry_count=99)
+                                zip_results = self.search(
+                                    query, fallback_zip, prioritize_nearby, full_results=full_results,
+                                    _retry_count=99, _deadline=_deadline
+                                )
                                 if zip_results:
                                     logger.info(f"✅ ZIP fallback to {fallback_zip} successful! Found {len(zip_results)} products.")
                                     return zip_results
@@ -244,8 +258,13 @@ class SerpAPIGoogleShoppingScraper:
                                     logger.warning(f"⚠️  ZIP {fallback_zip} also failed or had no results")
                             
                             # Level 2: Try city search as final fallback
+                            if not fits():
+                                logger.warning(f"⏱️  Out of time budget, skipping city fallback for {zipcode}")
+                                return []
                             logger.info(f"🔄 Fallback Level 2: ZIP {zipcode} → {city}, {state} (city search)")
-                            city_results = self._search_by_city(query, zipcode, city, state, prioritize_nearby)
+                            city_results = self._search_by_city(
+                                query, zipcode, city, state, prioritize_nearby, full_results, _deadline=_deadline
+                            )
                             if city_results:
                                 logger.info(f"✅ City fallback to {city}, {state} successful! Found {len(city_results)} products.")
                                 return city_results
@@ -257,11 +276,14 @@ class SerpAPIGoogleShoppingScraper:
                         return []
                 
                 # For other errors (rate limiting, API down, etc), use retry logic
-                if _retry_count < 2:  # Max 3 attempts
+                if _retry_count < 2 and fits(2 ** _retry_count):  # Max 3 attempts
                     wait_time = 2 ** _retry_count  # Exponential backoff: 1s, 2s
                     logger.warning(f"⚠️  SerpAPI error: {error_msg}. Retrying in {wait_time}s...")
                     time.sleep(wait_time)
-                    return self.search(query, zipcode, prioritize_nearby, _retry_count + 1)
+                    return self.search(
+                        query, zipcode, prioritize_nearby, full_results=full_results,
+                        _retry_count=_retry_count + 1, _deadline=_deadline
+                    )
                 else:
                     logger.error(f"❌ SerpAPI error after 3 attempts: {error_msg}")
                     return []
@@ -273,29 +295,39 @@ class SerpAPIGoogleShoppingScraper:
                 logger.warning(f"⚠️  No results found for '{query}' in {zipcode}")
                 
                 # Retry if we got no results from SerpAPI at all
-                if _retry_count < 2:
+                if _retry_count < 2 and fits(2 ** _retry_count):
                     wait_time = 2 ** _retry_count
                     logger.warning(f"⚠️  Retrying in {wait_time}s...")
                     time.sleep(wait_time)
-                    return self.search(query, zipcode, prioritize_nearby, _retry_count + 1)
+                    return self.search(
+                        query, zipcode, prioritize_nearby, full_results=full_results,
+                        _retry_count=_retry_count + 1, _deadline=_deadline
+                    )
                 
                 return []
             
             logger.info(f"📦 Got {len(shopping_results)} total results from SerpAPI")
             
-            # Parse and filter products
-            products = self._parse_products(shopping_results, prioritize_nearby)
+            # Parse every product once (flagged by is_in_store)
+            products = self._parse_products(shopping_results)
+            in_store_count = sum(1 for p in products if p.is_in_store)
             
-            logger.info(f"✅ Returning {len(products)} products (after filtering)")
+            logger.info(f"✅ Parsed {len(products)} products ({in_store_count} in-store)")
             
-            # CRITICAL: Retry if filtering returned 0 products (when prioritizing nearby)
-            if len(products) == 0 and prioritize_nearby and _retry_count < 2:
+            # CRITICAL: Retry if there are 0 in-store products (when prioritizing nearby).
+            # Out of budget, the online results we already have are returned instead.
+            if in_store_count == 0 and prioritize_nearby and _retry_count < 2 and fits(2 ** _retry_count):
                 wait_time = 2 ** _retry_count
                 logger.warning(f"⚠️  Filtering returned 0 in-store products. Retrying in {wait_time}s...")
                 time.sleep(wait_time)
-                return self.search(query, zipcode, prioritize_nearby, _retry_count + 1)
+                return self.search(
+                    query, zipcode, prioritize_nearby, full_results=full_results,
+                    _retry_count=_retry_count + 1, _deadline=_deadline
+                )
             
-            return products
+            if full_results:
+                return products
+            return select_view(products, prioritize_nearby)
         
         except Exception as e:
             logger.error(f"❌ Unexpected error in SerpAPI search: {e}")
@@ -303,18 +335,19 @@ class SerpAPIGoogleShoppingScraper:
     
     def _parse_products(
         self, 
-        shopping_results: List[Dict], 
-        prioritize_nearby: bool
-    ) -> List[Dict]:
+        shopping_results: List[Dict]
+    ) -> List[ProductRecord]:
         """
-        Parse SerpAPI results into our standard product format.
+        Parse SerpAPI results into ProductRecords.
+        
+        Every product is kept and flagged with `is_in_store`; the nearby/all
+        views are derived later with product.select_view().
         
         Args:
             shopping_results: Raw results from SerpAPI
-            prioritize_nearby: Whether to filter for in-store only
         
         Returns:
-            List of parsed products
+            List of parsed products (all sources)
         """
         products = []
         
@@ -338,23 +371,16 @@ class SerpAPIGoogleShoppingScraper:
                 for ext in extensions
             )
             
-            # DEBUG: Log what extensions we're seeing
-            if extensions:
-                logger.info(f"   🔍 {source}: extensions={extensions}, is_in_store={is_in_store}")
-            
-            # Filter based on prioritize_nearby setting
-            if prioritize_nearby and not is_in_store:
-                continue  # Skip online-only products when prioritizing nearby
-            
-            # Build product dict in our standard format
-            product = {
-                "name": title,
-                "price": float(price),
-                "merchant": source,
-                "rating": item.get("rating", None),
-                "review_count": item.get("reviews", None),
-                "location": None  # Will be populated if in-store
-            }
+            # Build the standard product record
+            product = ProductRecord(
+                name=title,
+                price=float(price),
+                merchant=source,
+                rating=item.get("rating", None),
+                review_count=item.get("reviews", None),
+                is_in_store=is_in_store,
+                location=None  # Will be populated if in-store
+            )
             
             # Add location info if in-store or nearby
             if is_in_store:
@@ -367,13 +393,13 @@ class SerpAPIGoogleShoppingScraper:
                 )
                 if location_info:
                     # Extract from "In store, City", "Nearby, X mi", or "Also nearby" format
-                    product["location"] = location_info
+                    product.location = location_info
                     logger.debug(f"   📍 {source}: {location_info}")
             
             products.append(product)
         
         # Sort by price (lowest first)
-        products.sort(key=lambda x: x['price'])
+        products.sort(key=lambda x: x.price)
         
         return products
     
@@ -421,14 +447,14 @@ if __name__ == "__main__":
     results_nearby = scraper.search("large eggs", "33773", prioritize_nearby=True)
     print(f"   Found {len(results_nearby)} in-store products")
     if results_nearby:
-        print(f"   Lowest: ${results_nearby[0]['price']:.2f} at {results_nearby[0]['merchant']}")
+        print(f"   Lowest: ${results_nearby[0].price:.2f} at {results_nearby[0].merchant}")
     
     # Test 2: With prioritize_nearby=False
     print("\n2️⃣ Test: prioritize_nearby=False")
     results_all = scraper.search("large eggs", "33773", prioritize_nearby=False)
     print(f"   Found {len(results_all)} total products")
     if results_all:
-        print(f"   Lowest: ${results_all[0]['price']:.2f} at {results_all[0]['merchant']}")
+        print(f"   Lowest: ${results_all[0].price:.2f} at {results_all[0].merchant}")
     
     print("\n✅ Tests complete!")
 
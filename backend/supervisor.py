@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Worker Supervisor
+
+Runs a pool of PersistentBrowserWorker processes on one host and sizes it
+to the memory actually available, instead of hand-tuned systemd units
+(5 Chrome workers on a 2GB droplet were OOM-killed, see SCALING_HANDOFF.md).
+
+Every SCALE_INTERVAL seconds the supervisor:
+1. Measures each worker's RSS including its Chrome/chromedriver/Xvfb
+   children (from /proc, so Linux only)
+2. Scales down (newest worker first) while total RSS is over the budget
+3. Scales up by one when carts are waiting (more than
+   SCALE_UP_QUEUE_PER_WORKER per worker) and another worker of the
+   largest size seen so far still fits in the budget
+4. Scales down by one after SCALE_DOWN_IDLE seconds without waiting carts
+5. Restarts crashed workers with exponential backoff (reset once a worker
+   has stayed up for BACKOFF_RESET seconds)
+
+Workers are separate `python3 worker.py` processes in their own process
+group, stopped with SIGTERM (the current job finishes first) and killed
+with their whole process tree after STOP_TIMEOUT.
+
+Environment variables:
+- REDIS_HOST / REDIS_PORT: Redis server (default: localhost:6379)
+- WORKER_ID: Worker id prefix (default: worker-{hostname}); workers get "-1", "-2", ...
+- WORKER_MIN / WORKER_MAX: Pool size bounds (default: 1 / 4)
+- WORKER_MEMORY_BUDGET_MB: RSS budget for all workers (default: 80% of RAM)
+- WORKER_RSS_ESTIMATE_MB: Assumed size of a worker before one is measured (default: 800)
+- SCALE_INTERVAL: Seconds between scaling decisions (default: 10)
+- SCALE_UP_QUEUE_PER_WORKER: Waiting carts per worker that trigger a scale up (default: 2)
+- SCALE_DOWN_IDLE: Seconds of empty queue before scaling down (default: 120)
+Plus everything worker.py reads (passed through to the workers).
+
+Usage:
+    python3 worker.py --supervise
+    python3 supervisor.py
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import subprocess
+from dataclasses import dataclass
+from typing import List, Optional
+
+import redis
+from dotenv import load_dotenv
+
+from scheduler import INTERACTIVE_LANES, JobScheduler
+from proc_stats import MB, default_memory_budget, process_tree, tree_rss
+from log_setup import configure_logging
+
+load_dotenv()
+
+configure_logging('supervisor')
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worker.py')
+
+STOP_TIMEOUT = 120  # Seconds a stopping worker gets to finish its job
+BACKOFF_BASE = 5
+BACKOFF_MAX = 300
+BACKOFF_RESET = 300  # A worker up this long is healthy again
+
+
+@dataclass
+class WorkerSlot:
+    """One supervised worker process (or a slot waiting to be restarted)"""
+    slot: int
+    process: Optional[subprocess.Popen] = None
+    started_at: float = 0.0
+    failures: int = 0
+    restart_at: float = 0.0
+    stopping_since: Optional[float] = None
+    rss: int = 0
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+
+class WorkerSupervisor:
+    """
+    Keeps between min_workers and max_workers worker processes alive,
+    scaled by queue depth within a memory budget
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        worker_id: str,
+        min_workers: int = 1,
+        max_workers: int = 4,
+        memory_budget: Optional[int] = None,
+        rss_estimate: int = 800 * MB,
+        scale_interval: float = 10,
+        scale_up_queue_per_worker: float = 2,
+        scale_down_idle: float = 120
+    ):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True), for queue depth
+            worker_id: Prefix for worker ids ("{worker_id}-{slot}")
+            min_workers / max_workers: Pool size bounds
+            memory_budget: Total RSS bytes the pool may use (default: 80% of RAM)
+            rss_estimate: Bytes assumed per worker until one has been measured
+            scale_interval: Seconds between scaling decisions
+            scale_up_queue_per_worker: Waiting carts per worker that trigger a scale up
+            scale_down_idle: Seconds the queue must stay empty before scaling down
+        """
+        self.scheduler = JobScheduler(redis_client)
+        self.worker_id = worker_id
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.memory_budget = memory_budget or default_memory_budget()
+        self.rss_estimate = rss_estimate
+        self.scale_interval = scale_interval
+        self.scale_up_queue_per_worker = scale_up_queue_per_worker
+        self.scale_down_idle = scale_down_idle
+
+        self.slots: List[WorkerSlot] = []
+        self.peak_worker_rss = 0
+        self.idle_since: Optional[float] = None
+        self._stopping = False
+
+    # -- process management -------------------------------------------------
+
+    def _spawn(self, slot: WorkerSlot):
+        env = dict(os.environ, WORKER_ID=f"{self.worker_id}-{slot.slot}")
+        slot.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT],
+            env=env,
+            start_new_session=True  # Own process group: Chrome is killed with it
+        )
+        slot.started_at = time.time()
+        slot.stopping_since = None
+        logger.info(f"🚀 Started {env['WORKER_ID']} (pid {slot.process.pid})")
+
+    def _signal_group(self, slot: WorkerSlot, sig: int):
+        try:
+            os.killpg(slot.process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _stop(self, slot: WorkerSlot):
+        """Ask a worker to finish its current job and exit"""
+        if slot.running and slot.stopping_since is None:
+            logger.info(f"🛑 Stopping {self.worker_id}-{slot.slot} (pid {slot.process.pid})")
+            slot.process.send_signal(signal.SIGTERM)
+            slot.stopping_since = time.time()
+
+    def _reap(self):
+        """Handle exited workers: drop stopped ones, schedule restarts for crashed ones"""
+        now = time.time()
+        for slot in list(self.slots):
+            if slot.process is None:
+                continue
+
+            if slot.running:
+                if slot.stopping_since is not None and now - slot.stopping_since > STOP_TIMEOUT:
+                    logger.warning(f"⚠️  {self.worker_id}-{slot.slot} did not stop in {STOP_TIMEOUT}s, killing")
+                    self._signal_group(slot, signal.SIGKILL)
+                continue
+
+            # Exited: make sure no Chrome child outlives it
+            self._signal_group(slot, signal.SIGKILL)
+            code = slot.process.returncode
+
+            if slot.stopping_since is not None:
+                self.slots.remove(slot)
+                continue
+
+            uptime = now - slot.started_at
+            slot.failures = 1 if uptime >= BACKOFF_RESET else slot.failures + 1
+            delay = min(BACKOFF_BASE * 2 ** (slot.failures - 1), BACKOFF_MAX)
+            slot.process = None
+            slot.restart_at = now + delay
+            logger.error(
+                f"❌ {self.worker_id}-{slot.slot} exited with code {code} after {uptime:.0f}s, "
+                f"restarting in {delay}s (failure #{slot.failures})"
+            )
+
+    def _restart_due(self):
+        now = time.time()
+        for slot in self.slots:
+            if slot.process is None and now >= slot.restart_at and not self._stopping:
+                self._spawn(slot)
+
+    # -- scaling ------------------------------------------------------------
+
+    def _active(self) -> List[WorkerSlot]:
+        """Slots that count toward the pool size (running or awaiting restart)"""
+        return [s for s in self.slots if s.stopping_since is None]
+
+    def _measure(self) -> int:
+        """Update every worker's tree RSS; returns the pool total in bytes"""
+        children = process_tree()
+        total = 0
+        for slot in self.slots:
+            slot.rss = tree_rss(slot.process.pid, children) if slot.running else 0
+            total += slot.rss
+            self.peak_worker_rss = max(self.peak_worker_rss, slot.rss)
+        return total
+
+    def _add_worker(self):
+        used = {s.slot for s in self.slots}
+        slot = WorkerSlot(slot=next(i for i in range(1, len(used) + 2) if i not in used))
+        self.slots.append(slot)
+        self._spawn(slot)
+
+    def _remove_worker(self):
+        """Stop the newest active worker (its browser is the least warmed up)"""
+        active = self._active()
+        if not active:
+            return
+        newest = max(active, key=lambda s: s.started_at)
+        if newest.process is None:
+            self.slots.remove(newest)  # Awaiting restart: just forget it
+        else:
+            self._stop(newest)
+
+    def scale(self):
+        """One scaling decision (see module docstring)"""
+        total_rss = self._measure()
+        active = self._active()
+        try:
+            waiting = self.scheduler.depth(INTERACTIVE_LANES)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not read queue depth: {e}")
+            waiting = 0
+
+        per_worker = self.peak_worker_rss or self.rss_estimate
+        now = time.time()
+        self.idle_since = (self.idle_since or now) if waiting == 0 else None
+
+        logger.info(
+            f"📊 {len(active)} worker(s), RSS {total_rss / MB:.0f}/{self.memory_budget / MB:.0f} MB "
+            f"(peak {per_worker / MB:.0f} MB/worker), {waiting} cart(s) waiting"
+        )
+
+        if any(s.stopping_since is not None for s in self.slots):
+            return  # Wait for the previous scale-down to free its memory
+        if len(active) < self.min_workers:
+            self._add_worker()
+        elif total_rss > self.memory_budget and len(active) > 1:
+            logger.warning("⚠️  Over memory budget, scaling down")
+            self._remove_worker()
+        elif (waiting > self.scale_up_queue_per_worker * len(active)
+              and len(active) < self.max_workers
+              and total_rss + per_worker <= self.memory_budget):
+            logger.info(f"📈 Scaling up to {len(active) + 1} worker(s)")
+            self._add_worker()
+        elif (self.idle_since is not None and now - self.idle_since >= self.scale_down_idle
+              and len(active) > self.min_workers):
+            logger.info(f"📉 Queue idle for {now - self.idle_since:.0f}s, scaling down to {len(active) - 1} worker(s)")
+            self._remove_worker()
+            self.idle_since = now
+
+    # -- main loop ----------------------------------------------------------
+
+    def _handle_signal(self, signum, frame):
+        logger.info(f"🛑 Supervisor received signal {signum}, stopping workers...")
+        self._stopping = True
+
+    def run(self):
+        """Supervise until SIGTERM/SIGINT, then stop every worker"""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        logger.info(
+            f"🏭 Supervising {self.min_workers}-{self.max_workers} workers, "
+            f"memory budget {self.memory_budget / MB:.0f} MB"
+        )
+        for _ in range(self.min_workers):
+            self._add_worker()
+
+        next_scale = time.time() + self.scale_interval
+        while not self._stopping:
+            time.sleep(1)
+            self._reap()
+            self._restart_due()
+            if time.time() >= next_scale:
+                self.scale()
+                next_scale = time.time() + self.scale_interval
+
+        for slot in self.slots:
+            self._stop(slot)
+        while any(slot.running for slot in self.slots):
+            time.sleep(1)
+            self._reap()
+        self._reap()
+        logger.info("👋 Supervisor stopped")
+
+
+def main():
+    """Run the supervisor with settings from the environment"""
+    redis_client = redis.Redis(
+        host=os.environ.get('REDIS_HOST', 'localhost'),
+        port=int(os.environ.get('REDIS_PORT', 6379)),
+        decode_responses=True
+    )
+    budget_mb = os.environ.get('WORKER_MEMORY_BUDGET_MB')
+
+    supervisor = WorkerSupervisor(
+        redis_client,
+        worker_id=os.environ.get('WORKER_ID') or f"worker-{socket.gethostname()}",
+        min_workers=int(os.environ.get('WORKER_MIN', 1)),
+        max_workers=int(os.environ.get('WORKER_MAX', 4)),
+        memory_budget=int(budget_mb) * MB if budget_mb else None,
+        rss_estimate=int(os.environ.get('WORKER_RSS_ESTIMATE_MB', 800)) * MB,
+        scale_interval=float(os.environ.get('SCALE_INTERVAL', 10)),
+        scale_up_queue_per_worker=float(os.environ.get('SCALE_UP_QUEUE_PER_WORKER', 2)),
+        scale_down_idle=float(os.environ.get('SCALE_DOWN_IDLE', 120))
+    )
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,15 +23,19 @@ from typing import List, Dict, Optional
 from multiprocessing import Process, Queue
 import os
 
+from product import ProductRecord, select_view
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+UC_PAGE_LOAD_TIMEOUT = 300  # Selenium's default page load timeout (seconds)
+
 
 class ProductParser:
     """Parses product data from Google Shopping HTML"""
     
     @staticmethod
-    def extract_products_from_html(html_content: str) -> List[Dict]:
+    def extract_products_from_html(html_content: str) -> List[ProductRecord]:
         """
         Extract products using the PROVEN method from our working tests
         Uses CSS selectors to find product containers and extract data
@@ -99,13 +103,13 @@ class ProductParser:
                 
                 # Only add if we have minimum data and merchant looks valid
                 if product_name and price and merchant and len(merchant) > 1:
-                    products.append({
-                        'name': product_name,
-                        'price': price,
-                        'merchant': merchant,
-                        'rating': rating,
-                        'review_count': review_count
-                    })
+                    products.append(ProductRecord(
+                        name=product_name,
+                        price=price,
+                        merchant=merchant,
+                        rating=rating,
+                        review_count=review_count
+                    ))
             
             except Exception as e:
                 logger.debug(f"Error parsing product: {e}")
@@ -184,8 +188,14 @@ class UCGoogleShoppingScraper:
         """Check if page is a CAPTCHA challenge"""
         return 'detected unusual traffic' in html or 'recaptcha' in html.lower()
     
-    def _extract_products(self, driver, prioritize_nearby: bool = True) -> List[Dict]:
-        """Extract products from current page using PROVEN Selenium method"""
+    def _extract_products(self, driver) -> List[ProductRecord]:
+        """
+        Extract ALL products from current page using PROVEN Selenium method
+        
+        Products inside the "In stores nearby" section are flagged
+        is_in_store=True, so one page load serves both the nearby and
+        the all-products view (see product.select_view).
+        """
         html = driver.page_source
         
         # Check for CAPTCHA
@@ -207,18 +217,16 @@ class UCGoogleShoppingScraper:
             soup = BeautifulSoup(html, 'html.parser')
             products = []
             
-            # If user wants to prioritize nearby, try to find "In stores nearby" section
-            if prioritize_nearby:
-                nearby_section = soup.find('div', {'jsname': 'EvNWZc'})
-                if nearby_section:
-                    logger.info("✓ Found 'In stores nearby' section, filtering to local stores only")
-                    product_elements = nearby_section.find_all(attrs={'aria-label': True})
-                else:
-                    logger.info("✗ 'In stores nearby' section not found, falling back to all products")
-                    product_elements = soup.find_all(attrs={'aria-label': True})
+            # Find the "In stores nearby" section so its products can be flagged
+            nearby_elements = set()
+            nearby_section = soup.find('div', {'jsname': 'EvNWZc'})
+            if nearby_section:
+                nearby_elements = {id(el) for el in nearby_section.find_all(attrs={'aria-label': True})}
+                logger.info(f"✓ Found 'In stores nearby' section ({len(nearby_elements)} elements)")
             else:
-                logger.info("ℹ️ Prioritize nearby = OFF, using all products for best prices")
-                product_elements = soup.find_all(attrs={'aria-label': True})
+                logger.info("✗ 'In stores nearby' section not found, no products flagged in-store")
+            
+            product_elements = soup.find_all(attrs={'aria-label': True})
             
             merchant_idx = 0
             for element in product_elements:
@@ -268,13 +276,15 @@ class UCGoogleShoppingScraper:
                     
                     # Only add if we have minimum data
                     if product_name and price and merchant:
-                        products.append({
-                            'name': product_name,
-                            'price': price,
-                            'merchant': merchant,
-                            'rating': rating,
-                            'review_count': review_count
-                        })
+                        products.append(ProductRecord(
+                            name=product_name,
+                            price=price,
+                            merchant=merchant,
+                            rating=rating,
+                            review_count=review_count,
+                            is_in_store=id(element) in nearby_elements,
+                            location=None  # Not available in aria-label parsing
+                        ))
                 
                 except Exception as e:
                     logger.debug(f"Error parsing product: {e}")
@@ -294,8 +304,10 @@ class UCGoogleShoppingScraper:
         wait_time: int = None,
         driver=None,
         close_driver: bool = True,
-        prioritize_nearby: bool = True
-    ) -> List[Dict]:
+        prioritize_nearby: bool = True,
+        full_results: bool = False,
+        timeout: Optional[float] = None
+    ) -> List[ProductRecord]:
         """
         Search Google Shopping for a product in a specific location
         
@@ -306,9 +318,14 @@ class UCGoogleShoppingScraper:
             wait_time: Seconds to wait for page load (auto: 5s fresh, 2.5s persistent)
             driver: Optional existing driver to reuse (FAST!)
             close_driver: If True, close driver after search (default)
+            prioritize_nearby: If True, keep "In stores nearby" products only
+            full_results: If True, return every product (flagged by is_in_store)
+                without applying the view filter or max_products
+            timeout: Total time budget in seconds (None = unbounded); caps the
+                page load and shortens the settle waits
         
         Returns:
-            List of product dictionaries with name, price, merchant, etc.
+            List of ProductRecords (name, price, merchant, etc.)
         """
         logger.info(f"Searching '{search_term}' in ZIP {zip_code}")
         
@@ -330,6 +347,13 @@ class UCGoogleShoppingScraper:
             url = self._build_search_url(search_term, zip_code)
             logger.debug(f"Loading: {url}")
             
+            # Time budget: cap the page load, and the fixed waits at a quarter of it
+            scroll_wait = 0.5
+            if timeout is not None:
+                driver.set_page_load_timeout(max(1, int(timeout)))
+                wait_time = min(wait_time, timeout / 4)
+                scroll_wait = min(scroll_wait, timeout / 8)
+            
             # Load page
             driver.get(url)
             time.sleep(wait_time)
@@ -337,9 +361,9 @@ class UCGoogleShoppingScraper:
             # Scroll to load lazy-loaded products in "In stores nearby"
             logger.info("Scrolling to load all products...")
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight/2);")
-            time.sleep(0.5)
+            time.sleep(scroll_wait)
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(0.5)
+            time.sleep(scroll_wait)
             
             # Save HTML for debugging
             import os
@@ -351,12 +375,15 @@ class UCGoogleShoppingScraper:
             logger.info(f"💾 Saved HTML: {debug_path}")
             
             # Extract products
-            products = self._extract_products(driver, prioritize_nearby)
+            products = self._extract_products(driver)
             
             logger.info(f"Found {len(products)} products")
             
-            # Limit results
-            return products[:max_products]
+            if full_results:
+                return products
+            
+            # Derive requested view, then limit results
+            return select_view(products, prioritize_nearby)[:max_products]
             
         except TimeoutException:
             logger.error(f"Timeout loading page for '{search_term}'")
@@ -371,13 +398,19 @@ class UCGoogleShoppingScraper:
             # Only close if we created it AND close_driver=True
             if driver and not driver_provided and close_driver:
                 driver.quit()
+            elif driver and timeout is not None:
+                # Persistent browser: don't leak this job's budget into the next search
+                try:
+                    driver.set_page_load_timeout(UC_PAGE_LOAD_TIMEOUT)
+                except Exception:
+                    pass
     
     def search_multiple_sequential(
         self,
         search_terms: List[str],
         zip_code: str,
         max_products_per_search: int = 50
-    ) -> Dict[str, List[Dict]]:
+    ) -> Dict[str, List[ProductRecord]]:
         """
         Search multiple products SEQUENTIALLY using ONE persistent browser
         
@@ -392,7 +425,7 @@ class UCGoogleShoppingScraper:
             max_products_per_search: Max products per search
         
         Returns:
-            Dict mapping search_term -> list of products
+            Dict mapping search_term -> list of ProductRecords
         """
         logger.info(f"Sequential search: {len(search_terms)} items in ZIP {zip_code}")
         
@@ -429,7 +462,7 @@ class UCGoogleShoppingScraper:
         search_terms: List[str],
         zip_code: str,
         max_products_per_search: int = 50
-    ) -> Dict[str, List[Dict]]:
+    ) -> Dict[str, List[ProductRecord]]:
         """
         Search multiple products in parallel using multiprocessing
         
@@ -441,7 +474,7 @@ class UCGoogleShoppingScraper:
             max_products_per_search: Max products per search
         
         Returns:
-            Dict mapping search_term -> list of products
+            Dict mapping search_term -> list of ProductRecords
         """
         logger.info(f"Parallel search: {len(search_terms)} items in ZIP {zip_code}")
         
@@ -489,7 +522,7 @@ def search_products(
     zip_code: str,
     max_products_per_item: int = 20,
     use_parallel: bool = True
-) -> Dict[str, List[Dict]]:
+) -> Dict[str, List[ProductRecord]]:
     """
     Production API for searching Google Shopping
     
@@ -504,13 +537,13 @@ def search_products(
         use_parallel: If True and >3 items, use parallel (default: True)
     
     Returns:
-        Dict mapping search_term -> list of products
+        Dict mapping search_term -> list of ProductRecords
         
     Example:
         results = search_products(["milk", "eggs"], "10001", max_products_per_item=10)
         # returns: {
-        #   "milk": [{"name": "Whole Milk", "price": 3.69, "merchant": "Walmart"}, ...],
-        #   "eggs": [{"name": "Large Eggs", "price": 2.99, "merchant": "Target"}, ...]
+        #   "milk": [ProductRecord("Whole Milk", $3.69, 'Walmart'), ...],
+        #   "eggs": [ProductRecord("Large Eggs", $2.99, 'Target'), ...]
         # }
     """
     # Determine if running on server (check for DISPLAY env var)
@@ -550,7 +583,7 @@ def example_single_search():
     
     print(f"\n✅ Found {len(products)} products:")
     for i, p in enumerate(products, 1):
-        print(f"{i}. {p['name']} - ${p['price']} @ {p['merchant']}")
+        print(f"{i}. {p.name} - ${p.price} @ {p.merchant}")
 
 
 def example_parallel_search():
@@ -570,7 +603,7 @@ def example_parallel_search():
     for term, products in results.items():
         print(f"\n📦 {term.upper()} ({len(products)} products):")
         for i, p in enumerate(products[:3], 1):
-            print(f"  {i}. {p['name']} - ${p['price']} @ {p['merchant']}")
+            print(f"  {i}. {p.name} - ${p.price} @ {p.merchant}")
 
 
 if __name__ == "__main__":
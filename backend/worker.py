@@ -18,10 +18,31 @@ import time
 import logging
 import os
 import sys
+import signal
+import socket
+import threading
 from typing import Dict, List, Optional
-from datetime import datetime
 from dotenv import load_dotenv
 
+# `python3 worker.py --supervise` runs supervisor.py instead. Dispatch before
+# anything below loads the scraper backend or sets up worker logging, so the
+# supervisor process stays small and logs as "supervisor".
+if __name__ == "__main__" and '--supervise' in sys.argv[1:]:
+    from supervisor import main as supervise
+    supervise()
+    sys.exit(0)
+
+from item_cache import ItemCache, CacheEntry, normalize_query
+from job_store import ACTIVE_STATUSES, JobStore
+from scheduler import BACKGROUND, EDF, EDF_STATS_KEY, INTERACTIVE_LANES, JobScheduler
+from affinity import group_names
+from worker_registry import HEARTBEAT_INTERVAL, WorkerRegistry
+from error_events import ErrorEvents
+from log_setup import configure_logging
+from proc_stats import MB, tree_rss
+from product import ProductRecord, by_price, select_view, to_wire
+from cart_summary import summarize_cart
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -35,15 +56,9 @@ else:
     from uc_scraper import UCGoogleShoppingScraper
     USING_SERPAPI = False
 
-# Configure logging BEFORE any log messages
-logging.basicConfig(
-    level=logging.DEBUG,  # Changed to DEBUG for more verbose output
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),  # Output to stdout
-        logging.StreamHandler(sys.stderr)   # Also to stderr for systemd
-    ]
-)
+# Configure logging BEFORE any log messages: one stdout writer on a background
+# thread, levels from LOG_LEVEL / LOG_LEVELS (see log_setup.py)
+configure_logging('worker')
 logger = logging.getLogger(__name__)
 
 # Log which backend we're using (after logging is configured!)
@@ -52,6 +67,17 @@ if USING_SERPAPI:
 else:
     logger.info("🌐 Using UC Browser scraper backend")
 
+# A job whose client hasn't polled /api/results for this long is abandoned
+# (tab closed); its remaining items are skipped. 0 disables cancellation.
+JOB_ABANDON_AFTER = int(os.getenv('JOB_ABANDON_AFTER', 30))
+
+# Cache misses are only scraped if at least this much of the job's deadline
+# remains; otherwise the item is skipped and the job returns partial results
+MIN_SCRAPE_BUDGET = float(os.getenv('MIN_SCRAPE_BUDGET', 2))
+
+# Smoothing for the per-item time published in heartbeats (capacity estimate)
+ITEM_TIME_ALPHA = 0.2
+
 
 class PersistentBrowserWorker:
     """
@@ -64,7 +90,14 @@ class PersistentBrowserWorker:
     - ALWAYS passes user's ZIP code to scraper (CRITICAL!)
     """
     
-    def __init__(self, redis_host: str = 'localhost', redis_port: int = 6379, worker_id: str = None):
+    def __init__(
+        self,
+        redis_host: str = 'localhost',
+        redis_port: int = 6379,
+        worker_id: str = None,
+        batch_size: int = 1,
+        group: str = None
+    ):
         """
         Initialize worker
         
@@ -72,6 +105,10 @@ class PersistentBrowserWorker:
             redis_host: Redis server hostname/IP
             redis_port: Redis server port
             worker_id: Unique identifier for this worker (for logging)
+            batch_size: Max jobs to dequeue at once; items shared between
+                        them are scraped once (1 = one job at a time)
+            group: Worker group whose ZIP regions this worker serves first
+                   (see affinity.py; None = ungrouped)
         """
         self.redis_client = redis.Redis(
             host=redis_host,
@@ -79,16 +116,46 @@ class PersistentBrowserWorker:
             decode_responses=True
         )
         
+        self.item_cache = ItemCache(self.redis_client)
+        self.job_store = JobStore(self.redis_client)
+        if group and group not in group_names():
+            logger.warning(f"⚠️  WORKER_GROUP {group} is not one of {group_names()}, running ungrouped")
+            group = None
+        self.scheduler = JobScheduler(self.redis_client, group=group)
+        self.registry = WorkerRegistry(self.redis_client)
+        self.group = group
+        
         self.worker_id = worker_id or f"worker-{os.getpid()}"
+        self.errors = ErrorEvents(self.redis_client, self.worker_id, backend=SCRAPER_BACKEND)
         self.scraper = None
         self.browser = None
         self.jobs_completed = 0
         self.browser_start_time = None
         self.max_jobs_per_browser = 50
         self.max_browser_age_seconds = 30 * 60  # 30 minutes
+        self.batch_size = max(1, batch_size)
+        self.coalescing_stats = {'batches': 0, 'item_requests': 0, 'unique_items': 0}
+        self._stopping = False
+        
+        # Published in heartbeats (see worker_registry.py)
+        self.started_at = time.time()
+        self.total_jobs_completed = 0  # jobs_completed resets with every browser restart
+        self.items_completed = 0
+        self.avg_item_seconds = None
+        self.current_job = None
+        self.current_item = None
+        self.last_error = None
+        self.last_error_at = None
+        self._last_heartbeat = 0.0
+        self._heartbeat_lock = threading.Lock()
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
         
         logger.info(f"🚀 {self.worker_id} initialized")
         logger.info(f"   Redis: {redis_host}:{redis_port}")
+        logger.info(f"   Batch size: {self.batch_size} job(s)")
+        if self.scheduler.groups:
+            logger.info(f"   Worker group: {group or 'none (serves every group)'} of {len(self.scheduler.groups)}")
         logger.info(f"   Browser restart policy: {self.max_jobs_per_browser} jobs OR {self.max_browser_age_seconds/60:.0f} minutes")
         
         # Initialize scraper immediately
@@ -170,6 +237,7 @@ class PersistentBrowserWorker:
             
         except Exception as e:
             logger.error(f"❌ Failed to start browser: {e}", exc_info=True)
+            self._record_error('browser_start', e)
             self.browser = None
             raise
     
@@ -178,6 +246,121 @@ class PersistentBrowserWorker:
         if self._should_restart_browser():
             self._start_browser()
     
+    def _heartbeat(self, force: bool = False):
+        """Publish this worker's state to the registry (at most every HEARTBEAT_INTERVAL unless forced)"""
+        with self._heartbeat_lock:
+            now = time.time()
+            if not force and now - self._last_heartbeat < HEARTBEAT_INTERVAL:
+                return
+            self._last_heartbeat = now
+            self._publish_heartbeat(now)
+    
+    def _publish_heartbeat(self, now: float):
+        if self._stopping:
+            state = 'stopping'
+        else:
+            state = 'busy' if self.current_job else 'idle'
+        browser_alive = self.scraper is not None if USING_SERPAPI else self.browser is not None
+        
+        try:
+            self.registry.heartbeat(self.worker_id, {
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'backend': SCRAPER_BACKEND,
+                'group': self.group,
+                'state': state,
+                'current_job': self.current_job,
+                'current_item': self.current_item,
+                'jobs_completed': self.total_jobs_completed,
+                'items_completed': self.items_completed,
+                'avg_item_seconds': round(self.avg_item_seconds, 3) if self.avg_item_seconds else None,
+                'browser_alive': int(browser_alive),
+                'browser_age': round(now - self.browser_start_time) if self.browser_start_time else None,
+                'rss_mb': round(tree_rss(os.getpid()) / MB, 1),
+                'last_error': self.last_error,
+                'last_error_at': self.last_error_at,
+                'started_at': self.started_at
+            })
+        except Exception as e:
+            logger.debug(f"Could not publish heartbeat: {e}")
+    
+    def _heartbeat_loop(self):
+        """Background heartbeats, so a scrape longer than HEARTBEAT_TTL doesn't drop a busy worker"""
+        while not self._heartbeat_stop.wait(HEARTBEAT_INTERVAL):
+            self._heartbeat()
+    
+    def _start_heartbeats(self):
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, name=f"{self.worker_id}-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+    
+    def _stop_heartbeats(self):
+        """Stop the heartbeat thread (before the worker leaves the registry, so it can't re-add it)"""
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout=HEARTBEAT_INTERVAL)
+            self._heartbeat_thread = None
+    
+    def _start_work(self, job_id: str, item: Optional[str] = None):
+        """Mark the job/item being worked on (heartbeat immediately when a new job starts)"""
+        new_job = job_id != self.current_job
+        self.current_job = job_id
+        self.current_item = item
+        self._heartbeat(force=new_job)
+    
+    def _record_item_time(self, elapsed: float):
+        """Fold one resolved item's wall time into the smoothed per-item time"""
+        self.items_completed += 1
+        if self.avg_item_seconds is None:
+            self.avg_item_seconds = elapsed
+        else:
+            self.avg_item_seconds += ITEM_TIME_ALPHA * (elapsed - self.avg_item_seconds)
+    
+    def _record_error(self, stage: str, error, job_id: Optional[str] = None, item: Optional[str] = None):
+        """Publish an error event (see error_events.py) and remember it for the heartbeat"""
+        self.last_error = str(error)[:200]
+        self.last_error_at = time.time()
+        self.errors.record(stage, error, job_id=job_id, item=item)
+    
+    def _scrape_item(
+        self,
+        item: str,
+        zip_code: str,
+        prioritize_nearby: bool,
+        wait_time: float,
+        timeout: Optional[float] = None
+    ) -> List[ProductRecord]:
+        """
+        Scrape the FULL result set for one item (online + in-store, flagged by is_in_store)
+        
+        prioritize_nearby is still passed so the scraper applies the right
+        retry policy, but the view itself is derived by the caller.
+        timeout is the job's remaining time budget (None = no deadline).
+        """
+        if USING_SERPAPI:
+            # SerpAPI has different parameters
+            return self.scraper.search(
+                query=item,
+                zipcode=zip_code,  # ← USER'S ZIP CODE
+                prioritize_nearby=prioritize_nearby,  # User's preference
+                full_results=True,
+                timeout=timeout
+            )
+        
+        # UC Browser scraper parameters
+        return self.scraper.search(
+            search_term=item,
+            zip_code=zip_code,  # ← USER'S ZIP CODE
+            wait_time=wait_time,
+            driver=self.browser,  # Reuse persistent browser
+            close_driver=False,  # Keep browser open!
+            prioritize_nearby=prioritize_nearby,  # User's preference
+            full_results=True,
+            timeout=timeout
+        )
+    
     def process_job(self, job_data: Dict) -> Dict:
         """
         Process a single scraping job
@@ -185,7 +368,195 @@ class PersistentBrowserWorker:
         CRITICAL: Extracts ZIP code from job and passes to scraper
         
         Args:
-            job_data: Dict with keys: job_id, items (list), zip_code, max_products_per_item
+            job_data: Dict with keys: job_id, items (list), zip_code, max_products_per_item,
+                      deadline (optional Unix time; past it, cache misses are skipped)
+        
+        Returns:
+            Dict with results or error
+        """
+        return self.process_batch([job_data])[0]
+    
+    def process_batch(self, jobs: List[Dict]) -> List[Dict]:
+        """
+        Process a batch of scraping jobs, scraping each unique item only once
+        
+        Jobs are handled in order so the first job's results are published as
+        soon as its own items are done. Items are coalesced across the batch by
+        (normalized query, ZIP): the full result set is scraped once and every
+        job derives its own nearby/all view from it.
+        
+        Args:
+            jobs: List of job dicts (see process_job)
+        
+        Returns:
+            List of per-job outcome dicts, in the same order as jobs
+        """
+        try:
+            # Ensure browser is ready
+            logger.info(f"[{self.worker_id}] Ensuring browser is ready...")
+            self._ensure_browser_ready()
+            logger.info(f"[{self.worker_id}] Browser ready!")
+        except Exception as e:
+            return [self._fail_job(job_data, e) for job_data in jobs]
+        
+        # (normalized query, zip) -> cached/scraped entry, shared by every job in the batch
+        batch_products: Dict[tuple, CacheEntry] = {}
+        item_requests = 0
+        
+        outcomes = []
+        for job_data in jobs:
+            item_requests += len(job_data['items'])
+            outcomes.append(self._run_job(job_data, batch_products))
+        
+        self._record_coalescing(len(jobs), item_requests, len(batch_products))
+        
+        return outcomes
+    
+    def _record_coalescing(self, job_count: int, item_requests: int, unique_items: int):
+        """Log and count how many item scrapes were saved by coalescing"""
+        if not unique_items:
+            return
+        
+        dedup_ratio = item_requests / unique_items
+        self.coalescing_stats['batches'] += 1
+        self.coalescing_stats['item_requests'] += item_requests
+        self.coalescing_stats['unique_items'] += unique_items
+        
+        if job_count > 1:
+            logger.info(
+                f"🧮 [{self.worker_id}] Batch of {job_count} jobs: {item_requests} items → "
+                f"{unique_items} unique (dedup ratio {dedup_ratio:.2f})"
+            )
+        
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.hincrby('stats:coalescing', 'batches', 1)
+            pipe.hincrby('stats:coalescing', 'item_requests', item_requests)
+            pipe.hincrby('stats:coalescing', 'unique_items', unique_items)
+            pipe.hset('stats:coalescing', 'last_dedup_ratio', round(dedup_ratio, 3))
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Could not record coalescing stats: {e}")
+    
+    def _resolve_item(
+        self,
+        item: str,
+        zip_code: str,
+        prioritize_nearby: bool,
+        wait_time: float,
+        batch_products: Dict[tuple, CacheEntry],
+        budget: Optional[float] = None
+    ) -> tuple:
+        """
+        Get the full result set for an item: batch → item cache → scrape
+        
+        Stale cache entries (past the soft TTL) are served immediately and a
+        background refresh is queued; only a miss blocks on a scrape, and only
+        if the job's remaining budget allows it.
+        
+        Returns:
+            (CacheEntry, source) where source is "batch", "cache", "stale" or
+            "scraped", or (None, "deadline") if a scrape no longer fits the budget
+        """
+        batch_key = (normalize_query(item), zip_code)
+        entry = batch_products.get(batch_key)
+        if entry is not None:
+            return entry, "batch"
+        
+        entry = self.item_cache.get(item, zip_code, record_stats=True)
+        if entry is not None:
+            source = "cache" if entry.zip_code == zip_code else f"region:{entry.zip_code}"
+            if entry.is_stale():
+                self.item_cache.request_refresh(item, zip_code, prioritize_nearby)
+                source = "stale"
+        elif budget is not None and budget < MIN_SCRAPE_BUDGET:
+            return None, "deadline"
+        else:
+            products = self._scrape_item(item, zip_code, prioritize_nearby, wait_time, timeout=budget)
+            entry = self.item_cache.set(item, zip_code, products)
+            source = "scraped"
+        
+        batch_products[batch_key] = entry
+        return entry, source
+    
+    def _publish_item(
+        self,
+        job_id: str,
+        item: str,
+        state: str,
+        products: Optional[List[Dict]] = None,
+        stale_age: Optional[int] = None
+    ):
+        """
+        Publish one item's outcome to the job hash as soon as it is known
+        
+        /api/results reads it while the job is still processing, so the
+        first items render before the whole cart is done.
+        """
+        try:
+            self.job_store.publish_item(job_id, item, state, products, stale_age)
+        except Exception as e:
+            logger.debug(f"Could not publish '{item}' for {job_id[:8]}: {e}")
+    
+    def _record_deadline_miss(self, job_id: str, items_skipped: int):
+        """Count a job that returned partial results because its deadline passed"""
+        logger.warning(f"⏱️  [{job_id[:8]}] Deadline reached, returning partial results ({items_skipped} item(s) skipped)")
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.hincrby('stats:deadlines', 'partial_jobs', 1)
+            pipe.hincrby('stats:deadlines', 'items_skipped', items_skipped)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Could not record deadline stats: {e}")
+    
+    def _client_gone(self, job_id: str) -> bool:
+        """
+        True if the job's client stopped polling more than JOB_ABANDON_AFTER seconds ago
+        
+        The API refreshes seen:{job_id} on submission and on every
+        /api/results poll. Jobs without the key (queued by older API
+        versions) are never considered abandoned.
+        """
+        if JOB_ABANDON_AFTER <= 0:
+            return False
+        try:
+            last_seen = self.redis_client.get(f'seen:{job_id}')
+        except Exception:
+            return False
+        return last_seen is not None and time.time() - float(last_seen) > JOB_ABANDON_AFTER
+    
+    def _cancel_job(self, job_data: Dict, items_skipped: int) -> Dict:
+        """Record an abandoned job as cancelled and count the work saved"""
+        job_id = job_data['job_id']
+        logger.info(f"🚫 [{job_id[:8]}] Client stopped polling, skipping {items_skipped} remaining item(s)")
+        
+        try:
+            self.job_store.finish(
+                job_id,
+                'cancelled',
+                self.worker_id,
+                error='Cancelled: client stopped polling for results'
+            )
+            pipe = self.redis_client.pipeline()
+            pipe.hincrby('stats:cancellation', 'jobs', 1)
+            pipe.hincrby('stats:cancellation', 'items_skipped', items_skipped)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Could not record cancellation: {e}")
+        
+        return {
+            'status': 'cancelled',
+            'job_id': job_id,
+            'items_skipped': items_skipped
+        }
+    
+    def _run_job(self, job_data: Dict, batch_products: Dict[tuple, CacheEntry]) -> Dict:
+        """
+        Scrape one job's items (reusing batch_products) and store its results
+        
+        Args:
+            job_data: Job dict (see process_job)
+            batch_products: Shared (normalized query, zip) -> full product list
         
         Returns:
             Dict with results or error
@@ -195,6 +566,7 @@ class PersistentBrowserWorker:
         zip_code = job_data['zip_code']  # CRITICAL: User's location
         max_products = job_data.get('max_products_per_item', 20)
         prioritize_nearby = job_data.get('prioritize_nearby', True)  # Default to True for backward compatibility
+        deadline = job_data.get('deadline')  # Unix time set by the API (None for older payloads)
         
         # LOG THE ZIP CODE (so we can verify it's being used)
         logger.info(f"📋 [{job_id[:8]}] Starting scrape")
@@ -203,32 +575,26 @@ class PersistentBrowserWorker:
         logger.info(f"   🎯 Prioritize Nearby: {prioritize_nearby}")
         logger.info(f"   Max products: {max_products}")
         
+        if self._client_gone(job_id):
+            return self._cancel_job(job_data, len(items))
+        
         try:
-            # Ensure browser is ready
-            logger.info(f"[{job_id[:8]}] Ensuring browser is ready...")
-            self._ensure_browser_ready()
-            logger.info(f"[{job_id[:8]}] Browser ready!")
-            
-            # Update status to processing
-            self.redis_client.setex(
-                f'status:{job_id}',
-                3600,  # 1 hour TTL
-                json.dumps({
-                    'status': 'processing',
-                    'worker_id': self.worker_id,
-                    'started_at': datetime.now().isoformat(),
-                    'zip_code': zip_code,  # Include ZIP in status
-                    'items': items
-                })
-            )
+            # Update status to processing, with every item pending in the job hash
+            self.job_store.start(job_id, self.worker_id, zip_code, items)
             
             # DO THE SCRAPING
             # Use sequential method with persistent browser (FASTEST for 1-10 items)
             start_time = time.time()
             
             results = {}
+            stale_items = {}  # item -> age in seconds, for items served past the soft TTL
+            skipped_items = []  # Cache misses left unscraped because the deadline passed
             for i, item in enumerate(items):
+                if i > 0 and self._client_gone(job_id):
+                    return self._cancel_job(job_data, len(items) - i)
+                
                 item_start = time.time()
+                self._start_work(job_id, item)
                 
                 logger.info(f"[{job_id[:8]}] Scraping item {i+1}/{len(items)}: {item}")
                 
@@ -236,124 +602,297 @@ class PersistentBrowserWorker:
                 wait_time = 1 if i == 0 else 0.5  # First search needs more time
                 
                 try:
-                    if USING_SERPAPI:
-                        # SerpAPI has different parameters
-                        products = self.scraper.search(
-                            query=item,
-                            zipcode=zip_code,  # ← USER'S ZIP CODE
-                            prioritize_nearby=prioritize_nearby  # User's preference
-                        )
-                    else:
-                        # UC Browser scraper parameters
-                        products = self.scraper.search(
-                            search_term=item,
-                            zip_code=zip_code,  # ← USER'S ZIP CODE
-                            max_products=max_products,
-                            wait_time=wait_time,
-                            driver=self.browser,  # Reuse persistent browser
-                            close_driver=False,  # Keep browser open!
-                            prioritize_nearby=prioritize_nearby  # User's preference
-                        )
+                    # Full result set is scraped once per batch and cached;
+                    # both views derive from it
+                    budget = deadline - time.time() if deadline else None
+                    entry, source = self._resolve_item(
+                        item, zip_code, prioritize_nearby, wait_time, batch_products, budget=budget
+                    )
+                    if entry is None:
+                        logger.warning(f"   ⏱️  {item}: skipped, job deadline reached")
+                        skipped_items.append(item)
+                        results[item] = []
+                        self._publish_item(job_id, item, 'skipped', [])
+                        continue
                     
-                    results[item] = products
+                    # Stored cheapest first so /api/results can slice top-k without re-sorting
+                    products = by_price(select_view(entry.products, prioritize_nearby))[:max_products]
+                    results[item] = to_wire(products)
+                    if entry.is_stale():
+                        stale_items[item] = int(entry.age)
+                    self._publish_item(job_id, item, 'done', results[item], stale_items.get(item))
                     
                     item_elapsed = time.time() - item_start
-                    logger.info(f"   ✓ {item}: {len(products)} products ({item_elapsed:.1f}s)")
+                    self._record_item_time(item_elapsed)
+                    logger.info(f"   ✓ {item}: {len(products)} products ({source}, {item_elapsed:.1f}s)")
                     
                 except Exception as e:
                     logger.error(f"   ✗ {item}: Scraping failed - {e}", exc_info=True)
+                    self._record_error('scrape', e, job_id=job_id, item=item)
                     results[item] = []
+                    self._publish_item(job_id, item, 'failed', [])
             
             elapsed = time.time() - start_time
+            return self._finish_job(job_id, results, stale_items, skipped_items, elapsed)
             
-            # Store results in Redis (30 second TTL - NO LONG-TERM CACHE)
-            self.redis_client.setex(
-                f'result:{job_id}',
-                30,  # Just long enough to retrieve results
-                json.dumps({
-                    'status': 'complete',
-                    'results': results,
-                    'zip_code': zip_code,
-                    'total_time': round(elapsed, 2),
-                    'worker_id': self.worker_id,
-                    'completed_at': datetime.now().isoformat()
-                })
+        except Exception as e:
+            return self._fail_job(job_data, e)
+    
+    def _finish_job(
+        self,
+        job_id: str,
+        results: Dict[str, List[Dict]],
+        stale_items: Dict[str, int],
+        skipped_items: List[str],
+        elapsed: float
+    ) -> Dict:
+        """Store a finished job's cart-level result and return the success outcome"""
+        # Products are already in the job hash (published per item); add the
+        # cart-level result and keep it for JOB_RESULT_RETENTION
+        self.job_store.finish(job_id, 'complete', self.worker_id, result={
+            'summary': summarize_cart(results),  # Computed once here, not per poll/render
+            'product_counts': {item: len(products) for item, products in results.items()},
+            'stale_items': stale_items,
+            'partial': bool(skipped_items),
+            'skipped_items': skipped_items,
+            'total_time': round(elapsed, 2)
+        })
+        
+        if skipped_items:
+            self._record_deadline_miss(job_id, len(skipped_items))
+        
+        logger.info(f"✅ [{job_id[:8]}] Complete! {len(results)} items in {elapsed:.1f}s")
+        
+        self.jobs_completed += 1
+        self.total_jobs_completed += 1
+        
+        return {
+            'status': 'success',
+            'job_id': job_id,
+            'elapsed': elapsed
+        }
+    
+    def process_task(self, task: Dict) -> Dict:
+        """
+        Resolve one item task claimed in deadline order (EDF dispatch)
+        
+        The item is published to the job hash like any other; the worker
+        that finishes the job's last task computes and stores the cart
+        result. Tasks of cancelled/failed/expired jobs are dropped.
+        
+        Args:
+            task: Job fields (job_id, zip_code, deadline, ...) plus "item"
+        
+        Returns:
+            Dict with the task outcome ("success" also when the item was skipped)
+        """
+        job_id = task['job_id']
+        item = task['item']
+        deadline = task.get('deadline')
+        prioritize_nearby = task.get('prioritize_nearby', True)
+        
+        status = self.job_store.claim_task(job_id, self.worker_id)
+        if status not in ACTIVE_STATUSES:
+            self.redis_client.hincrby('stats:cancellation', 'items_skipped', 1)
+            return {'status': 'cancelled', 'job_id': job_id, 'item': item}
+        
+        if self._client_gone(job_id):
+            return self._cancel_job(task, 1)
+        
+        item_start = time.time()
+        self._start_work(job_id, item)
+        logger.info(f"[{job_id[:8]}] Item task: {item}" + (f" (deadline in {deadline - item_start:.1f}s)" if deadline else ""))
+        
+        try:
+            self._ensure_browser_ready()
+            budget = deadline - time.time() if deadline else None
+            entry, source = self._resolve_item(
+                item, task['zip_code'], prioritize_nearby, 0.5, {}, budget=budget
             )
-            
-            logger.info(f"✅ [{job_id[:8]}] Complete! {len(items)} items in {elapsed:.1f}s")
-            
-            self.jobs_completed += 1
-            
-            return {
-                'status': 'success',
-                'job_id': job_id,
-                'elapsed': elapsed
-            }
-            
+            if entry is None:
+                logger.warning(f"   ⏱️  {item}: skipped, job deadline reached")
+                self.redis_client.hincrby(EDF_STATS_KEY, 'items_skipped', 1)
+                self._publish_item(job_id, item, 'skipped', [])
+            else:
+                products = by_price(select_view(entry.products, prioritize_nearby))[:task.get('max_products_per_item', 20)]
+                stale_age = int(entry.age) if entry.is_stale() else None
+                self._publish_item(job_id, item, 'done', to_wire(products), stale_age)
+                self._record_item_time(time.time() - item_start)
+                logger.info(f"   ✓ {item}: {len(products)} products ({source}, {time.time() - item_start:.1f}s)")
+        except Exception as e:
+            logger.error(f"   ✗ {item}: Scraping failed - {e}", exc_info=True)
+            self._record_error('scrape', e, job_id=job_id, item=item)
+            self._publish_item(job_id, item, 'failed', [])
+        
+        if deadline and time.time() > deadline:
+            self.redis_client.hincrby(EDF_STATS_KEY, 'finished_late', 1)
+        
+        if self.job_store.task_done(job_id) > 0:
+            return {'status': 'success', 'job_id': job_id, 'item': item}
+        
+        # Last task of the job: write the cart result
+        job = self.job_store.get(job_id)
+        if job is None or not job.is_active:
+            return {'status': 'cancelled', 'job_id': job_id, 'item': item}
+        skipped_items = [name for name, state in job.item_status.items() if state == 'skipped']
+        elapsed = time.time() - float(job.info.get('started_ts', item_start))
+        return self._finish_job(job_id, job.ordered_results(), job.item_age, skipped_items, elapsed)
+    
+    def _fail_job(self, job_data: Dict, error: Exception) -> Dict:
+        """Store a job failure in Redis and return the error outcome"""
+        job_id = job_data['job_id']
+        logger.error(f"❌ [{job_id[:8]}] Error: {error}")
+        self._record_error('job', error, job_id=job_id)
+        
+        try:
+            # Store error in the job hash (kept for JOB_RESULT_RETENTION)
+            self.job_store.finish(job_id, 'failed', self.worker_id, error=str(error))
         except Exception as e:
-            logger.error(f"❌ [{job_id[:8]}] Error: {e}")
+            logger.error(f"❌ [{job_id[:8]}] Could not store failure: {e}")
+        
+        return {
+            'status': 'error',
+            'job_id': job_id,
+            'error': str(error)
+        }
+    
+    def process_refresh(self, refresh_data: Dict) -> Dict:
+        """
+        Re-scrape a stale cached item in the background
+        
+        Refreshes (stale entries, API prefetch hints, cache warmer) come
+        from the background lane, which is only served when no cart is
+        waiting (with the default lane weights), so they never delay carts.
+        
+        Args:
+            refresh_data: Dict with keys: item, zip_code, prioritize_nearby
+        
+        Returns:
+            Dict with refresh outcome
+        """
+        item = refresh_data['item']
+        zip_code = refresh_data['zip_code']
+        prioritize_nearby = refresh_data.get('prioritize_nearby', True)
+        
+        logger.info(f"🔄 [{self.worker_id}] Background refresh: '{item}' in {zip_code}")
+        start = time.time()
+        
+        try:
+            # A cart may have scraped this item while the refresh was queued
+            entry = self.item_cache.get(item, zip_code)
+            if entry is not None and not entry.is_stale():
+                logger.info(f"   ↷ '{item}' already fresh, skipping refresh")
+                return {'status': 'skipped', 'item': item}
             
-            # Store error in Redis
-            self.redis_client.setex(
-                f'result:{job_id}',
-                3600,
-                json.dumps({
-                    'status': 'failed',
-                    'error': str(e),
-                    'worker_id': self.worker_id,
-                    'failed_at': datetime.now().isoformat()
-                })
-            )
+            self._ensure_browser_ready()
+            products = self._scrape_item(item, zip_code, prioritize_nearby, wait_time=0.5)
+            self.item_cache.set(item, zip_code, products)
             
-            return {
-                'status': 'error',
-                'job_id': job_id,
-                'error': str(e)
-            }
+            logger.info(f"   ✓ Refreshed '{item}': {len(products)} products ({time.time() - start:.1f}s)")
+            return {'status': 'success', 'item': item, 'products': len(products)}
+        except Exception as e:
+            logger.error(f"   ✗ Refresh failed for '{item}': {e}")
+            self._record_error('refresh', e, item=item)
+            return {'status': 'error', 'item': item, 'error': str(e)}
+        finally:
+            self.item_cache.release_refresh(item, zip_code)
+    
+    def _dequeue_more(self, count: int) -> List[str]:
+        """
+        Take up to `count` additional carts without blocking (lane weights apply)
+        
+        Returns:
+            List of raw job payloads (possibly empty)
+        """
+        raw_jobs = []
+        while len(raw_jobs) < count:
+            # Lane payloads only: an EDF item task isn't a cart and is handled by process_task
+            job = self.scheduler.dequeue(INTERACTIVE_LANES, include_edf=False)
+            if job is None:
+                break
+            raw_jobs.append(job[1])
+        return raw_jobs
+    
+    def _handle_sigterm(self, signum, frame):
+        """Finish the current job, then exit the loop (systemd / supervisor stop)"""
+        logger.info(f"🛑 {self.worker_id} received SIGTERM, finishing current job...")
+        self._stopping = True
+        self._last_heartbeat = 0.0  # Next heartbeat reports "stopping" right away
     
     def run(self):
         """
-        Main worker loop - runs forever
+        Main worker loop - runs until Ctrl+C or SIGTERM
         Pulls jobs from Redis queue and processes them
         """
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+        
         logger.info(f"🎯 {self.worker_id} ready, waiting for jobs from Redis...")
-        logger.info(f"   Queue: 'scrape_queue'")
+        logger.info(f"   Lanes: {', '.join(f'{lane}={w}' for lane, w in self.scheduler.weights.items())} (weight 0 = only when idle)")
         logger.info(f"   Ctrl+C to stop")
         
         consecutive_errors = 0
         max_consecutive_errors = 5
         
-        while True:
+        self._heartbeat(force=True)
+        self._start_heartbeats()
+        
+        while not self._stopping:
             try:
-                # Block and wait for a job (timeout after 5 seconds)
-                logger.info(f"[{self.worker_id}] ⏳ Waiting for job from queue...")
-                job = self.redis_client.brpop('scrape_queue', timeout=5)
+                self.current_job = self.current_item = None
+                self._heartbeat()
                 
-                if job:
-                    logger.info(f"[{self.worker_id}] 📥 Job received from queue!")
-                    logger.info(f"   Raw job data: {job}")
-                    
-                    # job is a tuple: (queue_name, job_data)
+                # Next job by lane weight and client round-robin (waits up to 5 seconds)
+                logger.debug(f"[{self.worker_id}] ⏳ Waiting for job from queue...")
+                job = self.scheduler.wait(timeout=5)
+                
+                if job and job[0] == BACKGROUND:
                     try:
-                        job_data = json.loads(job[1])
-                        logger.info(f"   Job ID: {job_data.get('job_id', 'unknown')[:16]}...")
-                        logger.info(f"   Items: {job_data.get('items', [])}")
-                        logger.info(f"   ZIP: {job_data.get('zip_code', 'unknown')}")
+                        self.process_refresh(json.loads(job[1]))
                     except Exception as e:
-                        logger.error(f"   ❌ Failed to parse job data: {e}")
-                        continue
-                    
-                    # Process the job
-                    logger.info(f"[{self.worker_id}] Starting to process job...")
-                    result = self.process_job(job_data)
-                    logger.info(f"[{self.worker_id}] Job processing complete: {result.get('status')}")
-                    
-                    # Reset error counter on success
-                    if result['status'] == 'success':
+                        logger.error(f"   ❌ Failed to process refresh: {e}")
+                
+                elif job and job[0] == EDF:
+                    # One item of a cart, claimed in deadline order (job[1] is the task dict)
+                    result = self.process_task(job[1])
+                    if result['status'] in ('success', 'cancelled'):
                         consecutive_errors = 0
                     else:
                         consecutive_errors += 1
-                        logger.warning(f"[{self.worker_id}] Job failed. Consecutive errors: {consecutive_errors}")
+                
+                elif job:
+                    logger.info(f"[{self.worker_id}] 📥 Job received from queue!")
+                    
+                    # job is a tuple: (lane, job_data)
+                    # Grab a few more waiting jobs so shared items are scraped once
+                    raw_jobs = [job[1]] + self._dequeue_more(self.batch_size - 1)
+                    
+                    batch = []
+                    for raw_job in raw_jobs:
+                        try:
+                            job_data = json.loads(raw_job)
+                            logger.info(f"   Job ID: {job_data.get('job_id', 'unknown')[:16]}...")
+                            logger.info(f"   Items: {job_data.get('items', [])}")
+                            logger.info(f"   ZIP: {job_data.get('zip_code', 'unknown')}")
+                            batch.append(job_data)
+                        except Exception as e:
+                            logger.error(f"   ❌ Failed to parse job data: {e}")
+                    
+                    if not batch:
+                        continue
+                    
+                    # Process the job(s)
+                    logger.info(f"[{self.worker_id}] Starting to process {len(batch)} job(s)...")
+                    outcomes = self.process_batch(batch)
+                    
+                    for result in outcomes:
+                        logger.info(f"[{self.worker_id}] Job processing complete: {result.get('status')}")
+                        
+                        # Reset error counter on success (a cancelled job isn't an error)
+                        if result['status'] in ('success', 'cancelled'):
+                            consecutive_errors = 0
+                        else:
+                            consecutive_errors += 1
+                            logger.warning(f"[{self.worker_id}] Job failed. Consecutive errors: {consecutive_errors}")
                     
                 else:
                     # No jobs available, just log periodically
@@ -377,10 +916,12 @@ class PersistentBrowserWorker:
                 
             except Exception as e:
                 logger.error(f"❌ Worker error: {e}")
+                self._record_error('worker_loop', e)
                 consecutive_errors += 1
                 time.sleep(5)
         
         # Cleanup
+        self._stop_heartbeats()
         if self.browser and not USING_SERPAPI:
             logger.info("🧹 Closing browser...")
             try:
@@ -394,22 +935,41 @@ class PersistentBrowserWorker:
             except:
                 pass
         
-        logger.info(f"👋 {self.worker_id} stopped (completed {self.jobs_completed} jobs)")
+        try:
+            self.registry.remove(self.worker_id)
+        except Exception as e:
+            logger.debug(f"Could not remove {self.worker_id} from the registry: {e}")
+        
+        logger.info(f"👋 {self.worker_id} stopped (completed {self.total_jobs_completed} jobs)")
 
 
 def main():
     """
     Entry point for worker
     
+    `python3 worker.py --supervise` runs a memory-aware pool of workers
+    instead (see supervisor.py).
+    
     Environment variables:
     - REDIS_HOST: Redis server hostname (default: localhost)
     - REDIS_PORT: Redis server port (default: 6379)
     - WORKER_ID: Optional worker identifier
+    - WORKER_BATCH_SIZE: Max jobs to dequeue and coalesce at once (default: 1)
+    - JOB_ABANDON_AFTER: Seconds without a client poll before a job is cancelled (default: 30)
+    - MIN_SCRAPE_BUDGET: Seconds of deadline left required to scrape a cache miss (default: 2)
+    - JOB_RESULT_RETENTION: Seconds finished job results are kept (default: 900)
+    - LANE_WEIGHTS: Dequeue weights, e.g. "interactive_small=6,interactive_large=3,background=0"
+    - DISPATCH_MODE: "lanes" (whole carts, default) or "edf" (item tasks by deadline)
+    - WORKER_GROUPS / WORKER_GROUP: ZIP-affinity routing, e.g. 3 groups and "g0" (see affinity.py)
+    - WORKER_HEARTBEAT_TTL: Seconds without a heartbeat before a worker drops out of /api/workers (default: 30)
+    - LOG_LEVEL / LOG_LEVELS / LOG_FORMAT: Root level, per-module levels, "json" or "text" (see log_setup.py)
     """
     
     redis_host = os.environ.get('REDIS_HOST', 'localhost')
     redis_port = int(os.environ.get('REDIS_PORT', 6379))
     worker_id = os.environ.get('WORKER_ID', None)
+    batch_size = int(os.environ.get('WORKER_BATCH_SIZE', 1))
+    group = os.environ.get('WORKER_GROUP') or None
     
     logger.info("="*80)
     logger.info("🏭 GOOGLE SHOPPING SCRAPER WORKER")
@@ -419,7 +979,9 @@ def main():
     worker = PersistentBrowserWorker(
         redis_host=redis_host,
         redis_port=redis_port,
-        worker_id=worker_id
+        worker_id=worker_id,
+        batch_size=batch_size,
+        group=group
     )
     
     worker.run()
@@ -0,0 +1,123 @@
+"""
+Worker Registry
+
+Live view of the worker fleet, published by the workers themselves.
+
+Every PersistentBrowserWorker writes a heartbeat hash every few seconds
+from a background thread (so a long scrape doesn't make a busy worker
+vanish), and whenever it starts a job:
+
+    worker:{worker_id}   worker_id, host, pid, backend, group, state
+                         ("idle" / "busy" / "stopping"), current_job,
+                         current_item, jobs_completed, items_completed,
+                         avg_item_seconds, browser_alive, browser_age,
+                         rss_mb, last_error, last_error_at, started_at,
+                         updated_at
+    workers              sorted set worker_id -> last heartbeat time
+
+The hash expires HEARTBEAT_TTL seconds after the last beat, so a worker
+that was killed disappears on its own; the sorted set lets readers list
+live workers without SCAN.
+
+capacity() turns the heartbeats into a throughput estimate (live workers
+x measured seconds per item), reported by /api/workers and /api/monitor.
+"""
+
+import os
+import time
+import logging
+from statistics import median
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 5  # Seconds between idle heartbeats
+HEARTBEAT_TTL = int(os.getenv('WORKER_HEARTBEAT_TTL', 30))
+WORKER_PREFIX = 'worker'
+REGISTRY_KEY = 'workers'
+DEFAULT_ITEM_SECONDS = 2.0  # Until a worker has measured its own speed
+
+_NUMERIC_FIELDS = {
+    'pid': int, 'jobs_completed': int, 'items_completed': int,
+    'avg_item_seconds': float, 'browser_age': float, 'rss_mb': float,
+    'started_at': float, 'updated_at': float, 'last_error_at': float
+}
+
+
+class WorkerRegistry:
+    """Heartbeat hashes for live workers, plus fleet capacity estimates"""
+
+    def __init__(self, redis_client, ttl: int = HEARTBEAT_TTL):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            ttl: Seconds after the last heartbeat before a worker is considered gone
+        """
+        self.redis_client = redis_client
+        self.ttl = ttl
+
+    def _key(self, worker_id: str) -> str:
+        return f"{WORKER_PREFIX}:{worker_id}"
+
+    def heartbeat(self, worker_id: str, fields: Dict):
+        """Publish a worker's current state (None values are stored as "")"""
+        now = time.time()
+        mapping = {key: '' if value is None else value for key, value in fields.items()}
+        mapping['worker_id'] = worker_id
+        mapping['updated_at'] = now
+
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self._key(worker_id), mapping=mapping)
+        pipe.expire(self._key(worker_id), self.ttl)
+        pipe.zadd(REGISTRY_KEY, {worker_id: now})
+        pipe.execute()
+
+    def remove(self, worker_id: str):
+        """Drop a worker that is shutting down cleanly"""
+        pipe = self.redis_client.pipeline()
+        pipe.delete(self._key(worker_id))
+        pipe.zrem(REGISTRY_KEY, worker_id)
+        pipe.execute()
+
+    def live_workers(self) -> List[Dict]:
+        """Every worker that sent a heartbeat within the TTL (stale entries are pruned)"""
+        cutoff = time.time() - self.ttl
+        self.redis_client.zremrangebyscore(REGISTRY_KEY, '-inf', cutoff)
+        worker_ids = self.redis_client.zrangebyscore(REGISTRY_KEY, cutoff, '+inf')
+
+        pipe = self.redis_client.pipeline()
+        for worker_id in worker_ids:
+            pipe.hgetall(self._key(worker_id))
+
+        workers = []
+        for data in pipe.execute():
+            if not data:
+                continue
+            for key, cast in _NUMERIC_FIELDS.items():
+                if data.get(key):
+                    data[key] = cast(float(data[key])) if cast is int else cast(data[key])
+            data['browser_alive'] = data.get('browser_alive') == '1'
+            workers.append(data)
+        return sorted(workers, key=lambda w: w['worker_id'])
+
+    def capacity(self, workers: List[Dict] = None) -> Dict:
+        """
+        Fleet throughput estimate from heartbeats.
+
+        Returns:
+            {"live_workers", "busy_workers", "idle_workers",
+             "item_seconds" (median per-item time), "items_per_second"}
+        """
+        workers = self.live_workers() if workers is None else workers
+        serving = [w for w in workers if w.get('state') != 'stopping']
+        busy = sum(1 for w in serving if w.get('state') == 'busy')
+        measured = [w['avg_item_seconds'] for w in serving if w.get('avg_item_seconds')]
+        item_seconds = median(measured) if measured else DEFAULT_ITEM_SECONDS
+
+        return {
+            'live_workers': len(serving),
+            'busy_workers': busy,
+            'idle_workers': len(serving) - busy,
+            'item_seconds': round(item_seconds, 2),
+            'items_per_second': round(len(serving) / item_seconds, 3) if serving else 0.0
+        }
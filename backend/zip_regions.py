@@ -0,0 +1,152 @@
+"""
+ZIP Store Regions
+
+Groups neighboring ZIP codes into store regions so the item cache can
+share results between them (33773 and 33774 see the same nearby stores).
+
+Clusters are built from two signals:
+1. Coordinates (from the ZIP snapshot): ZIPs falling in the same grid cell
+   of ZIP_CLUSTER_RADIUS_MILES are candidate siblings.
+2. Stores actually returned: every scrape records the in-store
+   "merchant|location" strings seen for that ZIP. Two candidates only share
+   results if their store sets overlap by at least ZIP_CLUSTER_MIN_OVERLAP
+   (Jaccard). ZIPs with no observations yet are trusted on coordinates.
+
+Per-cluster hit statistics (exact / sibling / miss) live in the
+stats:zip_clusters hash, with fields "{cluster}:{kind}", for tuning the
+radius.
+"""
+
+import os
+import math
+import logging
+from typing import Dict, List, Optional
+
+from zip_snapshot import get_zip_table
+
+logger = logging.getLogger(__name__)
+
+ZIP_CLUSTER_RADIUS_MILES = float(os.getenv('ZIP_CLUSTER_RADIUS_MILES', 3))  # 0 disables sharing
+ZIP_CLUSTER_MIN_OVERLAP = float(os.getenv('ZIP_CLUSTER_MIN_OVERLAP', 0.5))
+ZIP_STORES_TTL = 7 * 24 * 3600  # Keep store observations for a week
+CLUSTER_STATS_KEY = 'stats:zip_clusters'
+
+MILES_PER_DEGREE_LAT = 69.0
+
+
+def zip_region(zip_code: str) -> str:
+    """Coarse region for aggregate statistics (3-digit ZIP prefix)"""
+    return (zip_code or '')[:3]
+
+
+def store_signature(products: List[Dict]) -> set:
+    """In-store "merchant|location" strings from a full product set"""
+    return {
+        f"{p.get('merchant')}|{p.get('location') or ''}"
+        for p in products
+        if p.get('is_in_store') and p.get('merchant')
+    }
+
+
+class ZipClusterer:
+    """
+    Maps ZIP codes to store-region clusters and checks sibling compatibility
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        radius_miles: float = ZIP_CLUSTER_RADIUS_MILES,
+        min_overlap: float = ZIP_CLUSTER_MIN_OVERLAP
+    ):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True)
+            radius_miles: Grid cell size; 0 disables clustering
+            min_overlap: Minimum Jaccard overlap of observed stores to share results
+        """
+        self.redis_client = redis_client
+        self.radius_miles = radius_miles
+        self.min_overlap = min_overlap
+        self._clusters: Dict[str, Optional[str]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.radius_miles > 0
+
+    def cluster_for(self, zip_code: str) -> Optional[str]:
+        """
+        Cluster id for a ZIP, or None if clustering is off or coordinates are unknown
+
+        Cells are radius_miles tall; their width is scaled by the latitude of
+        the cell's band so cells stay roughly square across the US.
+        """
+        if not self.enabled:
+            return None
+        if zip_code in self._clusters:
+            return self._clusters[zip_code]
+
+        cluster = None
+        table = get_zip_table()
+        coords = table.coordinates(zip_code) if table is not None else None
+        if coords:
+            lat, lon = coords
+            dlat = self.radius_miles / MILES_PER_DEGREE_LAT
+            lat_cell = math.floor(lat / dlat)
+            band_lat = (lat_cell + 0.5) * dlat
+            dlon = self.radius_miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(band_lat)), 0.01))
+            lon_cell = math.floor(lon / dlon)
+            cluster = f"r{self.radius_miles:g}:{lat_cell}:{lon_cell}"
+
+        self._clusters[zip_code] = cluster
+        return cluster
+
+    def record_stores(self, zip_code: str, products: List[Dict]):
+        """Remember which in-store locations a scrape returned for this ZIP"""
+        signature = store_signature(products)
+        if not signature:
+            return
+        key = f"zip_stores:{zip_code}"
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.sadd(key, *signature)
+            pipe.expire(key, ZIP_STORES_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Could not record stores for {zip_code}: {e}")
+
+    def compatible(self, zip_code: str, sibling_zip: str) -> bool:
+        """
+        True if sibling_zip's results can be served to zip_code
+
+        Requires the same cluster, and enough overlap in observed stores when
+        both ZIPs have observations.
+        """
+        cluster = self.cluster_for(zip_code)
+        if cluster is None or cluster != self.cluster_for(sibling_zip):
+            return False
+
+        ours = self.redis_client.smembers(f"zip_stores:{zip_code}")
+        theirs = self.redis_client.smembers(f"zip_stores:{sibling_zip}")
+        if not ours or not theirs:
+            return True  # No evidence against sharing yet
+
+        overlap = len(ours & theirs) / len(ours | theirs)
+        return overlap >= self.min_overlap
+
+    def record_hit(self, cluster: Optional[str], kind: str):
+        """Count an "exact", "sibling" or "miss" lookup for a cluster"""
+        if cluster is None:
+            return
+        try:
+            self.redis_client.hincrby(CLUSTER_STATS_KEY, f"{cluster}:{kind}", 1)
+        except Exception as e:
+            logger.debug(f"Could not record cluster stats: {e}")
+
+    def cluster_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-cluster hit counts: {cluster: {"exact": n, "sibling": n, "miss": n}}"""
+        stats: Dict[str, Dict[str, int]] = {}
+        for field, count in self.redis_client.hgetall(CLUSTER_STATS_KEY).items():
+            cluster, _, kind = field.rpartition(':')
+            stats.setdefault(cluster, {'exact': 0, 'sibling': 0, 'miss': 0})[kind] = int(count)
+        return stats
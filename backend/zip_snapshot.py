@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+ZIP Database Snapshot
+
+Compiles zip_database.csv into a compact binary snapshot that can be
+memory-mapped instead of parsed with csv.DictReader on every worker boot.
+
+Snapshot layout (native byte order, 4-byte aligned):
+- Header: magic, byte-order flag, record count, string count, string bytes
+- zips:      uint32[count]   sorted ascending
+- lat / lon: float32[count]  NaN when the CSV has no coordinates
+- city_idx:  uint32[count]   index into string table
+- state_idx: uint32[count]   index into string table
+- offsets:   uint32[strings + 1]
+- prefix_rep: uint32[1000]   per 3-digit prefix, index of its representative
+                             row (the prefix's first CSV row, typically a
+                             major city), or 0xFFFFFFFF if the prefix is unused
+- strings:   UTF-8 blob
+
+The file is opened read-only with mmap, so every worker process on a host
+shares the same pages through the OS page cache. If the snapshot is missing
+or unreadable, the CSV is parsed lazily on first use instead.
+
+Build step (run after updating zip_database.csv):
+    python3 zip_snapshot.py [csv_path] [snapshot_path]
+"""
+
+import os
+import sys
+import csv
+import mmap
+import math
+import struct
+import bisect
+import logging
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ZIP_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zip_database.csv')
+ZIP_SNAPSHOT_PATH = os.getenv(
+    'ZIP_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zip_database.snapshot')
+)
+
+SNAPSHOT_MAGIC = b'ZIPSNAP2'
+_LITTLE_ENDIAN = 1 if sys.byteorder == 'little' else 0
+
+# magic, byteorder, count, n_strings, strings_bytes (padded to 28 -> 32 bytes)
+_HEADER = struct.Struct('=8sIIIII4x')
+
+_PREFIXES = 1000
+_NO_ROW = 0xFFFFFFFF
+
+
+def _parse_coordinate(row: Dict, *names: str) -> float:
+    """Return the first parseable coordinate column, or NaN"""
+    for name in names:
+        value = (row.get(name) or '').strip()
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return float('nan')
+
+
+def _read_csv(csv_path: str) -> Tuple[List[Tuple[int, float, float, str, str]], Dict[int, int]]:
+    """
+    Read ZIP rows from the CSV database.
+
+    Returns:
+        (rows, representatives): rows are (zip_int, lat, lon, city, state)
+        sorted by ZIP, first row wins on duplicates; representatives maps
+        each 3-digit prefix to the ZIP of its first row in CSV order
+    """
+    rows = {}
+    representatives = {}
+    with open(csv_path, 'r') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            zipcode = (row.get('zipcode') or '').strip()
+            city = (row.get('city') or '').strip()
+            state = (row.get('state') or '').strip()
+
+            if not (zipcode and city and state and len(zipcode) == 5 and zipcode.isdigit()):
+                continue
+
+            zip_int = int(zipcode)
+            if zip_int in rows:
+                continue
+
+            lat = _parse_coordinate(row, 'latitude', 'lat')
+            lon = _parse_coordinate(row, 'longitude', 'lng', 'lon')
+            rows[zip_int] = (zip_int, lat, lon, city, state)
+            representatives.setdefault(zip_int // 100, zip_int)
+
+    return [rows[z] for z in sorted(rows)], representatives
+
+
+def _encode(rows: List[Tuple[int, float, float, str, str]], representatives: Dict[int, int]) -> bytes:
+    """Serialize sorted ZIP rows and prefix representatives into the snapshot byte layout"""
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    zips = array('I')
+    lats = array('f')
+    lons = array('f')
+    city_idx = array('I')
+    state_idx = array('I')
+
+    for zip_int, lat, lon, city, state in rows:
+        zips.append(zip_int)
+        lats.append(lat)
+        lons.append(lon)
+        city_idx.append(intern(city))
+        state_idx.append(intern(state))
+
+    prefix_rep = array('I', [_NO_ROW] * _PREFIXES)
+    for prefix, zip_int in representatives.items():
+        prefix_rep[prefix] = bisect.bisect_left(zips, zip_int)
+
+    offsets = array('I', [0])
+    blob = bytearray()
+    for value in strings:
+        blob.extend(value.encode('utf-8'))
+        offsets.append(len(blob))
+
+    # Pad the string blob so the file length stays 4-byte aligned
+    blob.extend(b'\x00' * (-len(blob) % 4))
+
+    header = _HEADER.pack(SNAPSHOT_MAGIC, _LITTLE_ENDIAN, len(zips), len(strings), len(blob), 0)
+    return b''.join([
+        header,
+        zips.tobytes(),
+        lats.tobytes(),
+        lons.tobytes(),
+        city_idx.tobytes(),
+        state_idx.tobytes(),
+        offsets.tobytes(),
+        prefix_rep.tobytes(),
+        bytes(blob)
+    ])
+
+
+def build_snapshot(csv_path: str = ZIP_CSV_PATH, snapshot_path: str = ZIP_SNAPSHOT_PATH) -> int:
+    """
+    Compile the CSV database into a binary snapshot.
+
+    Writes to a temporary file and renames it into place, so running
+    workers that already mapped the old snapshot are never disturbed.
+
+    Args:
+        csv_path: Source CSV (columns: zipcode, city, state, optional latitude/longitude)
+        snapshot_path: Destination snapshot file
+
+    Returns:
+        Number of ZIP codes written
+    """
+    rows, representatives = _read_csv(csv_path)
+    data = _encode(rows, representatives)
+
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, snapshot_path)
+
+    logger.info(f"✅ Built ZIP snapshot: {len(rows)} ZIPs, {len(data)} bytes → {snapshot_path}")
+    return len(rows)
+
+
+class ZipSnapshot:
+    """
+    Read-only view over a ZIP snapshot buffer.
+
+    Backed by an mmap when loaded from disk, or by an in-memory buffer
+    when built on the fly from the CSV fallback. Lookups are binary
+    searches over the sorted ZIP array; nothing is copied into Python
+    objects until a row is actually requested.
+    """
+
+    def __init__(self, buffer, source: str = 'memory'):
+        """
+        Args:
+            buffer: bytes or mmap holding a complete snapshot
+            source: Description of where the buffer came from (for logging)
+        """
+        self._buffer = buffer
+        self.source = source
+
+        view = memoryview(buffer)
+        magic, byteorder, count, n_strings, strings_bytes, _ = _HEADER.unpack_from(view, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a ZIP snapshot (magic={magic!r})")
+        if byteorder != _LITTLE_ENDIAN:
+            raise ValueError("ZIP snapshot was built on a host with a different byte order")
+
+        offset = _HEADER.size
+
+        def take(n_items: int, fmt: str):
+            nonlocal offset
+            size = n_items * 4
+            section = view[offset:offset + size].cast(fmt)
+            offset += size
+            return section
+
+        self._zips = take(count, 'I')
+        self._lats = take(count, 'f')
+        self._lons = take(count, 'f')
+        self._city_idx = take(count, 'I')
+        self._state_idx = take(count, 'I')
+        self._offsets = take(n_strings + 1, 'I')
+        self._prefix_rep = take(_PREFIXES, 'I')
+        self._strings = view[offset:offset + strings_bytes]
+        self._string_cache: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._zips)
+
+    def __contains__(self, zipcode) -> bool:
+        return self._index(zipcode) is not None
+
+    def _string(self, idx: int) -> str:
+        value = self._string_cache.get(idx)
+        if value is None:
+            value = bytes(self._strings[self._offsets[idx]:self._offsets[idx + 1]]).decode('utf-8')
+            self._string_cache[idx] = value
+        return value
+
+    def _index(self, zipcode) -> Optional[int]:
+        try:
+            zip_int = int(zipcode)
+        except (TypeError, ValueError):
+            return None
+        i = bisect.bisect_left(self._zips, zip_int)
+        if i < len(self._zips) and self._zips[i] == zip_int:
+            return i
+        return None
+
+    def _row(self, i: int) -> Tuple[str, str, str, float, float]:
+        return (
+            str(self._zips[i]).zfill(5),
+            self._string(self._city_idx[i]),
+            self._string(self._state_idx[i]),
+            self._lats[i],
+            self._lons[i]
+        )
+
+    def lookup(self, zipcode: str) -> Optional[Tuple[str, str, str, float, float]]:
+        """
+        Look up a single ZIP code.
+
+        Returns:
+            (zipcode, city, state, lat, lon) or None if unknown
+        """
+        i = self._index(zipcode)
+        return self._row(i) if i is not None else None
+
+    def coordinates(self, zipcode: str) -> Optional[Tuple[float, float]]:
+        """Return (lat, lon) for a ZIP, or None if unknown or missing coordinates"""
+        i = self._index(zipcode)
+        if i is None:
+            return None
+        lat, lon = self._lats[i], self._lons[i]
+        if math.isnan(lat) or math.isnan(lon):
+            return None
+        return (lat, lon)
+
+    def first_in_prefix(self, prefix: str) -> Optional[Tuple[str, str, str]]:
+        """
+        Find the representative ZIP for a 3-digit prefix.
+
+        This is the prefix's first row in CSV order (typically a major
+        city), not its numerically lowest ZIP.
+
+        Returns:
+            (zipcode, city, state) or None
+        """
+        if not prefix or len(prefix) != 3 or not prefix.isdigit():
+            return None
+        i = self._prefix_rep[int(prefix)]
+        if i == _NO_ROW:
+            return None
+        zipcode, city, state, _, _ = self._row(i)
+        return (zipcode, city, state)
+
+    def prefixes(self) -> Iterator[str]:
+        """Iterate over distinct 3-digit prefixes in ascending order"""
+        last = None
+        for zip_int in self._zips:
+            prefix = zip_int // 100
+            if prefix != last:
+                last = prefix
+                yield str(prefix).zfill(3)
+
+    def rows(self) -> Iterator[Tuple[str, str, str, float, float]]:
+        """Iterate over every (zipcode, city, state, lat, lon) in ZIP order"""
+        for i in range(len(self._zips)):
+            yield self._row(i)
+
+
+def load_snapshot(snapshot_path: str = ZIP_SNAPSHOT_PATH) -> ZipSnapshot:
+    """
+    Memory-map a snapshot file.
+
+    Raises:
+        OSError / ValueError if the file is missing or invalid
+    """
+    with open(snapshot_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return ZipSnapshot(mapped, source=snapshot_path)
+
+
+def _is_older_than_csv(snapshot_path: str) -> bool:
+    """True if the CSV was modified after the snapshot was built"""
+    try:
+        return os.path.getmtime(snapshot_path) < os.path.getmtime(ZIP_CSV_PATH)
+    except OSError:
+        return False
+
+
+def _load_zip_table() -> Optional[ZipSnapshot]:
+    """Load the mmap snapshot, falling back to parsing the CSV"""
+    start = time.time()
+    try:
+        table = load_snapshot(ZIP_SNAPSHOT_PATH)
+        logger.info(f"✅ Mapped ZIP snapshot: {len(table)} ZIPs in {(time.time() - start) * 1000:.1f}ms")
+        if _is_older_than_csv(ZIP_SNAPSHOT_PATH):
+            logger.warning(
+                f"⚠️  ZIP snapshot {ZIP_SNAPSHOT_PATH} is older than {ZIP_CSV_PATH}; "
+                f"rebuild it with: python3 zip_snapshot.py"
+            )
+        return table
+    except Exception as e:
+        logger.warning(
+            f"⚠️  ZIP snapshot unavailable ({e}), parsing CSV instead; "
+            f"build it with: python3 zip_snapshot.py"
+        )
+
+    try:
+        table = ZipSnapshot(_encode(*_read_csv(ZIP_CSV_PATH)), source=ZIP_CSV_PATH)
+        logger.info(f"✅ Loaded ZIP database from CSV: {len(table)} ZIPs in {(time.time() - start) * 1000:.1f}ms")
+        return table
+    except Exception as e:
+        logger.warning(f"⚠️  Could not load ZIP database: {e}")
+        return None
+
+
+# Singleton instance (loaded on first use, not at import)
+_zip_table = None
+_zip_table_loaded = False
+
+def get_zip_table() -> Optional[ZipSnapshot]:
+    """Get the shared ZIP table, or None if neither snapshot nor CSV is available"""
+    global _zip_table, _zip_table_loaded
+    if not _zip_table_loaded:
+        _zip_table = _load_zip_table()
+        _zip_table_loaded = True
+    return _zip_table
+
+
+class ZipPrefixLookup:
+    """
+    Lazy mapping of 3-digit ZIP prefix → (first_zipcode, city, state).
+
+    Drop-in for the dict previously built at import time: supports
+    `prefix in lookup`, `lookup[prefix]` and `lookup.get(prefix)`, but
+    touches the ZIP table only on first access.
+    """
+
+    def __contains__(self, prefix) -> bool:
+        table = get_zip_table()
+        return table is not None and table.first_in_prefix(prefix) is not None
+
+    def __getitem__(self, prefix) -> Tuple[str, str, str]:
+        table = get_zip_table()
+        entry = table.first_in_prefix(prefix) if table is not None else None
+        if entry is None:
+            raise KeyError(prefix)
+        return entry
+
+    def get(self, prefix, default=None):
+        try:
+            return self[prefix]
+        except KeyError:
+            return default
+
+    def __len__(self) -> int:
+        table = get_zip_table()
+        return sum(1 for _ in table.prefixes()) if table is not None else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else ZIP_CSV_PATH
+    snapshot_path = sys.argv[2] if len(sys.argv) > 2 else ZIP_SNAPSHOT_PATH
+
+    count = build_snapshot(csv_path, snapshot_path)
+
+    start = time.time()
+    table = load_snapshot(snapshot_path)
+    elapsed_ms = (time.time() - start) * 1000
+    print(f"✅ {count} ZIPs written to {snapshot_path} (reload: {elapsed_ms:.2f}ms)")
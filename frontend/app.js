@@ -14,7 +14,9 @@ const CONFIG = {
     DEBOUNCE_DELAY: 1200,  // ms to wait after user stops typing (increased to prevent partial word searches)
     POLL_INTERVAL: 2000,  // ms between result polls
     MAX_ITEMS: 10,
-    MIN_ZIP_LENGTH: 5
+    MIN_ZIP_LENGTH: 5,
+    // Only the best-price group is rendered, so ask for just that (ties included)
+    RESULTS_QUERY: 'top_k=1&fields=name,price,merchant,location'
 };
 
 // ============================================================================
@@ -117,6 +119,38 @@ async function fetchSuggestions(item) {
     }
 }
 
+/**
+ * Known ZIP code for prefetching (entered now or used for the last search)
+ */
+function knownZipCode() {
+    const typed = zipInput.value;
+    if (typed && typed.length === CONFIG.MIN_ZIP_LENGTH) {
+        return typed;
+    }
+    return state.zipCode;
+}
+
+/**
+ * Hint the API to warm its cache for items we'll probably submit.
+ * Fire-and-forget: failures never affect the user flow.
+ */
+function prefetchItems(items) {
+    const zipcode = knownZipCode();
+    if (!zipcode || items.length === 0) {
+        return;
+    }
+    
+    fetch(`${CONFIG.API_BASE_URL}/api/prefetch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            items: items,
+            zipcode: zipcode,
+            prioritize_nearby: document.getElementById('prioritizeNearbyToggle').checked
+        })
+    }).catch(error => console.debug('Prefetch hint failed:', error));
+}
+
 /**
  * Display AI suggestions
  */
@@ -204,6 +238,9 @@ function addToCart(name) {
     // Add to cart
     state.cart.push({ name });
     
+    // Warm the cache while the user keeps shopping (needs a known ZIP)
+    prefetchItems([name]);
+    
     // Update UI
     renderCart();
     showToast('Added to cart!', 1500);
@@ -429,6 +466,11 @@ zipInput.addEventListener('input', (e) => {
     const value = e.target.value.replace(/\D/g, '');  // Only digits
     e.target.value = value;
     findPricesBtn.disabled = value.length !== CONFIG.MIN_ZIP_LENGTH;
+    
+    // ZIP complete: prefetch the whole cart while the user reviews it
+    if (value.length === CONFIG.MIN_ZIP_LENGTH) {
+        prefetchItems(state.cart.map(item => item.name));
+    }
 });
 
 zipInput.addEventListener('keypress', (e) => {
@@ -512,7 +554,7 @@ async function pollResults() {
     progressFill.style.width = `${progress}%`;
     
     try {
-        const response = await fetch(`${CONFIG.API_BASE_URL}/api/results/${state.jobId}`);
+        const response = await fetch(`${CONFIG.API_BASE_URL}/api/results/${state.jobId}?${CONFIG.RESULTS_QUERY}`);
         
         if (!response.ok) {
             throw new Error('Failed to fetch results');
@@ -525,20 +567,31 @@ async function pollResults() {
             clearInterval(state.pollInterval);
             progressFill.style.width = '100%';
             
-            // Display results
+            // Display results (the page may already show progressive results)
             displayResults(data);
-            goToStep(4);
+            if (state.currentStep !== 4) goToStep(4);
             
         } else if (data.status === 'processing') {
             loadingStatus.textContent = 'Processing your items...';
             
-        } else if (data.status === 'failed') {
+            // Show items as they finish instead of waiting for the whole cart
+            if (data.results && Object.keys(data.results).length > 0) {
+                displayResults(data);
+                if (state.currentStep !== 4) goToStep(4);
+            }
+            
+        } else if (data.status === 'failed' || data.status === 'cancelled') {
             clearInterval(state.pollInterval);
             showToast('Search failed. Please try again.');
             goToStep(2);
             
         } else if (data.status === 'queued') {
             loadingStatus.textContent = `Queued (position: ${data.queue_position || '?'})`;
+            
+        } else if (data.status === 'not_found') {
+            clearInterval(state.pollInterval);
+            showToast('Results expired. Please search again.');
+            goToStep(2);
         }
         
     } catch (error) {
@@ -561,11 +614,26 @@ const totalProducts = document.getElementById('totalProducts');
 const processingTime = document.getElementById('processingTime');
 const newSearchBtn = document.getElementById('newSearchBtn');
 
+/**
+ * Label for prices served from an older cached scrape (refresh in progress)
+ */
+function staleLabel(ageSeconds) {
+    if (ageSeconds === undefined || ageSeconds === null) {
+        return '';
+    }
+    const minutes = Math.round(ageSeconds / 60);
+    const age = minutes < 60 ? `${minutes} min` : `${Math.round(minutes / 60)} hr`;
+    return `<span class="stale-label">🕒 Prices from ${age} ago</span>`;
+}
+
 /**
  * Display search results
  */
 function displayResults(data) {
     const results = data.results || {};
+    const staleItems = data.stale_items || {};
+    const skippedItems = data.skipped_items || [];  // Not scraped before the job deadline
+    const itemStatus = data.item_status || {};  // Present while the job is still processing
     const itemsWithResults = Object.keys(results).filter(item => results[item].length > 0);
     
     // DEBUG: Log raw API response
@@ -578,9 +646,11 @@ function displayResults(data) {
     zipDisplay.textContent = data.zip_code || state.zipCode;
     totalItems.textContent = state.cart.length;
     
+    // Results are trimmed to the best prices; product_counts has the full totals
+    const counts = data.product_counts || {};
     let totalProductsCount = 0;
-    Object.values(results).forEach(products => {
-        totalProductsCount += products.length;
+    Object.keys(results).forEach(item => {
+        totalProductsCount += counts[item] ?? results[item].length;
     });
     totalProducts.textContent = totalProductsCount;
     
@@ -592,7 +662,19 @@ function displayResults(data) {
     state.cart.forEach((cartItem, cartIndex) => {
         const products = results[cartItem.name] || [];
         
-        if (products.length === 0) {
+        if (itemStatus[cartItem.name] === 'pending') {
+            // Still being searched (progressive results)
+            resultsTable.innerHTML += `
+                <div class="result-card">
+                    <div class="result-header">
+                        <span class="result-item-name">${cartItem.name}</span>
+                    </div>
+                    <div class="result-products">
+                        <p style="text-align: center; color: #9E9E9E; padding: 20px;">Searching...</p>
+                    </div>
+                </div>
+            `;
+        } else if (products.length === 0) {
             // No results found
             resultsTable.innerHTML += `
                 <div class="result-card">
@@ -600,7 +682,7 @@ function displayResults(data) {
                         <span class="result-item-name">${cartItem.name}</span>
                     </div>
                     <div class="result-products">
-                        <p style="text-align: center; color: #9E9E9E; padding: 20px;">No products found</p>
+                        <p style="text-align: center; color: #9E9E9E; padding: 20px;">${skippedItems.includes(cartItem.name) ? 'Search timed out, please try again' : 'No products found'}</p>
                     </div>
                 </div>
             `;
@@ -678,6 +760,7 @@ function displayResults(data) {
                 <div class="result-card">
                     <div class="result-header">
                         <span class="result-item-name">${cartItem.name}</span>
+                        ${staleLabel(staleItems[cartItem.name])}
                     </div>
                     <div class="result-products">
                         ${bestPriceHTML}